@@ -0,0 +1,13 @@
+"""Offline benchmarks for the message hot path.
+
+Run with `python -m bench`. Telegram, MongoDB and the LLM server are
+replaced by in-process stubs, so no network access or credentials are needed.
+"""
+import os
+
+# src builds its clients from config at import time; give it harmless values
+# before anything under bench imports it.
+os.environ.setdefault("MONGO_URL", "mongodb://127.0.0.1:27017")
+os.environ.setdefault("API_ID", "1")
+os.environ.setdefault("API_HASH", "bench")
+os.environ.setdefault("METRICS_PORT", "0")
@@ -0,0 +1,79 @@
+"""Usage: python -m bench [--messages N] [--output FILE] [--compare BASELINE.json]
+
+Results are written as JSON (bench/results/<timestamp>.json by default), so
+two runs can be compared with --compare; the exit status is 1 when any metric
+regressed by more than --threshold.
+"""
+import argparse
+import asyncio
+import json
+import sys
+
+from . import report
+from .equivalence import check_validate_response
+from .fixtures import make_corpus
+from .hot_path import measure_allocations, run_hot_path
+from .micro import run_micro
+from .stubs import install_stubs
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m bench", description="Benchmark the message hot path offline.")
+    parser.add_argument("--messages", type=int, default=2000, help="messages driven through handle_chat")
+    parser.add_argument("--alloc-messages", type=int, default=200, help="messages traced with tracemalloc")
+    parser.add_argument("--micro-iterations", type=int, default=2000, help="calls per microbenchmark")
+    parser.add_argument("--equivalence-cases", type=int, default=5000, help="random replies checked against the legacy validate_response")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--llm-latency", type=float, default=0.0, help="seconds added to every stub LLM call")
+    parser.add_argument("--telegram-latency", type=float, default=0.0, help="seconds added to every stub send")
+    parser.add_argument("--mongo-latency", type=float, default=0.0, help="seconds added to every stub Mongo call")
+    parser.add_argument("--keep-limits", action="store_true", help="keep rate limiting and the engagement policy on")
+    parser.add_argument("--output", help="where to write the JSON results")
+    parser.add_argument("--compare", help="baseline JSON file to compare against")
+    parser.add_argument("--threshold", type=float, default=0.10, help="relative change counted as a regression")
+    return parser.parse_args(argv)
+
+
+async def run(args) -> dict:
+    client = install_stubs(args.telegram_latency, args.llm_latency, args.mongo_latency, args.keep_limits)
+
+    corpus = make_corpus(args.messages, seed=args.seed, client=client)
+    # Fresh ids so the router doesn't treat the traced run as duplicates
+    alloc_corpus = make_corpus(args.alloc_messages, seed=args.seed + 1, client=client, start_id=args.messages + 1_000_000)
+
+    return {
+        "meta": {**report.metadata(), "args": vars(args)},
+        "hot_path": await run_hot_path(corpus, client),
+        "allocations": await measure_allocations(alloc_corpus, client),
+        "micro": run_micro(args.micro_iterations, args.seed),
+        "equivalence": {"validate_response": check_validate_response(args.equivalence_cases, args.seed)},
+    }
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    results = asyncio.run(run(args))
+
+    path = report.save(results, args.output)
+    print(json.dumps({key: value for key, value in results.items() if key != "meta"}, indent=2))
+    print(f"\nSaved results to {path}")
+
+    mismatches = results["equivalence"]["validate_response"]["mismatches"]
+    if mismatches:
+        print(f"\nvalidate_response differs from the legacy implementation on {mismatches} case(s)")
+        return 1
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        lines, regressions = report.compare(results, baseline, args.threshold)
+        print("\n".join(lines))
+        if regressions:
+            print(f"\n{len(regressions)} metric(s) regressed by more than {args.threshold:.0%}")
+            return 1
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
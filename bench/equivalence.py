@@ -0,0 +1,118 @@
+import random
+from typing import Callable, Dict, List, Tuple
+
+LEGACY_EMOJI = ('🙂', '😊', '💕', '✨', '😍', '😉', '🎉')
+
+WORDS = [
+    "yaar", "hmm", "acha", "haan", "nahi", "kya", "hai", "the", "and", "hu", "mai", "kyun", "kaise",
+    "ok", "so", "aap", "batao", "really", "interesting...", "samjhi...", "tell", "me", "more",
+    "pagal", "chal", "theek", "bilkul", "mood", "kharab", "achha", "lol", "hehe", "wow!", "sach?",
+    ".", "?", "!", ",", "...", "😊😊😊", "❤️", "🔥",
+]
+
+MESSAGE_TYPES = ["greetings", "emotional_support", "flirty", "adult_content", "casual_chat", "dry_reply", "yes_no", "confused", "casual"]
+
+
+def legacy_validate_response(builder, response: str, msg_type: str, is_emoji: Callable[[str], bool]) -> str:
+    """The multi-pass implementation validate_response replaced, kept to check the rewrite."""
+    word_limits = builder.prompts['config']['word_limits']
+
+    if msg_type in word_limits['category_specific_limits']:
+        max_words = word_limits['category_specific_limits'][msg_type]['max_words']
+    else:
+        max_words = word_limits['response_constraints']['max_words']
+
+    words = response.split()
+    filtered_words = [word for word in words if not is_emoji(word)]
+
+    if len(filtered_words) > max_words:
+        response_lower = response.lower()
+        forbidden_fragments = word_limits.get('meaning_validation', {}).get('forbidden_fragments', [])
+
+        if any(fragment in response_lower for fragment in forbidden_fragments):
+            return response
+
+        important_words = [w for w in words if len(w) > 2 and w not in ['the', 'and', 'but', 'hai', 'hu', 'mai', 'kya', 'kyun', 'kaise']]
+
+        if len(important_words) <= max_words:
+            final_words = []
+            word_count = 0
+
+            for word in words:
+                if not is_emoji(word):
+                    word_count += 1
+
+                if word_count <= max_words:
+                    final_words.append(word)
+                elif word in ['.', '?', '!', ',']:
+                    final_words.append(word)
+                    break
+                else:
+                    break
+
+            response = ' '.join(final_words).strip()
+
+        if response.endswith('... 😊') and len(response.split()) > max_words + 2:
+            if '?' in response:
+                response = response.split('?')[0] + '?'
+            elif '.' in response:
+                response = response.split('.')[0] + '.'
+            else:
+                words_to_keep = []
+                word_count = 0
+                for word in words:
+                    if not is_emoji(word):
+                        word_count += 1
+                    if word_count <= max_words:
+                        words_to_keep.append(word)
+                    else:
+                        break
+                response = ' '.join(words_to_keep).strip()
+
+    response = response.replace('\n', ' ').strip()
+
+    return response
+
+
+def random_reply(rng: random.Random) -> str:
+    words = [rng.choice(WORDS + list(LEGACY_EMOJI)) for _ in range(rng.randint(0, 45))]
+    separators = [rng.choice(("  ", " ", " ", " ", "\n")) for _ in words]
+    reply = "".join(word + separator for word, separator in zip(words, separators))
+    if rng.random() < 0.3:
+        reply += "... 😊"
+    return reply
+
+
+def check_validate_response(cases: int = 5000, seed: int = 7) -> Dict:
+    """Compare validate_response with the legacy implementation on random replies.
+
+    Emoji detection was widened from seven hard-coded emoji to any pictograph,
+    so both sides use the new predicate; replies made only of the seven legacy
+    emoji are also compared against the original tuple.
+    """
+    from src.utils.prompt_builder import is_emoji, prompt_builder
+
+    def legacy_emoji(word: str) -> bool:
+        return word.startswith(LEGACY_EMOJI)
+
+    rng = random.Random(seed)
+    mismatches: List[Tuple[str, str, str, str]] = []
+    for _ in range(cases):
+        reply, msg_type = random_reply(rng), rng.choice(MESSAGE_TYPES)
+        expected = legacy_validate_response(prompt_builder, reply, msg_type, is_emoji)
+        if not any(word in ("❤️", "🔥") for word in reply.split()):
+            original = legacy_validate_response(prompt_builder, reply, msg_type, legacy_emoji)
+            if original != expected:
+                mismatches.append((reply, msg_type, original, expected))
+        actual = prompt_builder.validate_response(reply, msg_type)
+        if actual != expected:
+            mismatches.append((reply, msg_type, expected, actual))
+
+    return {
+        "cases": cases,
+        "mismatches": len(mismatches),
+        "examples": [
+            {"reply": reply, "msg_type": msg_type, "expected": expected, "actual": actual}
+            for reply, msg_type, expected, actual in mismatches[:3]
+        ],
+    }
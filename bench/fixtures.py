@@ -0,0 +1,105 @@
+import random
+from typing import Dict, List, Optional
+
+from pyrogram.enums import ChatType, MessageEntityType
+from pyrogram.types import Chat, Message, MessageEntity, User
+
+BOT_ID = 7000000001
+BOT_USERNAME = "era_bench_bot"
+
+# Everyday Hinglish chatter, roughly in the proportions seen in groups
+TEXTS = [
+    "hi", "hello ji", "hey kaise ho", "good morning sabko", "good night guys",
+    "ok", "hmm", "k", "nhi", "haan", "thik hai", "acha", "q", "kya re", "kyun",
+    "kya kar rahe ho aaj", "aaj bahut boring din tha yaar", "mera mood off hai",
+    "kal exam hai aur kuch padha nahi 😭", "chai peene chalein?", "weekend plans kya hai",
+    "tum kaun ho", "mera naam kya h", "mai rahul hu", "my name is priya",
+    "bhai nhi yaar", "tum bahut cute ho 😍", "mujhse shaadi karogi? love you",
+    "mai bahut sad hu aaj", "office mein boss ne bahut daanta", "so excited for the trip!!",
+    "bc kya bakwas hai ye", "stupid bot", "movie dekhi kal, bahut mast thi",
+    "cricket match dekha? kohli ne kya khela", "koi accha gaana batao",
+    "aaj khana kya banaya", "padhai mein mann nahi lag raha", "kuch nahi bas timepass",
+    "what are you doing right now", "explain properly yaar samajh nhi aaya",
+    "yaar ye group kitna shaant hai aaj", "sab log kahan gaye",
+]
+
+OTHER_BOT_COMMANDS = [
+    "/play tum hi ho", "/skip", "/weather delhi", "/ban@group_help_bot",
+    "/price btc", "/queue", "/translate hello", "/news@newsbot",
+]
+
+# Weights of each update kind in a generated trace
+DEFAULT_MIX = {
+    "private": 0.35,
+    "group": 0.35,
+    "group_mention": 0.12,
+    "group_reply_bot": 0.08,
+    "group_reply_other": 0.05,
+    "command": 0.05,
+}
+
+
+def _utf16_len(text: str) -> int:
+    return len(text.encode("utf-16-le")) // 2
+
+
+def _user(user_id: int, rng: random.Random) -> User:
+    return User(
+        id=user_id,
+        is_bot=False,
+        first_name=rng.choice(["Rahul", "Priya", "Aman", "Neha", "Rohit", "Sneha", "Arjun"]),
+        last_name=rng.choice([None, "Sharma", "Verma", "Singh"]),
+        username=f"user{user_id}",
+    )
+
+
+def bot_user() -> User:
+    return User(id=BOT_ID, is_bot=True, first_name="Era", username=BOT_USERNAME)
+
+
+def build_message(message_id: int, kind: str, rng: random.Random, client=None, text: Optional[str] = None) -> Message:
+    user = _user(rng.randint(10_000, 10_000 + 2_000), rng)
+    text = text or rng.choice(TEXTS)
+    entities: List[MessageEntity] = []
+    reply_to_message = None
+
+    if kind == "private":
+        chat = Chat(id=user.id, type=ChatType.PRIVATE, first_name=user.first_name)
+    else:
+        chat_id = -1001000000000 - rng.randint(1, 50)
+        chat = Chat(id=chat_id, type=ChatType.SUPERGROUP, title=f"Bench Group {chat_id}")
+
+    if kind == "group_mention":
+        tag = f"@{BOT_USERNAME}"
+        text = f"{tag} {text}"
+        entities.append(MessageEntity(type=MessageEntityType.MENTION, offset=0, length=_utf16_len(tag)))
+    elif kind == "group_reply_bot":
+        reply_to_message = Message(id=message_id - 1, chat=chat, from_user=bot_user(), text="haan bolo", client=client)
+    elif kind == "group_reply_other":
+        other = _user(rng.randint(20_000, 21_000), rng)
+        reply_to_message = Message(id=message_id - 1, chat=chat, from_user=other, text=rng.choice(TEXTS), client=client)
+    elif kind == "command":
+        text = rng.choice(OTHER_BOT_COMMANDS)
+        command = text.split()[0]
+        entities.append(MessageEntity(type=MessageEntityType.BOT_COMMAND, offset=0, length=_utf16_len(command)))
+
+    return Message(
+        id=message_id,
+        chat=chat,
+        from_user=user,
+        text=text,
+        entities=entities or None,
+        reply_to_message=reply_to_message,
+        client=client,
+    )
+
+
+def make_corpus(count: int, seed: int = 7, client=None, start_id: int = 1, mix: Optional[Dict[str, float]] = None) -> List[Message]:
+    rng = random.Random(seed)
+    mix = mix or DEFAULT_MIX
+    kinds = list(mix)
+    weights = [mix[kind] for kind in kinds]
+    return [
+        build_message(start_id + index, rng.choices(kinds, weights)[0], rng, client)
+        for index in range(count)
+    ]
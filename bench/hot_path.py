@@ -0,0 +1,74 @@
+import sys
+import time
+import tracemalloc
+from collections import defaultdict
+from typing import Dict, List
+
+from .report import percentiles
+
+
+async def run_hot_path(corpus: List, client) -> Dict:
+    """Drive every message through handle_chat one after another and time each stage."""
+    from src.modules.chat_handler import handle_chat
+    from src.utils.lanes import chat_lanes
+    from src.utils.outbox import outbox
+    from src.utils.tasks import background
+    from src.utils.timing import track
+
+    stages = defaultdict(list)
+    sent_before = client.sent
+
+    started = time.perf_counter()
+    for message in corpus:
+        with track() as timer:
+            await handle_chat(client, message)
+            await chat_lanes.wait(message.chat.id)
+        for name, seconds in timer.stages.items():
+            stages[name].append(seconds)
+    elapsed = time.perf_counter() - started
+
+    await outbox.drain()
+    await background.drain()
+
+    return {
+        "messages": len(corpus),
+        "replies": client.sent - sent_before,
+        "elapsed_seconds": round(elapsed, 4),
+        "messages_per_second": round(len(corpus) / elapsed, 2) if elapsed else 0.0,
+        "stages_ms": {name: percentiles(values, 1000) for name, values in sorted(stages.items())},
+    }
+
+
+async def measure_allocations(corpus: List, client) -> Dict:
+    """Peak and retained Python heap per message, traced with tracemalloc."""
+    from src.modules.chat_handler import handle_chat
+    from src.utils.lanes import chat_lanes
+    from src.utils.outbox import outbox
+    from src.utils.tasks import background
+
+    peaks, retained, blocks = [], [], []
+    tracemalloc.start()
+    try:
+        for message in corpus:
+            current_before, _ = tracemalloc.get_traced_memory()
+            blocks_before = sys.getallocatedblocks()
+            tracemalloc.reset_peak()
+
+            await handle_chat(client, message)
+            await chat_lanes.wait(message.chat.id)
+
+            current_after, peak = tracemalloc.get_traced_memory()
+            peaks.append(peak - current_before)
+            retained.append(current_after - current_before)
+            blocks.append(sys.getallocatedblocks() - blocks_before)
+        await outbox.drain()
+        await background.drain()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "messages": len(corpus),
+        "peak_bytes": percentiles(peaks),
+        "retained_bytes": percentiles(retained),
+        "net_blocks": percentiles(blocks),
+    }
@@ -0,0 +1,203 @@
+"""Replay message traces against the real handler stack to find where the bot saturates.
+
+Usage: python -m bench.load [--rate 20] [--duration 60] [--concurrency 32]
+                            [--trace trace.jsonl | --record-trace out.jsonl]
+                            [--llm-url http://127.0.0.1:8787/chat] [--latency ...]
+
+Messages go through handle_chat with the real aiohttp session, pointed at a
+stub /chat server (started in-process unless --llm-url is given). Telegram
+and Mongo are stubbed. A trace is JSON lines of {"at": seconds, "kind": ..., "text": ...}.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import resource
+import sys
+import time
+from typing import Dict, List, Optional
+
+from . import report
+from .fixtures import DEFAULT_MIX, TEXTS, build_message
+from .stub_llm import StubLLMServer, add_server_arguments
+from .stubs import install_stubs
+
+
+def synthetic_trace(rate: float, duration: float, seed: int) -> List[Dict]:
+    """Poisson arrivals at `rate` messages per second."""
+    rng = random.Random(seed)
+    kinds, weights = list(DEFAULT_MIX), list(DEFAULT_MIX.values())
+    trace, at = [], 0.0
+    while True:
+        at += rng.expovariate(rate)
+        if at >= duration:
+            return trace
+        trace.append({"at": round(at, 4), "kind": rng.choices(kinds, weights)[0], "text": rng.choice(TEXTS)})
+
+
+def load_trace(path: str, speed: float = 1.0) -> List[Dict]:
+    with open(path, encoding="utf-8") as f:
+        entries = [json.loads(line) for line in f if line.strip()]
+    for entry in entries:
+        entry["at"] = float(entry["at"]) / speed
+    return sorted(entries, key=lambda entry: entry["at"])
+
+
+def save_trace(trace: List[Dict], path: str) -> None:
+    with open(path, "w", encoding="utf-8") as f:
+        for entry in trace:
+            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+
+
+def rss_bytes() -> int:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        # Peak rather than current RSS, but still shows growth
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+
+
+class LoadRun:
+    def __init__(self, client, concurrency: int):
+        self.client = client
+        self.slots = asyncio.Semaphore(concurrency)
+        self.waiting = 0
+        self.running = 0
+        self.completed = 0
+        self.failed = 0
+        self.latencies: List[float] = []
+
+    async def deliver(self, message, arrived: float) -> None:
+        from src.modules.chat_handler import handle_chat
+        from src.utils.lanes import chat_lanes
+
+        # Waiting on a slot models updates queued behind busy handler workers
+        self.waiting += 1
+        async with self.slots:
+            self.waiting -= 1
+            self.running += 1
+            try:
+                await handle_chat(self.client, message)
+                await chat_lanes.wait(message.chat.id)
+                self.completed += 1
+            except Exception:
+                self.failed += 1
+            finally:
+                self.running -= 1
+        self.latencies.append(time.perf_counter() - arrived)
+
+
+async def sample(run: LoadRun, server: Optional[StubLLMServer], interval: float, timeline: List[Dict], started: float) -> None:
+    from src.utils.tasks import background
+
+    last_completed = 0
+    while True:
+        await asyncio.sleep(interval)
+        completed = run.completed
+        timeline.append({
+            "t": round(time.perf_counter() - started, 2),
+            "throughput": round((completed - last_completed) / interval, 2),
+            "waiting": run.waiting,
+            "running": run.running,
+            "background_tasks": len(background.tasks),
+            "llm_in_flight": server.in_flight if server else None,
+            "rss_mb": round(rss_bytes() / 2**20, 1),
+        })
+        last_completed = completed
+
+
+async def run(args) -> Dict:
+    from src.utils.era import chatbot_api
+    from src.utils.outbox import outbox
+
+    server = None
+    url = args.llm_url
+    if not url:
+        server = StubLLMServer(args.latency, args.error_rate, args.timeout_rate, args.hang, args.seed)
+        url = await server.start(port=0)
+
+    client = install_stubs(args.telegram_latency, mongo_latency=args.mongo_latency, keep_limits=args.keep_limits, stub_llm=False)
+    chatbot_api.api_url = url
+
+    trace = load_trace(args.trace, args.speed) if args.trace else synthetic_trace(args.rate, args.duration, args.seed)
+    if args.record_trace:
+        save_trace(trace, args.record_trace)
+
+    rng = random.Random(args.seed)
+    load = LoadRun(client, args.concurrency)
+    timeline: List[Dict] = []
+    rss_start = rss_bytes()
+
+    started = time.perf_counter()
+    sampler = asyncio.create_task(sample(load, server, args.sample_interval, timeline, started))
+    deliveries = []
+    for index, entry in enumerate(trace):
+        delay = started + entry["at"] - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        message = build_message(index + 1, entry.get("kind", "private"), rng, client, text=entry.get("text"))
+        deliveries.append(asyncio.create_task(load.deliver(message, time.perf_counter())))
+
+    await asyncio.gather(*deliveries)
+    elapsed = time.perf_counter() - started
+    await outbox.drain()
+    sampler.cancel()
+
+    await chatbot_api.close()
+    if server:
+        await server.stop()
+
+    return {
+        "meta": {**report.metadata(), "args": vars(args), "llm_url": url},
+        "summary": {
+            "messages": len(trace),
+            "completed": load.completed,
+            "failed": load.failed,
+            "replies": client.sent,
+            "elapsed_seconds": round(elapsed, 2),
+            "messages_per_second": round(load.completed / elapsed, 2) if elapsed else 0.0,
+            "max_waiting": max((point["waiting"] for point in timeline), default=0),
+            "rss_growth_bytes": rss_bytes() - rss_start,
+        },
+        "latency_ms": report.percentiles(load.latencies, 1000),
+        "llm_server": server.stats() if server else None,
+        "timeline": timeline,
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m bench.load", description="Trace-replay load test for the handler stack.")
+    parser.add_argument("--rate", type=float, default=20.0, help="synthetic messages per second")
+    parser.add_argument("--duration", type=float, default=60.0, help="length of the synthetic trace in seconds")
+    parser.add_argument("--trace", help="JSON lines trace to replay instead of a synthetic one")
+    parser.add_argument("--speed", type=float, default=1.0, help="replay speed multiplier for --trace")
+    parser.add_argument("--record-trace", help="write the trace that was replayed to this file")
+    parser.add_argument("--concurrency", type=int, default=32, help="handlers allowed to run at once")
+    parser.add_argument("--sample-interval", type=float, default=1.0, help="seconds between timeline samples")
+    parser.add_argument("--llm-url", help="use an already running stub (python -m bench.stub_llm)")
+    parser.add_argument("--telegram-latency", type=float, default=0.05, help="seconds added to every stub send")
+    parser.add_argument("--mongo-latency", type=float, default=0.02, help="seconds added to every stub Mongo call")
+    parser.add_argument("--keep-limits", action="store_true", help="keep rate limiting and the engagement policy on")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", help="where to write the JSON results")
+    add_server_arguments(parser)
+    args = parser.parse_args(argv)
+
+    results = asyncio.run(run(args))
+    path = report.save(results, args.output)
+
+    for point in results["timeline"]:
+        print(
+            f"t={point['t']:>6}s  {point['throughput']:>7}/s  waiting={point['waiting']:<5} "
+            f"running={point['running']:<4} llm={point['llm_in_flight']}  rss={point['rss_mb']}MB"
+        )
+    print(json.dumps({key: results[key] for key in ("summary", "latency_ms", "llm_server")}, indent=2))
+    print(f"\nSaved results to {path}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
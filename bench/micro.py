@@ -0,0 +1,70 @@
+import json
+import random
+import time
+from typing import Callable, Dict, List, Sequence, Tuple
+
+from .equivalence import legacy_validate_response
+from .fixtures import TEXTS
+from .report import percentiles
+from .stubs import REPLIES
+
+MESSAGE_TYPES = ["casual", "greetings", "flirty", "dry_reply", "emotional", "adult"]
+
+
+def time_calls(function: Callable, arguments: Sequence[Tuple], iterations: int) -> Dict:
+    """Call `function` `iterations` times cycling through `arguments`; report microseconds per call."""
+    samples: List[float] = []
+    clock = time.perf_counter_ns
+    for args in arguments:
+        function(*args)  # warm caches before timing
+    for index in range(iterations):
+        args = arguments[index % len(arguments)]
+        started = clock()
+        function(*args)
+        samples.append(clock() - started)
+    return percentiles(samples, 1 / 1000)
+
+
+def payload_cases(prompt_builder, messages: List[Tuple], rng: random.Random) -> List[Tuple]:
+    """(system prompt, history) pairs shaped like ask_question's, with up to 10 history entries."""
+    cases = []
+    for message, is_group in messages:
+        history = [
+            {"role": "user" if index % 2 == 0 else "assistant", "content": rng.choice(TEXTS + REPLIES)}
+            for index in range(rng.randint(1, 10))
+        ]
+        cases.append((prompt_builder.build_system_prompt(message, is_group=is_group), history))
+    return cases
+
+
+def run_micro(iterations: int = 2000, seed: int = 7) -> Dict:
+    from src.utils import codec
+    from src.utils.prompt_builder import is_emoji, prompt_builder
+
+    rng = random.Random(seed)
+    messages = [(text, rng.random() < 0.5) for text in TEXTS]
+    replies = [(reply, rng.choice(MESSAGE_TYPES)) for reply in REPLIES]
+    payloads = payload_cases(prompt_builder, messages, rng)
+    bodies = [(json.dumps({"reply": reply}).encode("utf-8"),) for reply, _ in replies]
+
+    return {
+        "json_backend": codec.BACKEND,
+        "encode_payload_us": time_calls(codec.payload_encoder.encode, payloads, iterations),
+        # What aiohttp's json= did before: stdlib dumps of the whole payload every request
+        "encode_payload_stdlib_us": time_calls(
+            lambda prompt, history: json.dumps({"messages": [{"role": "system", "content": prompt}] + history}).encode("utf-8"),
+            payloads, iterations
+        ),
+        "decode_reply_us": time_calls(codec.loads, bodies, iterations),
+        "decode_reply_stdlib_us": time_calls(lambda body: json.loads(body.decode("utf-8")), bodies, iterations),
+        "build_system_prompt_us": time_calls(
+            lambda message, is_group: prompt_builder.build_system_prompt(message, is_group=is_group),
+            messages, iterations
+        ),
+        "detect_message_type_us": time_calls(prompt_builder.detect_message_type, messages, iterations),
+        "validate_response_us": time_calls(prompt_builder.validate_response, replies, iterations),
+        "validate_response_legacy_us": time_calls(
+            lambda reply, msg_type: legacy_validate_response(prompt_builder, reply, msg_type, is_emoji),
+            replies, iterations
+        ),
+    }
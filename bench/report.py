@@ -0,0 +1,90 @@
+import json
+import os
+import platform
+import subprocess
+import time
+from typing import Dict, List, Sequence, Tuple
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+
+
+def percentiles(values: Sequence[float], scale: float = 1.0) -> Dict[str, float]:
+    """p50/p95/p99/mean/max of `values`, multiplied by `scale`."""
+    if not values:
+        return {"count": 0}
+    ordered = sorted(values)
+    last = len(ordered) - 1
+
+    def pick(q: float) -> float:
+        return round(ordered[min(last, int(q * len(ordered)))] * scale, 4)
+
+    return {
+        "count": len(ordered),
+        "mean": round(sum(ordered) / len(ordered) * scale, 4),
+        "p50": pick(0.50),
+        "p95": pick(0.95),
+        "p99": pick(0.99),
+        "max": round(ordered[-1] * scale, 4),
+    }
+
+
+def metadata() -> Dict:
+    try:
+        revision = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, cwd=os.path.dirname(__file__), timeout=5
+        ).stdout.strip()
+    except Exception:
+        revision = ""
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "revision": revision,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+    }
+
+
+def save(results: Dict, path: str = None) -> str:
+    if path is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        path = os.path.join(RESULTS_DIR, time.strftime("%Y%m%d-%H%M%S") + ".json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2, ensure_ascii=False)
+    return path
+
+
+def _flatten(data: Dict, prefix: str = "") -> Dict[str, float]:
+    flat = {}
+    for key, value in data.items():
+        name = f"{prefix}.{key}" if prefix else key
+        if isinstance(value, dict):
+            flat.update(_flatten(value, name))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[name] = value
+    return flat
+
+
+# Metrics where a bigger number is better; everything else compared is a cost
+_HIGHER_IS_BETTER = ("per_second",)
+_COMPARED = ("per_second", ".p50", ".p95", ".p99", ".mean", "_bytes", "_blocks")
+
+
+def compare(current: Dict, baseline: Dict, threshold: float = 0.10) -> Tuple[List[str], List[str]]:
+    """Return (report lines, regressions) for every metric present in both runs."""
+    now, before = _flatten(current), _flatten(baseline)
+    lines, regressions = [], []
+
+    for name in sorted(set(now) & set(before)):
+        if name.startswith("meta") or not any(marker in name for marker in _COMPARED):
+            continue
+        old, new = before[name], now[name]
+        if not old:
+            continue
+        change = (new - old) / abs(old)
+        worse = -change if any(marker in name for marker in _HIGHER_IS_BETTER) else change
+        flag = "REGRESSION" if worse > threshold else ""
+        lines.append(f"{name:<55} {old:>12.4f} -> {new:>12.4f} ({change:+.1%}) {flag}")
+        if flag:
+            regressions.append(name)
+
+    return lines, regressions
@@ -0,0 +1,123 @@
+"""Local stand-in for the LLM `/chat` endpoint with configurable latency and failures.
+
+Usage: python -m bench.stub_llm [--port 8787] [--latency lognormal:0.8,0.5]
+                                [--error-rate 0.02] [--timeout-rate 0.01]
+
+Latency specs: fixed:S, uniform:LOW,HIGH, normal:MEAN,STDDEV,
+lognormal:MEDIAN,SIGMA, exponential:MEAN (all in seconds).
+"""
+import argparse
+import asyncio
+import math
+import random
+from typing import Callable, Optional
+
+from aiohttp import web
+
+from .stubs import REPLIES
+
+
+def parse_latency(spec: str, rng: random.Random) -> Callable[[], float]:
+    kind, _, params = spec.partition(":")
+    values = [float(value) for value in params.split(",") if value]
+
+    if kind == "fixed":
+        return lambda: values[0]
+    if kind == "uniform":
+        return lambda: rng.uniform(values[0], values[1])
+    if kind == "normal":
+        return lambda: max(0.0, rng.gauss(values[0], values[1]))
+    if kind == "lognormal":
+        return lambda: rng.lognormvariate(math.log(values[0]), values[1])
+    if kind == "exponential":
+        return lambda: rng.expovariate(1 / values[0])
+    raise ValueError(f"Unknown latency distribution: {spec}")
+
+
+class StubLLMServer:
+    def __init__(self, latency: str = "fixed:0.5", error_rate: float = 0.0, timeout_rate: float = 0.0, hang: float = 30.0, seed: int = 7):
+        self.rng = random.Random(seed)
+        self.latency = parse_latency(latency, self.rng)
+        self.error_rate = error_rate
+        self.timeout_rate = timeout_rate
+        self.hang = hang
+        self.requests = 0
+        self.in_flight = 0
+        self.errors = 0
+        self.timeouts = 0
+        self._runner: Optional[web.AppRunner] = None
+
+    async def handle_chat(self, request: web.Request) -> web.Response:
+        self.requests += 1
+        self.in_flight += 1
+        try:
+            await request.read()
+            roll = self.rng.random()
+            if roll < self.timeout_rate:
+                # Longer than the bot's client timeout, so the caller gives up first
+                self.timeouts += 1
+                await asyncio.sleep(self.hang)
+            await asyncio.sleep(self.latency())
+            if roll < self.timeout_rate + self.error_rate:
+                self.errors += 1
+                return web.json_response({"error": "stub failure"}, status=500)
+            return web.json_response({"reply": self.rng.choice(REPLIES)})
+        finally:
+            self.in_flight -= 1
+
+    async def start(self, host: str = "127.0.0.1", port: int = 8787) -> str:
+        server = web.Application()
+        server.router.add_post("/chat", self.handle_chat)
+        self._runner = web.AppRunner(server, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        bound_port = self._runner.addresses[0][1]
+        return f"http://{host}:{bound_port}/chat"
+
+    async def stop(self) -> None:
+        if self._runner:
+            await self._runner.cleanup()
+
+    def stats(self) -> dict:
+        return {
+            "requests": self.requests,
+            "in_flight": self.in_flight,
+            "errors": self.errors,
+            "timeouts": self.timeouts,
+        }
+
+
+def add_server_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--latency", default="lognormal:0.8,0.5", help="latency distribution of /chat replies")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests answered with HTTP 500")
+    parser.add_argument("--timeout-rate", type=float, default=0.0, help="fraction of requests that hang past the client timeout")
+    parser.add_argument("--hang", type=float, default=30.0, help="seconds a timed-out request hangs")
+
+
+async def serve(args) -> None:
+    server = StubLLMServer(args.latency, args.error_rate, args.timeout_rate, args.hang, args.seed)
+    url = await server.start(args.host, args.port)
+    print(f"Stub LLM listening on {url}")
+    try:
+        while True:
+            await asyncio.sleep(10)
+            print(f"stub stats: {server.stats()}")
+    finally:
+        await server.stop()
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m bench.stub_llm", description="Serve a fake /chat endpoint.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8787)
+    parser.add_argument("--seed", type=int, default=7)
+    add_server_arguments(parser)
+    try:
+        asyncio.run(serve(parser.parse_args(argv)))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
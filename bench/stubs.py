@@ -0,0 +1,188 @@
+import asyncio
+import json
+import random
+from typing import Callable, Dict, List, Optional
+
+from .fixtures import bot_user
+
+# Replies shaped like the LLM's output, including ones validate_response must trim
+REPLIES = [
+    "haan yaar, samajh sakti hoon 😊",
+    "arre wah, ye toh mast hai! aur batao kya plan hai weekend ka, kahin ghoomne ja rahe ho kya?",
+    "hmm, boring din ho toh chai aur gaane best hai ✨",
+    "acha ji, aap bhi na 😉",
+    "sorry yaar, aaj ka din thoda heavy laga hoga. koi baat nahi, kal better hoga, bas thoda rest karo aur apna khayal rakho please",
+    "exam ki tension mat lo, abhi bhi time hai. ek ek chapter karke revise karo, ho jayega, trust me 💕",
+    "haha ye toh funny tha",
+    "nahi yaar, aise baat mat karo, let's talk normally",
+]
+
+
+class StubClient:
+    """Stands in for the pyrogram client: records sends instead of calling Telegram."""
+
+    def __init__(self, latency: float = 0.0):
+        self.me = bot_user()
+        self.latency = latency
+        self.sent = 0
+        self.chat_actions = 0
+
+    async def send_message(self, chat_id, text, **kwargs):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        self.sent += 1
+
+    async def send_chat_action(self, chat_id, action, **kwargs):
+        self.chat_actions += 1
+        return True
+
+
+class _UpdateResult:
+    def __init__(self, upserted_id=None):
+        self.upserted_id = upserted_id
+
+
+class _DeleteResult:
+    def __init__(self, deleted_count: int):
+        self.deleted_count = deleted_count
+
+
+class FakeCollection:
+    """In-memory stand-in for the handful of Motor collection calls the bot makes."""
+
+    def __init__(self, key: str, latency: float = 0.0):
+        self.key = key
+        self.latency = latency
+        self.docs: Dict = {}
+        self.operations = 0
+
+    async def _op(self):
+        self.operations += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+    async def find_one(self, query: Dict, *args, **kwargs):
+        await self._op()
+        return self.docs.get(query.get(self.key))
+
+    async def insert_one(self, document: Dict, *args, **kwargs):
+        await self._op()
+        self.docs[document[self.key]] = dict(document)
+
+    async def update_one(self, query: Dict, update: Dict, upsert: bool = False, **kwargs):
+        await self._op()
+        key = query.get(self.key)
+        document = self.docs.get(key)
+        if document is None:
+            if not upsert:
+                return _UpdateResult()
+            document = self.docs[key] = {self.key: key, **update.get("$setOnInsert", {})}
+            document.update(update.get("$set", {}))
+            return _UpdateResult(key)
+        document.update(update.get("$set", {}))
+        return _UpdateResult()
+
+    async def delete_one(self, query: Dict, *args, **kwargs):
+        await self._op()
+        return _DeleteResult(1 if self.docs.pop(query.get(self.key), None) else 0)
+
+    async def delete_many(self, query: Dict, *args, **kwargs):
+        await self._op()
+        keys = query.get(self.key, {}).get("$in", []) if isinstance(query.get(self.key), dict) else []
+        return _DeleteResult(sum(1 for key in keys if self.docs.pop(key, None)))
+
+    async def count_documents(self, query: Dict, *args, **kwargs):
+        await self._op()
+        return len(self.docs)
+
+    async def estimated_document_count(self, *args, **kwargs):
+        await self._op()
+        return len(self.docs)
+
+    def find(self, *args, **kwargs):
+        return self._iterate()
+
+    async def _iterate(self):
+        await self._op()
+        for document in list(self.docs.values()):
+            yield document
+
+
+class StubResponse:
+    def __init__(self, status: int, body: bytes, latency: float):
+        self.status = status
+        self._body = body
+        self._latency = latency
+
+    async def __aenter__(self):
+        if self._latency:
+            await asyncio.sleep(self._latency)
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def read(self) -> bytes:
+        return self._body
+
+    async def json(self, **kwargs):
+        return json.loads(self._body)
+
+
+def _encode_reply(reply: str) -> bytes:
+    return json.dumps({"reply": reply}).encode("utf-8")
+
+
+class StubSession:
+    """Answers `session.post` like the /chat endpoint, without any sockets."""
+
+    def __init__(self, latency: float = 0.0, seed: int = 7, replies: Optional[List[str]] = None):
+        self.latency = latency
+        self.rng = random.Random(seed)
+        self.replies = replies or REPLIES
+        self.requests = 0
+        self.closed = False
+
+    def post(self, url, json=None, data=None, **kwargs):
+        self.requests += 1
+        return StubResponse(200, _encode_reply(self.rng.choice(self.replies)), self.latency)
+
+    async def close(self):
+        self.closed = True
+
+
+def install_stubs(
+    telegram_latency: float = 0.0,
+    llm_latency: float = 0.0,
+    mongo_latency: float = 0.0,
+    keep_limits: bool = False,
+    stub_llm: bool = True,
+    patch: Callable[[object, str, object], None] = setattr
+) -> StubClient:
+    """Point the bot's Mongo collections (and LLM session, if `stub_llm`) at stubs and return a stub client.
+
+    Every global is replaced through `patch`; tests pass `monkeypatch.setattr`
+    so the originals come back after each test.
+    """
+    from src.database import chats
+    from src.utils.era import chatbot_api
+    from src.utils.engagement import EngagementPolicy, engagement
+    from src.utils.outbox import outbox
+    from src.utils.rate_limit import rate_limiter
+
+    patch(chats, "usersdb", FakeCollection("user_id", mongo_latency))
+    patch(chats, "chatsdb", FakeCollection("chat_id", mongo_latency))
+    if stub_llm:
+        patch(chatbot_api, "session", StubSession(llm_latency))
+
+    if not keep_limits:
+        # Measure the full path: every message that routing accepts reaches the LLM
+        for limit in ("user_limit", "chat_limit", "global_limit"):
+            patch(rate_limiter, limit, (0, 0))
+        patch(engagement, "policy", EngagementPolicy())
+        # Telegram's send limits would otherwise pace the stub client
+        patch(outbox, "global_bucket", None)
+        patch(outbox, "group_rate", 0)
+        patch(outbox, "private_rate", 0)
+
+    return StubClient(telegram_latency)
@@ -11,5 +11,82 @@ OWNER_ID = int(getenv("OWNER_ID", "0"))
 
 MONGO_URL = getenv("MONGO_URL", "")
 
+# Mongo Clients (one shared client per distinct URI)
+MONGO_MAX_POOL_SIZE = int(getenv("MONGO_MAX_POOL_SIZE", "50"))
+MONGO_MIN_POOL_SIZE = int(getenv("MONGO_MIN_POOL_SIZE", "0"))
+MONGO_CONNECT_TIMEOUT_MS = int(getenv("MONGO_CONNECT_TIMEOUT_MS", "10000"))
+MONGO_SERVER_SELECTION_TIMEOUT_MS = int(getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", "10000"))
+MONGO_COMPRESSORS = getenv("MONGO_COMPRESSORS", "")  # e.g. "zstd,zlib"; zstd/snappy need their packages
+TEMP_MONGO_MAX_POOL_SIZE = int(getenv("TEMP_MONGO_MAX_POOL_SIZE", "5"))  # Pool size for each temp shard
+MONGO_CLIENT_OPTIONS = getenv("MONGO_CLIENT_OPTIONS", "")  # JSON: {"<host or URI>": {"maxPoolSize": 10, ...}}
+
 # Chat History Management
 CHAT_HISTORY_DAYS = int(getenv("CHAT_HISTORY_DAYS", "2"))  # Default 2 days retention
+
+
+# Event Loop
+USE_UVLOOP = getenv("USE_UVLOOP", "False").lower() in ("true", "1", "yes")  # Needs `pip install uvloop`
+
+# Update Processing
+UPDATE_WORKERS = int(getenv("UPDATE_WORKERS", "8"))  # Pyrogram workers; handlers only parse and hand off to chat lanes
+CHAT_LANE_WORKERS = int(getenv("CHAT_LANE_WORKERS", "32"))  # Chats processed at once; freed while waiting on the LLM
+CHAT_LANE_MAX_DEPTH = int(getenv("CHAT_LANE_MAX_DEPTH", "50"))  # Updates queued per chat before new ones are dropped
+
+# Temp Store Write Batching
+TEMP_WRITE_BATCH_SIZE = int(getenv("TEMP_WRITE_BATCH_SIZE", "100"))  # Upserts per bulk_write
+TEMP_WRITE_FLUSH_INTERVAL = float(getenv("TEMP_WRITE_FLUSH_INTERVAL", "2"))  # Seconds before a partial batch is flushed
+TEMP_WRITE_MAX_PENDING = int(getenv("TEMP_WRITE_MAX_PENDING", "1000"))  # Buffered users per shard before callers wait
+
+# Runtime State (chat history, user memories, rate-limit buckets)
+STATE_BACKEND = getenv("STATE_BACKEND", "memory")  # memory (this process only) or mongo (shared between replicas)
+
+# Rate Limiting (tokens per second / bucket size, rate 0 disables a scope)
+RATE_LIMIT_USER_RATE = float(getenv("RATE_LIMIT_USER_RATE", "1"))
+RATE_LIMIT_USER_BURST = float(getenv("RATE_LIMIT_USER_BURST", "1"))
+RATE_LIMIT_CHAT_RATE = float(getenv("RATE_LIMIT_CHAT_RATE", "0.5"))
+RATE_LIMIT_CHAT_BURST = float(getenv("RATE_LIMIT_CHAT_BURST", "5"))
+RATE_LIMIT_GLOBAL_RATE = float(getenv("RATE_LIMIT_GLOBAL_RATE", "10"))
+RATE_LIMIT_GLOBAL_BURST = float(getenv("RATE_LIMIT_GLOBAL_BURST", "20"))
+RATE_LIMIT_EVICT_INTERVAL = float(getenv("RATE_LIMIT_EVICT_INTERVAL", "300"))  # Seconds between idle bucket sweeps
+
+# Group Engagement (unsolicited group messages; mentions and replies to the bot are always answered)
+ENGAGEMENT_POLICY = getenv("ENGAGEMENT_POLICY", "budget")  # budget, probability, always or never
+ENGAGEMENT_REPLIES_PER_MINUTE = float(getenv("ENGAGEMENT_REPLIES_PER_MINUTE", "3"))  # Used by the budget policy
+ENGAGEMENT_PROBABILITY = float(getenv("ENGAGEMENT_PROBABILITY", "0.1"))  # Used by the probability policy
+
+# LLM Scheduling (private chats, then mentions and replies, then unsolicited group messages)
+LLM_MAX_CONCURRENCY = int(getenv("LLM_MAX_CONCURRENCY", "16"))  # LLM requests in flight at once
+LLM_MAX_QUEUED = int(getenv("LLM_MAX_QUEUED", "100"))  # Waiting messages before the least important are dropped
+LLM_WEIGHT_PRIVATE = float(getenv("LLM_WEIGHT_PRIVATE", "4"))  # Share of slots relative to the other classes
+LLM_WEIGHT_MENTION = float(getenv("LLM_WEIGHT_MENTION", "2"))
+LLM_WEIGHT_AMBIENT = float(getenv("LLM_WEIGHT_AMBIENT", "1"))
+
+# Outgoing Replies (queued per chat under Telegram's send limits, rate 0 disables a limit)
+SEND_GLOBAL_RATE = float(getenv("SEND_GLOBAL_RATE", "25"))  # Messages per second across all chats (Telegram allows ~30)
+SEND_GROUP_RATE_PER_MINUTE = float(getenv("SEND_GROUP_RATE_PER_MINUTE", "20"))  # Per group
+SEND_PRIVATE_RATE = float(getenv("SEND_PRIVATE_RATE", "1"))  # Messages per second per private chat
+SEND_CHAT_BURST = float(getenv("SEND_CHAT_BURST", "3"))  # Messages a chat may send back to back
+SEND_MAX_AGE = float(getenv("SEND_MAX_AGE", "30"))  # Seconds before a queued reply is dropped as stale
+SEND_MAX_QUEUED_PER_CHAT = int(getenv("SEND_MAX_QUEUED_PER_CHAT", "20"))  # Oldest reply is dropped beyond this
+
+# Broadcast
+BROADCAST_INVALID_STRIKES = int(getenv("BROADCAST_INVALID_STRIKES", "3"))  # Broadcasts in a row a peer must fail to resolve before it's removed
+
+# Audience Stats (/stats counters, flushed to the stats collection)
+STATS_FLUSH_INTERVAL = float(getenv("STATS_FLUSH_INTERVAL", "60"))  # Seconds between flushes
+
+# Event Loop Watchdog (lag is measured continuously; stalls past the threshold are logged and sent to the log chat)
+LOOP_LAG_INTERVAL = float(getenv("LOOP_LAG_INTERVAL", "0.5"))  # Seconds between lag measurements
+LOOP_LAG_THRESHOLD = float(getenv("LOOP_LAG_THRESHOLD", "1"))  # Seconds of lag that count as a stall, 0 disables stall reports
+LOOP_LAG_ALERT_INTERVAL = float(getenv("LOOP_LAG_ALERT_INTERVAL", "300"))  # Minimum seconds between alerts in the log chat
+
+# Metrics (Prometheus text at http://METRICS_HOST:METRICS_PORT/metrics, port 0 disables it)
+METRICS_HOST = getenv("METRICS_HOST", "127.0.0.1")
+METRICS_PORT = int(getenv("METRICS_PORT", "9464"))
+
+# Logging (records are queued and written by a background thread)
+LOG_LEVEL = getenv("LOG_LEVEL", "INFO")
+LOG_FILE = getenv("LOG_FILE", "log.txt")
+LOG_MAX_BYTES = int(getenv("LOG_MAX_BYTES", str(5 * 1024 * 1024)))  # Rotate log.txt at this size
+LOG_BACKUP_COUNT = int(getenv("LOG_BACKUP_COUNT", "3"))  # Rotated files kept
+LOG_RATE_LIMIT = int(getenv("LOG_RATE_LIMIT", "20"))  # Records per minute per message template, 0 disables
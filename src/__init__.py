@@ -1,25 +1,105 @@
 import time
+
+BOOT_STARTED = time.perf_counter()
+
+import asyncio
+import atexit
 import logging
-import pyrogram
-from motor.motor_asyncio import AsyncIOMotorClient
+import queue
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 
 import config
 
-logging.basicConfig(
-    level=logging.INFO,
-    format="[%(asctime)s - %(levelname)s] - %(name)s - %(message)s",
-    datefmt="%d-%b-%y %H:%M:%S",
-    handlers=[
-        logging.FileHandler("log.txt"),
-        logging.StreamHandler(),
-    ],
-)
+
+def install_uvloop() -> bool:
+    # pyrogram creates its event loop while being imported, so this has to run first
+    if not config.USE_UVLOOP:
+        return False
+    try:
+        import uvloop
+    except ImportError:
+        return False
+    asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+    return True
+
+
+UVLOOP = install_uvloop()
+
+import pyrogram
+
+
+class RateLimitFilter(logging.Filter):
+    """Lets through `limit` records per minute for each message template."""
+
+    def __init__(self, limit: int, window: float = 60.0):
+        super().__init__()
+        self.limit = limit
+        self.window = window
+        self.windows = {}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if self.limit <= 0 or record.levelno >= logging.CRITICAL:
+            return True
+
+        key = (record.name, record.msg)
+        started, count, suppressed = self.windows.get(key, (record.created, 0, 0))
+        if record.created - started >= self.window:
+            if suppressed:
+                record.msg = f"{record.msg} (suppressed {suppressed} similar)"
+            started, count, suppressed = record.created, 0, 0
+
+        if count >= self.limit:
+            self.windows[key] = (started, count, suppressed + 1)
+            return False
+        self.windows[key] = (started, count + 1, suppressed)
+        return True
+
+
+def setup_logging() -> QueueListener:
+    """Handlers run on the listener thread so the event loop never waits on disk."""
+    formatter = logging.Formatter(
+        "[%(asctime)s - %(levelname)s] - %(name)s - %(message)s",
+        datefmt="%d-%b-%y %H:%M:%S",
+    )
+    file_handler = RotatingFileHandler(
+        config.LOG_FILE,
+        maxBytes=config.LOG_MAX_BYTES,
+        backupCount=config.LOG_BACKUP_COUNT,
+        encoding="utf-8",
+    )
+    stream_handler = logging.StreamHandler()
+    for handler in (file_handler, stream_handler):
+        handler.setFormatter(formatter)
+
+    queue_handler = QueueHandler(queue.SimpleQueue())
+    # prepare() formats before enqueueing; keep that to the bare message
+    queue_handler.setFormatter(logging.Formatter("%(message)s"))
+    queue_handler.addFilter(RateLimitFilter(config.LOG_RATE_LIMIT))
+    logging.basicConfig(level=config.LOG_LEVEL.upper(), handlers=[queue_handler], force=True)
+
+    listener = QueueListener(queue_handler.queue, file_handler, stream_handler, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+    return listener
+
+
+log_listener = setup_logging()
 
 logging.getLogger("pymongo").setLevel(logging.ERROR)
 logging.getLogger("pyrogram").setLevel(logging.ERROR)
 logger = logging.getLogger(__name__)
 
-db = AsyncIOMotorClient(config.MONGO_URL).EraChatBot
+if config.USE_UVLOOP and not UVLOOP:
+    logger.warning("USE_UVLOOP is set but uvloop isn't installed, using the default event loop")
+
+
+def __getattr__(name):
+    # `db` shares the registry's client for MONGO_URL, created on first use
+    if name == "db":
+        from src.utils.mongo import mongo_clients
+        return mongo_clients.get(config.MONGO_URL, name="main").EraChatBot
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 
 START_TIME = time.time()
 
@@ -32,6 +112,7 @@ class Bot(pyrogram.Client):
             api_hash=config.API_HASH,
             bot_token=config.BOT_TOKEN,
             parse_mode=pyrogram.enums.ParseMode.HTML,
+            workers=config.UPDATE_WORKERS,
             max_concurrent_transmissions=7,
         )
         self.owner = config.OWNER_ID
@@ -45,7 +126,22 @@ class Bot(pyrogram.Client):
         self.mention = self.me.mention
 
     async def stop(self):
+        from src.utils.audience import audience
+        from src.utils.lanes import chat_lanes
+        from src.utils.mongo import mongo_clients
+        from src.utils.outbox import outbox
+        from src.utils.storage import temp_users_manager
+        from src.utils.tasks import background
+        from src.utils.watchdog import loop_watchdog
+
+        loop_watchdog.stop()
+        await chat_lanes.drain()
+        await outbox.drain()
+        await background.drain()
+        await temp_users_manager.close_all_connections()
+        await audience.close()
         await super().stop()
+        mongo_clients.close_all()
 
 
 app = Bot()
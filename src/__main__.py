@@ -1,35 +1,67 @@
 import asyncio
 import importlib
+import time
 
 import pyrogram
 from pyrogram import idle
 
-from src import app, logger
+import config
+from src import BOOT_STARTED, app, logger
+from src.database import ping as ping_database
 from src.modules import ALL_MODULES
+from src.utils.audience import audience
+from src.utils.era import chatbot_api
+from src.utils.indexes import ensure_indexes
+from src.utils.metrics import start_metrics_server
+from src.utils.prompt_builder import prompt_builder
+from src.utils.startup import startup
+from src.utils.watchdog import loop_watchdog
 
 
 async def main():
+    startup.add("imports", time.perf_counter() - BOOT_STARTED)
     logger.info("Bot is starting...")
     
-    await app.start()
+    # Handlers register on `app` when imported, so load them before updates can arrive.
+    # chat_handler goes first so its handlers are registered ahead of the others.
+    with startup.phase("modules"):
+        importlib.import_module("src.modules.chat_handler")
+        for module in ALL_MODULES:
+            if module != "chat_handler":
+                importlib.import_module(f"src.modules.{module}")
+    logger.info("Loaded %d modules.", len(ALL_MODULES))
+    
+    # Warmups don't depend on the Telegram login, so they run while it happens
+    warmups = asyncio.gather(
+        startup.warmup("mongo", ping_database()),
+        startup.warmup("llm_pool", chatbot_api.warmup()),
+        startup.warmup("prompts", prompt_builder.preload()),
+        startup.warmup("indexes", ensure_indexes(), timeout=60),
+    )
+    await startup.timed("telegram", app.start())
+    startup.mark_ready()
+    audience.start()
+    loop_watchdog.start(app, app.logger)
+    await warmups
+    logger.info("Bot started as @%s, %s", app.username, startup.summary())
     
     try:
-        await app.send_message(app.logger, "Bot Started")
+        await app.send_message(app.logger, f"Bot Started\n<code>{startup.summary()}</code>")
     except Exception as ex:
         raise SystemExit(f"Bot has failed to access the log group: {app.logger}")
-    
-    # Import chat_handler first to ensure it loads before other modules
-    importlib.import_module("src.modules.chat_handler")
-    
-    for module in ALL_MODULES:
-        if module != "chat_handler":  # Skip chat_handler as it's already imported
-            importlib.import_module(f"src.modules.{module}")
-    logger.info(f"Loaded {len(ALL_MODULES)} modules.")
-    
-    logger.info(f"Bot started as @{app.username}")
+
+    metrics_runner = None
+    if config.METRICS_PORT:
+        try:
+            metrics_runner = await start_metrics_server(config.METRICS_HOST, config.METRICS_PORT)
+            logger.info("Metrics served on http://%s:%s/metrics", config.METRICS_HOST, config.METRICS_PORT)
+        except OSError as ex:
+            logger.warning("Metrics endpoint disabled: %s", ex)
 
     await idle()
     
+    if metrics_runner:
+        await metrics_runner.cleanup()
     await app.stop()
     logger.info("Bot stopped.")
 
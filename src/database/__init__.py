@@ -1,11 +1,16 @@
-from motor.motor_asyncio import AsyncIOMotorClient
 import config 
+from src.utils.mongo import mongo_clients
 
-ChatBot = AsyncIOMotorClient(config.MONGO_URL)
+ChatBot = mongo_clients.get(config.MONGO_URL, name="main")
 db = ChatBot["Era"]
 
 usersdb = db["users"] # Users Collection
 chatsdb = db["chats"] # Chats Collection
 
 
+async def ping() -> None:
+    """Open the main connection pool ahead of the first query."""
+    await ChatBot.admin.command("ping")
+
+
 from .chats import *
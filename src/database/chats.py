@@ -1,3 +1,7 @@
+from datetime import datetime
+
+from src.utils.audience import audience
+from src.utils.metrics import MONGO_OP_SECONDS
 from . import usersdb, chatsdb
 
 
@@ -9,10 +13,13 @@ async def get_chats() -> dict:
     chats = []
     users = []
 
-    async for chat in chatsdb.find({"chat_id": {"$lt": 0}}):
-        chats.append(chat["chat_id"])
-    async for user in usersdb.find({"user_id": {"$gt": 0}}):
-        users.append(user["user_id"])
+    # Chats where a broadcast found the bot muted are skipped until add_chat clears the mark
+    with MONGO_OP_SECONDS.time(op="find", collection="chats", shard="main"):
+        async for chat in chatsdb.find({"chat_id": {"$lt": 0}, "muted": {"$exists": False}}, {"chat_id": 1, "_id": 0}):
+            chats.append(chat["chat_id"])
+    with MONGO_OP_SECONDS.time(op="find", collection="users", shard="main"):
+        async for user in usersdb.find({"user_id": {"$gt": 0}}, {"user_id": 1, "_id": 0}):
+            users.append(user["user_id"])
 
     return {
         "chats": chats,
@@ -24,19 +31,116 @@ async def add_user(user_id, username=None):
     """
     Adds a user to the database if they don't already exist.
     """
-    if not await usersdb.find_one({"user_id": user_id}):
-        await usersdb.insert_one({"user_id": user_id, "username": username})
+    # One round trip, and the unique index keeps concurrent calls from duplicating
+    with MONGO_OP_SECONDS.time(op="update_one", collection="users", shard="main"):
+        result = await usersdb.update_one(
+            {"user_id": user_id},
+            {"$setOnInsert": {"username": username}, "$unset": {"invalid_strikes": "", "invalid_at": ""}},
+            upsert=True
+        )
+    if result.upserted_id is not None and user_id > 0:
+        audience.added("users")
 
 
 async def add_chat(chat_id, title=None):
     """
     Adds a chat to the database if it doesn't already exist.
     """
-    if not await chatsdb.find_one({"chat_id": chat_id}):
-        await chatsdb.insert_one({"chat_id": chat_id, "title": title})
+    with MONGO_OP_SECONDS.time(op="update_one", collection="chats", shard="main"):
+        result = await chatsdb.update_one(
+            {"chat_id": chat_id},
+            {"$setOnInsert": {"title": title}, "$unset": {"muted": "", "muted_at": ""}},
+            upsert=True
+        )
+    if result.upserted_id is not None and chat_id < 0:
+        audience.added("chats")
 
 async def remove_chat(chat_id):
     """
     Remove a chat from the database when bot leaves or is removed.
     """
-    await chatsdb.delete_one({"chat_id": chat_id})
\ No newline at end of file
+    with MONGO_OP_SECONDS.time(op="delete_one", collection="chats", shard="main"):
+        result = await chatsdb.delete_one({"chat_id": chat_id})
+    if result.deleted_count and chat_id < 0:
+        audience.added("chats", -1)
+
+
+async def remove_recipients(user_ids, chat_ids) -> tuple:
+    """
+    Bulk-remove users and chats that can no longer be messaged.
+    Returns (users removed, chats removed).
+    """
+    removed = []
+    for collection, field, ids, kind in (
+        (usersdb, "user_id", list(user_ids), "users"),
+        (chatsdb, "chat_id", list(chat_ids), "chats"),
+    ):
+        count = 0
+        for start in range(0, len(ids), 1000):
+            with MONGO_OP_SECONDS.time(op="delete_many", collection=kind, shard="main"):
+                result = await collection.delete_many({field: {"$in": ids[start:start + 1000]}})
+            count += result.deleted_count
+        if count:
+            audience.added(kind, -count)
+        removed.append(count)
+    return tuple(removed)
+
+
+async def mark_muted_chats(chat_ids, reason) -> int:
+    """
+    Flag chats where the bot can't write, so broadcasts skip them.
+    """
+    chat_ids = list(chat_ids)
+    if not chat_ids:
+        return 0
+    with MONGO_OP_SECONDS.time(op="update_many", collection="chats", shard="main"):
+        result = await chatsdb.update_many(
+            {"chat_id": {"$in": chat_ids}},
+            {"$set": {"muted": reason, "muted_at": datetime.utcnow()}}
+        )
+    return result.modified_count
+
+
+async def strike_invalid_recipients(user_ids, chat_ids, limit) -> tuple:
+    """
+    Count a failed peer lookup against each recipient and remove the ones that
+    reached `limit`. Pyrogram can't resolve peers its session file hasn't seen
+    (e.g. after a redeploy), so one failure isn't proof the chat is gone.
+    Returns (users removed, chats removed).
+    """
+    removed = []
+    for collection, field, ids, kind in (
+        (usersdb, "user_id", list(user_ids), "users"),
+        (chatsdb, "chat_id", list(chat_ids), "chats"),
+    ):
+        count = 0
+        for start in range(0, len(ids), 1000):
+            batch = ids[start:start + 1000]
+            with MONGO_OP_SECONDS.time(op="update_many", collection=kind, shard="main"):
+                await collection.update_many(
+                    {field: {"$in": batch}},
+                    {"$inc": {"invalid_strikes": 1}, "$set": {"invalid_at": datetime.utcnow()}}
+                )
+            with MONGO_OP_SECONDS.time(op="delete_many", collection=kind, shard="main"):
+                result = await collection.delete_many({field: {"$in": batch}, "invalid_strikes": {"$gte": limit}})
+            count += result.deleted_count
+        if count:
+            audience.added(kind, -count)
+        removed.append(count)
+    return tuple(removed)
+
+
+async def clear_invalid_strikes(user_ids, chat_ids) -> None:
+    """
+    Reset the strike count of recipients a broadcast reached.
+    """
+    for collection, field, ids, kind in (
+        (usersdb, "user_id", list(user_ids), "users"),
+        (chatsdb, "chat_id", list(chat_ids), "chats"),
+    ):
+        for start in range(0, len(ids), 1000):
+            with MONGO_OP_SECONDS.time(op="update_many", collection=kind, shard="main"):
+                await collection.update_many(
+                    {field: {"$in": ids[start:start + 1000]}, "invalid_strikes": {"$exists": True}},
+                    {"$unset": {"invalid_strikes": "", "invalid_at": ""}}
+                )
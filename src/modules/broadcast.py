@@ -1,16 +1,93 @@
 import asyncio
+import logging
+import time
+from collections import Counter, defaultdict
 
 from pyrogram import filters
-from pyrogram.errors import FloodWait
+from pyrogram.errors import (
+    ChannelInvalid,
+    ChannelPrivate,
+    ChatAdminRequired,
+    ChatForbidden,
+    ChatIdInvalid,
+    ChatRestricted,
+    ChatSendPlainForbidden,
+    ChatWriteForbidden,
+    FloodWait,
+    InputUserDeactivated,
+    PeerIdInvalid,
+    UserBannedInChannel,
+    UserIsBlocked,
+    UserIsBot,
+)
 from pyrogram.types import Message
 
 from src import app
-from src.database import get_chats
-from config import OWNER_ID
+from src.database import (
+    clear_invalid_strikes,
+    get_chats,
+    mark_muted_chats,
+    remove_recipients,
+    strike_invalid_recipients,
+)
+from config import BROADCAST_INVALID_STRIKES, OWNER_ID
+
+logger = logging.getLogger(__name__)
+
+# Recipients that will never accept a message again; removed after the run
+DEAD = (
+    (UserIsBlocked, "blocked"),
+    (InputUserDeactivated, "deactivated"),
+    (UserIsBot, "bot"),
+    (ChannelPrivate, "kicked"),
+    (ChatForbidden, "kicked"),
+)
+
+# Also raised when the local session just hasn't seen the peer yet, which is
+# every peer after a redeploy wipes the session file; removed only after
+# BROADCAST_INVALID_STRIKES broadcasts in a row fail this way
+INVALID = (
+    (PeerIdInvalid, "invalid"),
+    (ChatIdInvalid, "invalid"),
+    (ChannelInvalid, "invalid"),
+)
+
+# The bot is still in the chat but can't post; marked and skipped until re-added
+MUTED = (
+    (ChatWriteForbidden, "muted"),
+    (ChatSendPlainForbidden, "muted"),
+    (ChatRestricted, "muted"),
+    (UserBannedInChannel, "muted"),
+    (ChatAdminRequired, "muted"),
+)
+
+MAX_FLOOD_RETRIES = 3
+
+
+def classify(error: Exception) -> tuple:
+    """Returns (reason, action) where action is "remove", "strike", "mark" or None."""
+    for errors, action in ((DEAD, "remove"), (INVALID, "strike"), (MUTED, "mark")):
+        for error_type, reason in errors:
+            if isinstance(error, error_type):
+                return reason, action
+    return type(error).__name__, None
+
+
+async def deliver(reply, text, chat_id):
+    for attempt in range(MAX_FLOOD_RETRIES + 1):
+        try:
+            if reply:
+                return await reply.copy(chat_id)
+            return await app.send_message(chat_id, text=text)
+        except FloodWait as fw:
+            if attempt == MAX_FLOOD_RETRIES:
+                raise
+            await asyncio.sleep(fw.value + 1)
+
 
 @app.on_message(filters.command(["broadcast", "gcast"]) & filters.user(OWNER_ID))
 async def broadcast_(_, message: Message):
-    """Broadcasts a single message to all chats and users."""
+    """Broadcasts a single message to all chats and users, then prunes dead recipients."""
 
     reply = message.reply_to_message
     text = message.text.split(None, 1)[1] if len(message.command) > 1 else None
@@ -20,30 +97,68 @@ async def broadcast_(_, message: Message):
 
     progress_msg = await message.reply_text("❖ Broadcasting message, please wait...")
 
-    sent, users, failed = 0, 0, 0
+    started = time.monotonic()
+    sent, users = 0, 0
+    failures = Counter()
+    dead_users, dead_chats = [], []
+    invalid_users, invalid_chats = [], []
+    delivered_users, delivered_chats = [], []
+    muted = defaultdict(list)
+
     data = await get_chats()
     recipients = data["chats"] + data["users"]
 
     for chat_id in recipients:
         try:
-            if reply:
-                await reply.copy(chat_id)
-            else:
-                await app.send_message(chat_id, text=text)
+            await deliver(reply, text, chat_id)
 
             if chat_id < 0:
                 sent += 1
+                delivered_chats.append(chat_id)
             else:
                 users += 1
+                delivered_users.append(chat_id)
 
             await asyncio.sleep(0.2)
 
-        except FloodWait as fw:
-            await asyncio.sleep(fw.value + 1)
-        except:
-            failed += 1
-            continue
+        except Exception as e:
+            reason, action = classify(e)
+            failures[reason] += 1
+            if action == "remove":
+                (dead_chats if chat_id < 0 else dead_users).append(chat_id)
+            elif action == "strike":
+                (invalid_chats if chat_id < 0 else invalid_users).append(chat_id)
+            elif action == "mark" and chat_id < 0:
+                muted[reason].append(chat_id)
+            else:
+                logger.debug("Broadcast to %s failed: %r", chat_id, e)
+
+    removed_users = removed_chats = marked = 0
+    try:
+        removed_users, removed_chats = await remove_recipients(dead_users, dead_chats)
+        struck_users, struck_chats = await strike_invalid_recipients(
+            invalid_users, invalid_chats, BROADCAST_INVALID_STRIKES
+        )
+        removed_users += struck_users
+        removed_chats += struck_chats
+        await clear_invalid_strikes(delivered_users, delivered_chats)
+        for reason, chat_ids in muted.items():
+            marked += await mark_muted_chats(chat_ids, reason)
+    except Exception as e:
+        logger.error("Error pruning broadcast recipients: %s", e)
+
+    lines = [
+        f"Broadcasted message to {sent} chats and {users} from the bot.",
+        f"Took {time.monotonic() - started:.0f}s for {len(recipients)} recipients.",
+    ]
+    if failures:
+        lines.append(f"\nFailed: {sum(failures.values())}")
+        lines.extend(f"  {reason}: {count}" for reason, count in failures.most_common())
+        lines.append(f"\nRemoved {removed_users} users and {removed_chats} chats, marked {marked} chats as muted.")
+        if invalid_users or invalid_chats:
+            lines.append(
+                f"{len(invalid_users) + len(invalid_chats)} recipients couldn't be resolved; "
+                f"they're removed after {BROADCAST_INVALID_STRIKES} broadcasts in a row fail."
+            )
 
-    await progress_msg.edit_text(
-        f"Broadcasted message to {sent} chats and {users} from the bot."
-    )
\ No newline at end of file
+    await progress_msg.edit_text("\n".join(lines))
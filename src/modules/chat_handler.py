@@ -1,143 +1,137 @@
 import asyncio
+import logging
 import random
 from pyrogram import Client, filters
 from pyrogram.types import Message
-from pyrogram.enums import ChatType
 from src import app
 from src.utils.prompt_builder import prompt_builder
 from src.database import add_user
 from src.utils.era import chatbot_api
+from src.utils.rate_limit import rate_limiter
+from src.utils.features import OWN_COMMANDS, get_features
+from src.utils.router import router
+from src.utils.engagement import engagement
+from src.utils.scheduler import llm_scheduler
+from src.utils.outbox import outbox
+from src.utils.lanes import chat_lanes
+from src.utils.chat_action import typing_action
+from src.utils.tasks import background
+from src.utils.audience import audience
+from src.utils.timing import stage, track
 
-@app.on_message(filters.text & ~filters.bot & ~filters.command(["start", "ping", "broadcast"]))
+logger = logging.getLogger(__name__)
+
+@app.on_message(group=-1)
+async def parse_features(client: Client, message: Message):
+    """Parse each update once so every handler reads the same MessageFeatures"""
+    get_features(client, message)
+
+async def answer(client: Client, message: Message, features, user_name=None, priority="ambient"):
+    """Ask the AI once for this message and send the reply"""
+    
+    with stage("filter"):
+        # One incoming message produces at most one AI call, whichever route got here
+        if not router.claim(message):
+            return
+        
+        # Unsolicited group chatter only gets an AI call when the engagement policy allows it
+        if not engagement.should_answer(features):
+            return
+        
+        # Drop spam before it reaches the AI API; a throttled message doesn't use up the chat's budget
+        if not await rate_limiter.allow(features.user_id, features.chat_id):
+            engagement.refund(features)
+            return
+    
+    user_message = features.text
+    is_group = features.is_group
+    
+    # The lane worker is handed back while this waits on the scheduler and the LLM.
+    async with chat_lanes.released():
+        # Waits its turn behind more important messages; shed ones get no reply at all
+        async with llm_scheduler.slot(priority, features.chat_id) as granted:
+            if not granted:
+                return
+            
+            # Typing only once a slot is granted, so a shed message never shows it;
+            # refreshed until the AI request returns
+            async with typing_action(client, features.chat_id):
+                # Always use existing chat history (no new_chat = True)
+                ai_response = await chatbot_api.ask_question(
+                    user_id=features.user_id,
+                    chat_id=features.chat_id,
+                    message=user_message,
+                    user_name=user_name,
+                    is_group=is_group
+                )
+    
+    # Handle special cases if AI fails or needs override
+    if not ai_response:
+        if "who are you" in user_message.lower() or "tum kaun ho" in user_message.lower():
+            ai_response = prompt_builder.prompts['persona']['identity']['introduction']
+        elif any(correction in user_message.lower() for correction in ["bhai nhi", "yaar nhi", "be nhi"]):
+            apology_responses = ["maaf kijiye! aap kaise hain? 😊", "sorry! respect karungi 💕", "got it! aapke liye ✨"]
+            ai_response = random.choice(apology_responses)
+        else:
+            ai_response = "Nahi pata... par main try karti hoon! 😊"
+    
+    # Queue the response; the outbox paces it, handles FloodWait and times the actual send
+    if ai_response and ai_response.strip():
+        outbox.reply(client, message, ai_response.strip())
+
+async def answer_private(client: Client, message: Message, features):
+    await answer(client, message, features, user_name=features.first_name, priority="private")
+
+async def answer_mention(client: Client, message: Message, features):
+    await answer(client, message, features, user_name=features.full_name, priority="mention")
+
+async def answer_group(client: Client, message: Message, features):
+    await answer(client, message, features, user_name=features.first_name, priority="ambient")
+
+# Dispatch table: every text message goes to at most one of these
+router.routes.update({
+    "private": answer_private,
+    "mention": answer_mention,
+    "reply": answer_mention,
+    "group": answer_group,
+})
+
+@app.on_message(filters.text & ~filters.bot & ~filters.command(list(OWN_COMMANDS)))
 async def handle_chat(client: Client, message: Message):
-    """Main chat handler - handles both private and group chats (ignoring commands)"""
+    """Main chat handler - hands the message to its chat's lane so the update worker is free again"""
+    
+    chat_lanes.submit(message.chat.id, process_chat(client, message))
+
+async def process_chat(client: Client, message: Message):
+    """Routes private chats, mentions, replies and group chatter (ignoring commands), in order per chat"""
     
     try:
-        # Add user to database if not exists
+        # Add user to database if not exists; the reply doesn't depend on it
         if message.from_user:
-            await add_user(message.from_user.id, message.from_user.username or None)
-        
-        # Get message text
-        user_message = message.text or message.caption or ""
-        
-        # Check if this is a group chat
-        is_group = message.chat.type in [ChatType.GROUP, ChatType.SUPERGROUP]
-        
-        # Group chat specific logic - ignore replies to other users' messages
-        if is_group:
-            # Check if this message is a reply to another user's message
-            if message.reply_to_message:
-                # Check if the replied message was from our bot
-                replied_message = message.reply_to_message
-                if replied_message.from_user and replied_message.from_user.is_bot:
-                    # It's a reply to our bot's message, check if we're mentioned in current message
-                    bot_username = f"@{client.me.username}" if client.me else None
-                    if bot_username and bot_username in user_message:
-                        # Bot is mentioned in reply, handle normally
-                        pass
-                    else:
-                        # Bot not mentioned in reply, ignore this message
-                        return
-                else:
-                    # Replying to someone else's message, ignore unless bot is mentioned
-                    bot_username = f"@{client.me.username}" if client.me else None
-                    if not (bot_username and bot_username in user_message):
-                        # Not mentioning our bot, ignore this reply
-                        return
-        
-        # Check if message contains other bot commands (ignore them)
-        other_bot_commands = [
-            '/play', '/pause', '/skip', '/volume', '/queue', '/stop', '/resume',  # Music bots
-            '/start', '/help', '/stats', '/ban', '/mute', '/kick', '/warn',  # Admin bots
-            '/weather', '/time', '/joke', '/quote', '/translate', '/convert',  # Utility bots
-            '/anime', '/manga', '/character', '/search', '/download',  # Media bots
-            '/crypto', '/price', '/chart', '/balance', '/transfer',  # Finance bots
-            '/news', '/article', '/blog', '/post', '/tweet'  # Social bots
-        ]
-        
-        # Check if it's a command for another bot
-        message_lower = user_message.lower()
-        is_other_bot_command = False
-        
-        for command in other_bot_commands:
-            if command in message_lower:
-                # Check if it's specifically for another bot (contains @username but not our bot)
-                if '@' in user_message:
-                    bot_username = f"@{client.me.username}" if client.me else None
-                    if bot_username and bot_username not in user_message:
-                        is_other_bot_command = True
-                        break
-                # If no @username, still treat as potential other bot command if it starts with /
-                elif message_lower.strip().startswith(command):
-                    is_other_bot_command = True
-                    break
-        
-        if is_other_bot_command:
-            return  # Ignore commands for other bots
-        
-        # Get AI response using our dynamic system
-        user_name = message.from_user.first_name if message.from_user else None
-        
-        # Call AI API for messages that should be handled (both private and group)
-        ai_response = await chatbot_api.ask_question(
-            user_id=message.from_user.id if message.from_user else 0,
-            chat_id=message.chat.id,
-            message=user_message,
-            user_name=user_name,
-            is_group=is_group
-        )
-        
-        # Handle special cases if AI fails or needs override
-        if not ai_response:
-            if "who are you" in user_message.lower() or "tum kaun ho" in user_message.lower():
-                ai_response = prompt_builder.prompts['persona']['identity']['introduction']
-            elif any(correction in user_message.lower() for correction in ["bhai nhi", "yaar nhi", "be nhi"]):
-                apology_responses = ["maaf kijiye! aap kaise hain? 😊", "sorry! respect karungi 💕", "got it! aapke liye ✨"]
-                ai_response = random.choice(apology_responses)
-            else:
-                ai_response = "Nahi pata... par main try karti hoon! 😊"
+            audience.message(message.from_user.id)
+            background.spawn(add_user(message.from_user.id, message.from_user.username or None), name="add_user")
         
-        # Send the response
-        if ai_response and ai_response.strip():
-            await message.reply_text(
-                ai_response,
-                reply_to_message_id=message.id if not is_group else None
-            )
+        with track():
+            await router.dispatch(client, message)
         
     except Exception as e:
-        print(f"Error in chat handler: {e}")
+        logger.exception("Error in chat handler: %s", e)
         # Fallback response for any errors
         fallback_response = "sorry... technical issue! bas ek minute 😊"
-        await message.reply_text(fallback_response)
+        outbox.reply(client, message, fallback_response)
 
 @app.on_message(filters.photo | filters.video | filters.document)
 async def handle_media(client: Client, message: Message):
     """Handle media messages with simple responses"""
     
     try:
-        is_group = message.chat.type in [ChatType.GROUP, ChatType.SUPERGROUP]
+        features = get_features(client, message)
+        is_group = features.is_group
         
-        # Group chat media handling - ignore replies to other users
-        if is_group:
-            if message.reply_to_message:
-                # Check if replying to our bot or someone else
-                replied_message = message.reply_to_message
-                if replied_message.from_user and replied_message.from_user.is_bot:
-                    # Reply to our bot, check if mentioned
-                    bot_username = f"@{client.me.username}" if client.me else None
-                    if not (bot_username and bot_username in (message.caption or "")):
-                        return
-                else:
-                    # Replying to someone else, ignore unless mentioned
-                    bot_username = f"@{client.me.username}" if client.me else None
-                    if not (bot_username and bot_username in (message.caption or "")):
-                        return
-            else:
-                # Not a reply, check if mentioned
-                bot_username = f"@{client.me.username}" if client.me else None
-                if not (bot_username and bot_username in (message.caption or "")):
-                    if random.random() > 0.03:  # 3% chance
-                        return
+        # Group chat media handling - reply only when mentioned, plus a 3% chance on non-replies
+        if is_group and not features.mentions_bot:
+            if features.is_reply or random.random() > 0.03:
+                return
         
         # Simple media responses
         media_responses = [
@@ -150,13 +144,10 @@ async def handle_media(client: Client, message: Message):
         
         response = random.choice(media_responses)
         
-        await message.reply_text(
-            response,
-            reply_to_message_id=message.id if not is_group else None
-        )
+        outbox.reply(client, message, response)
         
     except Exception as e:
-        print(f"Error in media handler: {e}")
+        logger.warning("Error in media handler: %s", e)
         pass  # Silently fail for media messages
 
 @app.on_message(filters.sticker)
@@ -164,26 +155,13 @@ async def handle_sticker(client: Client, message: Message):
     """Handle sticker messages"""
     
     try:
-        is_group = message.chat.type in [ChatType.GROUP, ChatType.SUPERGROUP]
+        features = get_features(client, message)
+        is_group = features.is_group
         
-        # Group chat sticker handling - ignore replies to other users
-        if is_group:
-            if message.reply_to_message:
-                # Check if replying to our bot or someone else
-                replied_message = message.reply_to_message
-                if replied_message.from_user and replied_message.from_user.is_bot:
-                    # Reply to our bot, handle normally
-                    pass
-                else:
-                    # Replying to someone else, ignore unless mentioned
-                    bot_username = f"@{client.me.username}" if client.me else None
-                    if not (bot_username and bot_username in (message.text or "")):
-                        if random.random() > 0.04:  # 4% chance
-                            return
-            else:
-                # Not a reply, check if mentioned or random response
-                if random.random() > 0.04:  # 4% chance
-                    return
+        # Group chat sticker handling - always answer replies to our bot, 4% chance otherwise
+        if is_group and not features.reply_to_bot:
+            if random.random() > 0.04:
+                return
         
         # Simple sticker responses
         sticker_responses = [
@@ -196,11 +174,8 @@ async def handle_sticker(client: Client, message: Message):
         
         response = random.choice(sticker_responses)
         
-        await message.reply_text(
-            response,
-            reply_to_message_id=message.id if not is_group else None
-        )
+        outbox.reply(client, message, response)
         
     except Exception as e:
-        print(f"Error in sticker handler: {e}")
+        logger.warning("Error in sticker handler: %s", e)
         pass
@@ -0,0 +1,121 @@
+from html import escape
+
+from pyrogram import filters
+from pyrogram.types import Message
+
+from src import app
+from src.utils.audience import audience
+from src.utils.codec import payload_encoder
+from src.utils.engagement import engagement
+from src.utils.era import chatbot_api
+from src.utils.lanes import chat_lanes
+from src.utils.memory import memory_report
+from src.utils.mongo import mongo_clients
+from src.utils.outbox import outbox
+from src.utils.prompt_builder import prompt_builder
+from src.utils.router import router
+from src.utils.scheduler import llm_scheduler
+from src.utils.state import MemoryState, state
+from src.utils.storage import temp_users_manager
+from src.utils.tasks import background
+from src.utils.text import fit_html
+from config import OWNER_ID
+
+
+def _memory_state(attribute: str):
+    # Only the in-memory backend keeps these in this process
+    if not isinstance(state, MemoryState):
+        return None
+    value = getattr(state, attribute)
+    return value, len(value)
+
+
+# Chat history and memories used to live in era.user_chats and
+# TempUsersManager.user_memories, rate-limit history in user_message_tracker
+memory_report.register("state.histories", lambda: _memory_state("histories"))
+memory_report.register("state.memories", lambda: _memory_state("memories"))
+memory_report.register("state.buckets", lambda: _memory_state("buckets"))
+memory_report.register("state.response_types", lambda: _memory_state("response_types"))
+memory_report.register("engagement.buckets", lambda: (
+    (getattr(engagement.policy, "buckets", {}), len(getattr(engagement.policy, "buckets", {})))
+))
+memory_report.register("engagement.per_chat", lambda: (engagement.chats, len(engagement.chats)))
+memory_report.register("router.answered", lambda: (router._answered, len(router._answered)))
+memory_report.register("audience.pending", lambda: (
+    (audience.totals, audience.hours, audience.days, audience.today_users), len(audience.today_users)
+))
+memory_report.register("prompts", lambda: (prompt_builder._prompts, len(prompt_builder._prompts or {})))
+memory_report.register("payload_encoder.system", lambda: (payload_encoder._system, len(payload_encoder._system)))
+memory_report.register("write_buffers", lambda: (
+    {name: buffer.pending for name, buffer in temp_users_manager.write_buffers.items()},
+    sum(len(buffer.pending) for buffer in temp_users_manager.write_buffers.values())
+))
+memory_report.register("outbox.lanes", lambda: (outbox.lanes, len(outbox.lanes)))
+memory_report.register("chat_lanes", lambda: (chat_lanes._tails, chat_lanes.pending))
+memory_report.register("llm_scheduler.queue", lambda: (llm_scheduler._heap, sum(llm_scheduler.queued.values())))
+memory_report.register("background.tasks", lambda: (background.tasks, len(background.tasks)))
+
+
+def _kb(size: float) -> str:
+    return f"{size / 1024:.1f}KB" if size < 1024 * 1024 else f"{size / 1024 / 1024:.1f}MB"
+
+
+def format_pools() -> str:
+    lines = []
+    session = chatbot_api.session
+    if session is not None and not session.closed:
+        connector = session.connector
+        idle = sum(len(connections) for connections in getattr(connector, "_conns", {}).values())
+        in_use = len(getattr(connector, "_acquired", ()))
+        lines.append(f"aiohttp: <code>{in_use}</code> in use, <code>{idle}</code> idle, limit <code>{connector.limit}</code>")
+    else:
+        lines.append("aiohttp: no session yet")
+
+    for name, stats in sorted(mongo_clients.stats().items()):
+        lines.append(
+            f"mongo {escape(name)}: <code>{stats['in_use']}</code> in use, <code>{stats['open']}</code> open, "
+            f"<code>{stats['checkout_failures']}</code> checkout failures"
+        )
+    return "\n".join(lines)
+
+
+async def format_structures() -> str:
+    lines = []
+    for name, entries, size, complete in await memory_report.structures():
+        lines.append(f"<code>{escape(name)}</code> n={entries} {'' if complete else '≥'}{_kb(size)}")
+    return "\n".join(lines)
+
+
+@app.on_message(filters.command("mem") & filters.user(OWNER_ID))
+async def mem_(_, message: Message):
+    """Sizes of in-process structures and pools. `/mem trace` diffs tracemalloc snapshots, `/mem stop` ends tracing."""
+
+    action = message.command[1].lower() if len(message.command) > 1 else ""
+
+    if action == "stop":
+        stopped = memory_report.stop_trace()
+        return await message.reply_text("❖ tracemalloc stopped." if stopped else "❖ tracemalloc wasn't running.")
+
+    process = memory_report.process()
+    parts = [
+        "<b>❖ Memory</b>",
+        f"RSS: <code>{_kb(process['rss'])}</code> | GC counts: <code>{process['gc_counts']}</code>",
+        "\n<b>Structures</b>",
+        await format_structures() or "None registered.",
+        "\n<b>Pools</b>",
+        format_pools(),
+    ]
+
+    if action == "trace":
+        status, sites = await memory_report.trace()
+        parts.append("\n<b>Allocations since last trace</b>")
+        if status == "started":
+            parts.append("tracemalloc started; run <code>/mem trace</code> again to see what grew.")
+        else:
+            parts.append("\n".join(f"<code>{escape(site)}</code>" for site in sites) or "No growth.")
+    elif process["tracing"]:
+        parts.append(f"\nTraced: <code>{_kb(process['traced'])}</code> (<code>/mem trace</code> to diff)")
+
+    text = "\n".join(parts)
+    text = fit_html(text)
+    await message.reply_text(text)
@@ -1,11 +1,88 @@
+import asyncio
+import time
+from html import escape
+
 from pyrogram import filters
-from src import app
-from datetime import datetime
+from src import START_TIME, app
+from src.database import ping as ping_database
+from src.utils.era import chatbot_api
+from src.utils.scheduler import llm_scheduler
+from src.utils.storage import temp_users_manager
+from src.utils.text import fit_html
+from src.utils.watchdog import loop_watchdog
+from config import OWNER_ID
+
+# Seconds before a dependency counts as timed out
+PROBE_TIMEOUT = 5
+
+
+async def probe(name: str, call):
+    """(name, milliseconds or an error label, result of the call)."""
+    started = time.perf_counter()
+    try:
+        result = await asyncio.wait_for(call, PROBE_TIMEOUT)
+    except asyncio.TimeoutError:
+        return name, "timeout", None
+    except Exception as e:
+        return name, type(e).__name__, None
+    return name, (time.perf_counter() - started) * 1000, result
+
+
+def format_uptime(seconds: float) -> str:
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    days, hours = divmod(hours, 24)
+    return f"{days}d {hours}h {minutes}m" if days else f"{hours}h {minutes}m {seconds}s"
+
+
+def format_probe(name: str, elapsed) -> str:
+    value = f"{elapsed:.0f} ms" if isinstance(elapsed, float) else f"⚠️ {escape(elapsed)}"
+    return f"{escape(name)}: <code>{value}</code>"
+
+
+def format_llm_probe(name: str, elapsed, status) -> str:
+    # Any answer means the worker is reachable (HEAD on /chat is a 405);
+    # a missing route or a server error is not
+    if isinstance(elapsed, float) and (status == 404 or status >= 500):
+        elapsed = f"HTTP {status}"
+    line = format_probe(name, elapsed)
+    if isinstance(elapsed, float):
+        line += f" (HTTP {status})"
+    return line
+
 
 @app.on_message(filters.command("ping"))
 async def ping_pong(client, message):
-    start = datetime.now()
-    msg = await message.reply_text("🏓 Pong...")
-    end = datetime.now()
-    ping_time = (end - start).total_seconds() * 1000
-    await msg.edit_text(f"<b>🏓 Pong!</b> {int(ping_time)} ms")
\ No newline at end of file
+    if not message.from_user or message.from_user.id != OWNER_ID:
+        start = time.perf_counter()
+        msg = await message.reply_text("🏓 Pong...")
+        return await msg.edit_text(f"<b>🏓 Pong!</b> {int((time.perf_counter() - start) * 1000)} ms")
+
+    # Everything at once, so the slowest dependency sets the wait rather than the sum
+    probes = [
+        probe("Telegram", message.reply_text("🏓 Pong...")),
+        probe("Mongo main", ping_database()),
+        probe("LLM API", chatbot_api.health()),
+    ]
+    probes += [
+        probe(f"Mongo {name}", mongo_client.admin.command("ping"))
+        for name, mongo_client in sorted(temp_users_manager.bulk_connections.items())
+    ]
+    results = await asyncio.gather(*probes)
+
+    _, telegram, msg = results[0]
+    lines = ["<b>🏓 Pong!</b>"]
+    lines += [format_probe(name, elapsed) for name, elapsed, _ in results[:2]]
+    lines.append(format_llm_probe(*results[2]))
+    lines += [format_probe(name, elapsed) for name, elapsed, _ in results[3:]]
+    lines += [
+        f"Loop lag: <code>{loop_watchdog.lag * 1000:.0f} ms</code>",
+        f"LLM in flight: <code>{llm_scheduler.active}</code>, queued: <code>{sum(llm_scheduler.queued.values())}</code>",
+        f"Uptime: <code>{format_uptime(time.time() - START_TIME)}</code>",
+    ]
+    text = fit_html("\n".join(lines))
+
+    if msg is None:
+        await message.reply_text(text)
+    else:
+        await msg.edit_text(text)
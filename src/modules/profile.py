@@ -0,0 +1,66 @@
+import asyncio
+import io
+import time
+from html import escape
+
+from pyrogram import filters
+from pyrogram.types import Message
+
+from src import app
+from src.utils.profiler import profiler
+from src.utils.text import fit_html
+from config import OWNER_ID
+
+DEFAULT_SECONDS = 10
+MAX_SECONDS = 120
+
+
+def format_profile() -> str:
+    total = profiler.total
+    lines = [
+        f"<b>❖ Profile</b> {profiler.duration:.1f}s, <code>{total}</code> samples "
+        f"every {profiler.interval * 1000:.0f}ms ({profiler.mode})",
+    ]
+    if not total:
+        return "\n".join(lines)
+
+    lines.append("\n<b>By component</b>")
+    for name, count in profiler.components().items():
+        lines.append(f"<code>{name}</code> {count / total:.1%}")
+
+    lines.append("\n<b>Top functions</b> (self / total)")
+    for frame, own, inclusive in profiler.top_functions():
+        lines.append(f"<code>{escape(frame)}</code> {own / total:.1%} / {inclusive / total:.1%}")
+    return "\n".join(lines)
+
+
+@app.on_message(filters.command("profile") & filters.user(OWNER_ID))
+async def profile_(client, message: Message):
+    """Samples the event loop thread for N seconds, replies with the hot functions
+    and sends the collapsed stacks (for flamegraph.pl or speedscope) to the log chat."""
+
+    if profiler.active:
+        return await message.reply_text("❖ A profile is already running.")
+
+    try:
+        seconds = float(message.command[1]) if len(message.command) > 1 else DEFAULT_SECONDS
+    except ValueError:
+        return await message.reply_text("❖ Usage: /profile [seconds]")
+    seconds = min(max(seconds, 1), MAX_SECONDS)
+
+    progress = await message.reply_text(f"❖ Profiling for {seconds:g}s...")
+    profiler.start()
+    try:
+        await asyncio.sleep(seconds)
+    finally:
+        profiler.stop()
+
+    await progress.edit_text(fit_html(format_profile()))
+
+    if profiler.total:
+        document = io.BytesIO(profiler.collapsed().encode("utf-8"))
+        document.name = time.strftime("profile-%Y%m%d-%H%M%S.folded")
+        await client.send_document(
+            app.logger, document,
+            caption=f"Collapsed stacks, {profiler.total} samples over {profiler.duration:.1f}s"
+        )
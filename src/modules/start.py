@@ -3,6 +3,7 @@ from pyrogram.types import Message, InlineKeyboardMarkup, InlineKeyboardButton,
 from pyrogram.enums import ChatType, ParseMode
 from src import app
 from src.database import add_user, add_chat, remove_chat
+from src.utils.outbox import outbox
 
 @app.on_message(filters.command("start") & ~filters.bot)
 async def start(client: Client, m: Message):
@@ -11,7 +12,9 @@ async def start(client: Client, m: Message):
     if m.chat.type == ChatType.PRIVATE:
         await add_user(m.from_user.id, m.from_user.username or None)
 
-        await m.reply_text(
+        outbox.reply(
+            client,
+            m,
             f"""
 Welcome {m.from_user.mention} ✨  
 I’m <b>{bot_name}</b>, a calm and wise friend here to listen and walk with you 🌿
@@ -21,17 +24,17 @@ Whenever you feel like talking, just say <b>{bot_name}</b> or reply here 🌸
             reply_markup=InlineKeyboardMarkup([
                 [InlineKeyboardButton("Add me to your group", url=f"https://t.me/{client.me.username}?startgroup=true")]
             ]),
-            parse_mode=ParseMode.HTML,
-            reply_to_message_id=m.id
+            parse_mode=ParseMode.HTML
         )
 
     elif m.chat.type in {ChatType.GROUP, ChatType.SUPERGROUP}:
         await add_chat(m.chat.id, m.chat.title)
 
-        await m.reply_text(
+        outbox.reply(
+            client,
+            m,
             f"Hey {m.from_user.mention}, I'm here to assist your group!",
-            parse_mode=ParseMode.HTML,
-            reply_to_message_id=m.id
+            parse_mode=ParseMode.HTML
         )
 
 @app.on_chat_member_updated()
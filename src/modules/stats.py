@@ -0,0 +1,66 @@
+from html import escape
+
+from pyrogram import filters
+from pyrogram.types import Message
+
+from src import app
+from src.utils.audience import audience
+from src.utils.metrics import Histogram, registry
+from src.utils.text import fit_html
+from config import OWNER_ID
+
+
+def _labels(key) -> str:
+    return escape(", ".join(f"{name}={value}" for name, value in key)) or "all"
+
+
+def _ms(seconds) -> str:
+    return "-" if seconds is None else f"{seconds * 1000:.0f}ms"
+
+
+def format_audience(stats: dict) -> str:
+    lines = [
+        f"Users: <code>{stats['users']}</code> | Chats: <code>{stats['chats']}</code>",
+        f"Active today: <code>{stats['active_today']}</code>",
+        f"Messages/hour: <code>{stats['messages_this_hour']}</code> now, "
+        f"<code>{stats['messages_last_hour']}</code> last hour, <code>{stats['messages_24h']}</code> in 24h",
+        f"LLM calls/hour: <code>{stats['llm_calls_this_hour']}</code> now, "
+        f"<code>{stats['llm_calls_last_hour']}</code> last hour, <code>{stats['llm_calls_24h']}</code> in 24h",
+    ]
+    if not stats["saved"]:
+        lines.append("<i>Stats collection unavailable, showing this process only</i>")
+    return "\n".join(lines)
+
+
+def format_metrics() -> str:
+    lines = []
+    for metric in registry.metrics.values():
+        if isinstance(metric, Histogram):
+            rows = sorted(metric.summary())
+            if not rows:
+                continue
+            lines.append(f"\n<b>{metric.name}</b>")
+            for key, count, mean, p50, p95 in rows:
+                lines.append(f"<code>{_labels(key)}</code> n={count} avg={_ms(mean)} p50={_ms(p50)} p95={_ms(p95)}")
+        else:
+            samples = sorted(metric.samples())
+            if not samples:
+                continue
+            lines.append(f"\n<b>{metric.name}</b>")
+            for _, key, value in samples:
+                lines.append(f"<code>{_labels(key)}</code> {value:g}")
+    return "\n".join(lines)
+
+
+@app.on_message(filters.command("stats") & filters.user(OWNER_ID))
+async def stats_(_, message: Message):
+    """Audience counters, then the same numbers the metrics endpoint serves."""
+
+    text = (
+        "<b>❖ Bot stats</b>\n"
+        + format_audience(await audience.snapshot())
+        + "\n"
+        + (format_metrics() or "\nNo metrics yet.")
+    )
+    text = fit_html(text)
+    await message.reply_text(text)
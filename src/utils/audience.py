@@ -0,0 +1,197 @@
+import asyncio
+import logging
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Optional, Set
+
+from pymongo import UpdateOne
+
+import config
+from .metrics import MONGO_OP_SECONDS
+from .mongo import mongo_clients
+
+logger = logging.getLogger(__name__)
+
+HOUR_RETENTION = timedelta(days=7)
+DAY_RETENTION = timedelta(days=90)
+
+
+def _hour_key(hour: int) -> str:
+    return "hour:" + datetime.utcfromtimestamp(hour * 3600).strftime("%Y-%m-%dT%H")
+
+
+def _day_key(day: int) -> str:
+    return "day:" + datetime.utcfromtimestamp(day * 86400).strftime("%Y-%m-%d")
+
+
+class AudienceStats:
+    """User/chat totals, daily actives and hourly traffic without scanning users or chats.
+
+    Counts build up in memory and are flushed as $inc upserts into a small
+    `stats` collection, so several replicas add to the same documents.
+    Reading them costs one query for a fixed set of ids.
+    """
+
+    def __init__(self, db, flush_interval: float = 60):
+        self.collection = db["stats"]
+        self.users = db["users"]
+        self.chats = db["chats"]
+        self.flush_interval = flush_interval
+
+        self.totals: Dict[str, int] = {}
+        self.hours: Dict[int, Dict[str, int]] = {}
+        self.days: Dict[int, Dict[str, int]] = {}
+
+        # Users seen today by this process; replicas each count their own,
+        # so a user talking to two of them is counted twice
+        self.today: Optional[int] = None
+        self.today_users: Set[int] = set()
+
+        self.seeded = False
+        self._task: Optional[asyncio.Task] = None
+
+    def _bump(self, field: str, now: float, amount: int = 1) -> None:
+        hour = int(now // 3600)
+        counts = self.hours.setdefault(hour, {})
+        counts[field] = counts.get(field, 0) + amount
+        counts = self.days.setdefault(hour // 24, {})
+        counts[field] = counts.get(field, 0) + amount
+
+    def message(self, user_id: int, now: Optional[float] = None) -> None:
+        now = time.time() if now is None else now
+        self._bump("messages", now)
+
+        day = int(now // 86400)
+        if day != self.today:
+            self.today, self.today_users = day, set()
+        if user_id not in self.today_users:
+            self.today_users.add(user_id)
+            self._bump("active_users", now)
+
+    def llm_call(self, now: Optional[float] = None) -> None:
+        self._bump("llm_calls", time.time() if now is None else now)
+
+    def added(self, kind: str, count: int = 1) -> None:
+        """`kind` is "users" or "chats"; pass a negative count for removals."""
+        self.totals[kind] = self.totals.get(kind, 0) + count
+
+    async def load(self) -> None:
+        """Seed the totals once from the collections, if no replica has yet."""
+        with MONGO_OP_SECONDS.time(op="find_one", collection="stats", shard="main"):
+            if await self.collection.find_one({"_id": "totals"}, {"_id": 1}):
+                self.seeded = True
+                return
+
+        # Index-only counts thanks to the unique indexes; this runs once per database
+        with MONGO_OP_SECONDS.time(op="count_documents", collection="users", shard="main"):
+            users = await self.users.count_documents({"user_id": {"$gt": 0}})
+        with MONGO_OP_SECONDS.time(op="count_documents", collection="chats", shard="main"):
+            chats = await self.chats.count_documents({"chat_id": {"$lt": 0}})
+        with MONGO_OP_SECONDS.time(op="update_one", collection="stats", shard="main"):
+            await self.collection.update_one(
+                {"_id": "totals"}, {"$setOnInsert": {"users": users, "chats": chats}}, upsert=True
+            )
+        # The counts already include anything added while they ran
+        self.totals = {}
+        self.seeded = True
+        logger.info("Seeded audience totals: %d users, %d chats", users, chats)
+
+    async def flush(self) -> int:
+        # Totals wait for the seed, or an $inc would create the document first
+        totals, self.totals = (self.totals, {}) if self.seeded else ({}, self.totals)
+        hours, self.hours = self.hours, {}
+        days, self.days = self.days, {}
+
+        now = datetime.utcnow()
+        requests = []
+        if any(totals.values()):
+            requests.append(UpdateOne({"_id": "totals"}, {"$inc": totals}, upsert=True))
+        for hour, counts in hours.items():
+            requests.append(UpdateOne(
+                {"_id": _hour_key(hour)},
+                {"$inc": counts, "$setOnInsert": {"expires_at": now + HOUR_RETENTION}},
+                upsert=True
+            ))
+        for day, counts in days.items():
+            requests.append(UpdateOne(
+                {"_id": _day_key(day)},
+                {"$inc": counts, "$setOnInsert": {"expires_at": now + DAY_RETENTION}},
+                upsert=True
+            ))
+        if not requests:
+            return 0
+
+        try:
+            with MONGO_OP_SECONDS.time(op="bulk_write", collection="stats", shard="main"):
+                await self.collection.bulk_write(requests, ordered=False)
+        except Exception as e:
+            logger.warning("Error flushing audience stats: %s", e)
+            # Keep the counts for the next flush
+            self._merge(self.totals, totals)
+            for pending, flushed in ((self.hours, hours), (self.days, days)):
+                for key, counts in flushed.items():
+                    self._merge(pending.setdefault(key, {}), counts)
+            return 0
+        return len(requests)
+
+    @staticmethod
+    def _merge(into: Dict[str, int], counts: Dict[str, int]) -> None:
+        for field, value in counts.items():
+            into[field] = into.get(field, 0) + value
+
+    async def snapshot(self, now: Optional[float] = None) -> Dict:
+        """Saved counts plus what this process hasn't flushed yet."""
+        now = time.time() if now is None else now
+        hour = int(now // 3600)
+        hours = [hour - offset for offset in range(24)]
+        keys = ["totals", _day_key(hour // 24)] + [_hour_key(h) for h in hours]
+
+        docs = {}
+        try:
+            with MONGO_OP_SECONDS.time(op="find", collection="stats", shard="main"):
+                async for doc in self.collection.find({"_id": {"$in": keys}}):
+                    docs[doc["_id"]] = doc
+        except Exception as e:
+            logger.warning("Error reading audience stats: %s", e)
+
+        def count(key: str, field: str, pending: Dict[str, int]) -> int:
+            return docs.get(key, {}).get(field, 0) + pending.get(field, 0)
+
+        def hourly(field: str, h: int) -> int:
+            return count(_hour_key(h), field, self.hours.get(h, {}))
+
+        return {
+            "users": count("totals", "users", self.totals),
+            "chats": count("totals", "chats", self.totals),
+            "active_today": count(_day_key(hour // 24), "active_users", self.days.get(hour // 24, {})),
+            "messages_this_hour": hourly("messages", hour),
+            "messages_last_hour": hourly("messages", hour - 1),
+            "messages_24h": sum(hourly("messages", h) for h in hours),
+            "llm_calls_this_hour": hourly("llm_calls", hour),
+            "llm_calls_last_hour": hourly("llm_calls", hour - 1),
+            "llm_calls_24h": sum(hourly("llm_calls", h) for h in hours),
+            "saved": bool(docs),
+        }
+
+    async def _run(self) -> None:
+        while True:
+            if not self.seeded:
+                try:
+                    await self.load()
+                except Exception as e:
+                    logger.warning("Audience totals not seeded: %s", e)
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(), name="audience_flush")
+
+    async def close(self) -> None:
+        if self._task:
+            self._task.cancel()
+            self._task = None
+        await self.flush()
+
+
+audience = AudienceStats(mongo_clients.get(config.MONGO_URL, name="main")["Era"], config.STATS_FLUSH_INTERVAL)
@@ -0,0 +1,24 @@
+import asyncio
+from contextlib import asynccontextmanager
+
+from pyrogram.enums import ChatAction
+
+
+async def _keep_typing(client, chat_id: int, interval: float) -> None:
+    while True:
+        try:
+            await client.send_chat_action(chat_id, ChatAction.TYPING)
+        except Exception:
+            # The indicator is cosmetic; never let it break a reply
+            return
+        await asyncio.sleep(interval)
+
+
+@asynccontextmanager
+async def typing_action(client, chat_id: int, interval: float = 4.5):
+    """Show "typing..." while the block runs. Telegram clears it after ~5s, so it is refreshed."""
+    task = asyncio.create_task(_keep_typing(client, chat_id, interval))
+    try:
+        yield
+    finally:
+        task.cancel()
@@ -0,0 +1,67 @@
+import json
+from collections import OrderedDict
+from typing import Any, Dict, List, Union
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+if orjson is not None:
+    BACKEND = "orjson"
+
+    def dumps(obj: Any) -> bytes:
+        return orjson.dumps(obj)
+
+    def loads(data: Union[bytes, str]) -> Any:
+        return orjson.loads(data)
+else:
+    BACKEND = "json"
+
+    def dumps(obj: Any) -> bytes:
+        return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+    def loads(data: Union[bytes, str]) -> Any:
+        return json.loads(data)
+
+
+def dumps_str(obj: Any) -> str:
+    """For aiohttp's `json_serialize`, which expects text."""
+    return dumps(obj).decode("utf-8")
+
+
+class PayloadEncoder:
+    """Encodes /chat payloads, reusing the encoded system message.
+
+    The system prompt is several kilobytes and only has a few variants
+    (message type, mood, group or private), so its JSON is kept in a small
+    LRU keyed by the prompt text and only the history is encoded per request.
+    """
+
+    def __init__(self, max_prompts: int = 64):
+        self.max_prompts = max_prompts
+        self.hits = 0
+        self.misses = 0
+        self._system: "OrderedDict[str, bytes]" = OrderedDict()
+
+    def system_message(self, prompt: str) -> bytes:
+        encoded = self._system.get(prompt)
+        if encoded is not None:
+            self.hits += 1
+            self._system.move_to_end(prompt)
+            return encoded
+
+        self.misses += 1
+        encoded = self._system[prompt] = dumps({"role": "system", "content": prompt})
+        if len(self._system) > self.max_prompts:
+            self._system.popitem(last=False)
+        return encoded
+
+    def encode(self, system_prompt: str, history: List[Dict]) -> bytes:
+        """Same bytes as dumps({"messages": [system] + history})."""
+        parts = [self.system_message(system_prompt)]
+        parts.extend(dumps(message) for message in history)
+        return b'{"messages":[' + b",".join(parts) + b"]}"
+
+
+payload_encoder = PayloadEncoder()
@@ -0,0 +1,166 @@
+import random
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+import config
+from .features import MessageFeatures
+from .metrics import registry
+from .buckets import TokenBucket
+
+
+class EngagementPolicy:
+    """Decides whether an unsolicited group message is worth an AI call."""
+
+    name = "always"
+
+    def allow(self, chat_id: int, now: float) -> bool:
+        return True
+
+    def refund(self, chat_id: int) -> None:
+        """Give back what `allow` spent on a message that ended up unanswered."""
+
+
+class NeverPolicy(EngagementPolicy):
+    name = "never"
+
+    def allow(self, chat_id: int, now: float) -> bool:
+        return False
+
+
+class ProbabilityPolicy(EngagementPolicy):
+    name = "probability"
+
+    def __init__(self, probability: float):
+        self.probability = probability
+
+    def allow(self, chat_id: int, now: float) -> bool:
+        return random.random() < self.probability
+
+
+class ReplyBudgetPolicy(EngagementPolicy):
+    """At most `replies_per_minute` unsolicited replies per chat."""
+
+    name = "budget"
+
+    def __init__(self, replies_per_minute: float, evict_interval: float = 300):
+        self.replies_per_minute = replies_per_minute
+        self.evict_interval = evict_interval
+        self.buckets: Dict[int, TokenBucket] = {}
+        self._next_eviction = time.monotonic() + evict_interval
+
+    def allow(self, chat_id: int, now: float) -> bool:
+        if now >= self._next_eviction:
+            idle_chats = [key for key, bucket in self.buckets.items() if bucket.is_idle(now)]
+            for key in idle_chats:
+                del self.buckets[key]
+            self._next_eviction = now + self.evict_interval
+
+        bucket = self.buckets.get(chat_id)
+        if bucket is None:
+            bucket = self.buckets[chat_id] = TokenBucket(
+                self.replies_per_minute / 60, max(1.0, self.replies_per_minute), now
+            )
+        if bucket.refill(now) < 1:
+            return False
+        bucket.tokens -= 1
+        return True
+
+    def refund(self, chat_id: int) -> None:
+        bucket = self.buckets.get(chat_id)
+        if bucket is not None:
+            bucket.tokens = min(bucket.capacity, bucket.tokens + 1)
+
+
+class Engagement:
+    """Applies the policy to unsolicited group messages and counts, per chat,
+    how many got an AI call and how many were saved.
+
+    Per-chat counts are kept for the `max_chats` most recently active chats;
+    the totals cover every chat.
+    """
+
+    def __init__(self, policy: EngagementPolicy, max_chats: int = 1000):
+        self.policy = policy
+        self.max_chats = max_chats
+        self.engaged_total = 0
+        self.saved_total = 0
+        # chat_id -> [engaged, saved]
+        self.chats: "OrderedDict[int, List[int]]" = OrderedDict()
+
+    @staticmethod
+    def _unsolicited(features: MessageFeatures) -> bool:
+        # Private chats, mentions and replies to us are always answered
+        return features.is_group and not features.mentions_bot and not features.reply_to_bot
+
+    def _counts(self, chat_id: int) -> List[int]:
+        counts = self.chats.get(chat_id)
+        if counts is None:
+            counts = self.chats[chat_id] = [0, 0]
+            if len(self.chats) > self.max_chats:
+                self.chats.popitem(last=False)
+        else:
+            self.chats.move_to_end(chat_id)
+        return counts
+
+    def should_answer(self, features: MessageFeatures, now: Optional[float] = None) -> bool:
+        if not self._unsolicited(features):
+            return True
+
+        chat_id = features.chat_id
+        counts = self._counts(chat_id)
+        if self.policy.allow(chat_id, time.monotonic() if now is None else now):
+            counts[0] += 1
+            self.engaged_total += 1
+            return True
+
+        counts[1] += 1
+        self.saved_total += 1
+        return False
+
+    def refund(self, features: MessageFeatures) -> None:
+        """Undo should_answer() for a message a later check (e.g. rate limiting) dropped."""
+        if not self._unsolicited(features):
+            return
+
+        chat_id = features.chat_id
+        self.policy.refund(chat_id)
+        self.engaged_total -= 1
+        counts = self.chats.get(chat_id)
+        if counts is not None and counts[0]:
+            counts[0] -= 1
+
+    def saved_by_chat(self, top: int = 10) -> Dict[int, int]:
+        busiest = sorted(self.chats.items(), key=lambda item: item[1][1], reverse=True)[:top]
+        return {chat_id: counts[1] for chat_id, counts in busiest if counts[1]}
+
+    def stats(self, top: int = 10) -> Dict:
+        return {
+            "policy": self.policy.name,
+            "engaged": self.engaged_total,
+            "saved": self.saved_total,
+            "saved_by_chat": self.saved_by_chat(top),
+        }
+
+
+def build_policy(name: str) -> EngagementPolicy:
+    name = name.lower()
+    if name == "budget":
+        return ReplyBudgetPolicy(config.ENGAGEMENT_REPLIES_PER_MINUTE)
+    if name == "probability":
+        return ProbabilityPolicy(config.ENGAGEMENT_PROBABILITY)
+    if name == "never":
+        return NeverPolicy()
+    return EngagementPolicy()
+
+
+engagement = Engagement(build_policy(config.ENGAGEMENT_POLICY))
+
+registry.gauge(
+    "era_engagement_saved_calls", "Unsolicited group messages skipped by the engagement policy",
+    lambda: engagement.saved_total
+)
+registry.gauge(
+    "era_engagement_saved_calls_by_chat", "Unsolicited messages skipped by the engagement policy, busiest chats",
+    lambda: [({"chat": str(chat_id)}, saved) for chat_id, saved in engagement.saved_by_chat().items()]
+)
@@ -1,42 +1,57 @@
+import logging
 import os
+import time
 import asyncio
 import aiohttp
-import json
 from typing import Optional
 from .prompt_builder import prompt_builder
+from .storage import temp_users_manager
+from .state import state
+from .audience import audience
+from .codec import dumps_str, loads, payload_encoder
+from .metrics import LLM_REQUEST_SECONDS
+from .timing import stage
+
+logger = logging.getLogger(__name__)
 
 def load_system_prompt() -> str:
     return "You are Pixel. Reply in 15-word max Hinglish using 'aap'."
 
 class era:
     def __init__(self):
-        self.user_chats = {}
         self.api_url = "https://aivya.maybechiku.workers.dev/chat"
         self.system_prompt = load_system_prompt()
         self.session: Optional[aiohttp.ClientSession] = None
 
     async def get_session(self) -> aiohttp.ClientSession:
         if self.session is None:
-            self.session = aiohttp.ClientSession()
+            self.session = aiohttp.ClientSession(json_serialize=dumps_str)
         return self.session
 
-    def _get_key(self, user_id: int, chat_id: int) -> str:
-        return f"{user_id}:{chat_id}"
+    async def warmup(self) -> None:
+        """Open a pooled connection to the API so the first reply skips DNS and TLS setup."""
+        session = await self.get_session()
+        async with session.head(self.api_url.strip(), timeout=aiohttp.ClientTimeout(total=10)) as response:
+            await response.read()
+
+    async def health(self) -> int:
+        """HTTP status of a bodiless request to the API, for /ping.
+
+        /chat only accepts POST, so a healthy worker answers 405; sending a
+        real chat request just to check would cost an LLM call.
+        """
+        session = await self.get_session()
+        async with session.head(self.api_url.strip(), timeout=aiohttp.ClientTimeout(total=10)) as response:
+            return response.status
 
-    def get_chat(self, user_id: int, chat_id: int) -> list:
-        key = self._get_key(user_id, chat_id)
-        if key not in self.user_chats:
-            self.user_chats[key] = []
-        return self.user_chats[key]
+    async def get_chat(self, user_id: int, chat_id: int) -> list:
+        return await state.get_history(user_id, chat_id)
 
-    def add_message(self, user_id: int, chat_id: int, role: str, content: str) -> None:
-        chat_history = self.get_chat(user_id, chat_id)
-        chat_history.append({"role": role, "content": content})
-        if len(chat_history) > 10:
-            self.user_chats[self._get_key(user_id, chat_id)] = chat_history[-10:]
+    async def add_message(self, user_id: int, chat_id: int, role: str, content: str) -> list:
+        return await state.append_history(user_id, chat_id, [{"role": role, "content": content}], limit=10)
 
-    def clear_chat(self, user_id: int, chat_id: int) -> None:
-        self.user_chats[self._get_key(user_id, chat_id)] = []
+    async def clear_chat(self, user_id: int, chat_id: int) -> None:
+        await state.clear_history(user_id, chat_id)
 
     async def ask_question(
         self,
@@ -48,87 +63,104 @@ class era:
         new_chat: bool = False
     ) -> Optional[str]:
         if new_chat:
-            self.clear_chat(user_id, chat_id)
+            await self.clear_chat(user_id, chat_id)
         
-        self.add_message(user_id, chat_id, "user", message)
-        chat_history = self.get_chat(user_id, chat_id)
+        chat_history = await self.add_message(user_id, chat_id, "user", message)
         
         try:
-            is_rude, rude_response = await prompt_builder.detect_rude_message(message, user_id)
+            # Both checks are independent, so run them together
+            with stage("special_cases"):
+                (is_rude, rude_response), (needs_name_confirm, needs_correction, name_response) = await asyncio.gather(
+                    prompt_builder.detect_rude_message(message, user_id),
+                    prompt_builder.check_name_confirmation_needed(message, user_id)
+                )
+            
             if is_rude and rude_response:
-                print(f"Rude message detected from user {user_id}, responding confidently")
+                logger.debug("Rude message detected from user %s, responding confidently", user_id)
                 return rude_response
             
-            needs_name_confirm, needs_correction, name_response = await prompt_builder.check_name_confirmation_needed(message, user_id)
             if needs_correction and name_response:
-                print(f"Name correction handled for user {user_id}")
+                logger.debug("Name correction handled for user %s", user_id)
                 return name_response
             
             if user_name and not needs_name_confirm and not needs_correction:
                 name_patterns = ['mai', 'main', 'i am', 'i\'m', 'mera naam', 'my name is']
                 if any(pattern in message.lower() for pattern in name_patterns):
                     await temp_users_manager.confirm_user_name(user_id, user_name)
-                    print(f"Confirmed name for user {user_id}: {user_name}")
+                    logger.debug("Confirmed name for user %s: %s", user_id, user_name)
                     
                     return f"nice to meet you {user_name}"
                 
         except Exception as e:
-            print(f"Special case handling failed: {e}")
+            logger.warning("Special case handling failed: %s", e)
         
         try:
-            system_prompt = prompt_builder.build_system_prompt(
-                message=message,
-                is_group=is_group,
-                user_context={
-                    "user_id": user_id,
-                    "chat_id": chat_id,
-                    "user_name": user_name,
-                    "is_mentioned": True
-                }
-            )
+            with stage("prompt_build"):
+                system_prompt = prompt_builder.build_system_prompt(
+                    message=message,
+                    is_group=is_group,
+                    user_context={
+                        "user_id": user_id,
+                        "chat_id": chat_id,
+                        "user_name": user_name,
+                        "is_mentioned": True
+                    }
+                )
         except Exception as e:
-            print(f"Dynamic prompt failed: {e}")
+            logger.warning("Dynamic prompt failed: %s", e)
             system_prompt = self.system_prompt
         
         session = await self.get_session()
         
+        # Encoded once for every attempt; the system message comes pre-encoded
+        with stage("encode"):
+            body = payload_encoder.encode(system_prompt, chat_history)
+        
         for attempt in range(3):
             try:
-                payload = {
-                    "messages": [
-                        {"role": "system", "content": system_prompt}
-                    ] + chat_history
-                }
+                outcome = "error"
+                started = time.perf_counter()
+                try:
+                    with stage("llm_request"):
+                        async with session.post(
+                            self.api_url.strip(),
+                            data=body,
+                            headers={"Content-Type": "application/json"},
+                            timeout=aiohttp.ClientTimeout(total=20)
+                        ) as response:
+                            status = response.status
+                            raw = await response.read() if status == 200 else None
+                    outcome = str(status)
+                finally:
+                    LLM_REQUEST_SECONDS.observe(time.perf_counter() - started, attempt=attempt + 1, outcome=outcome)
+                    audience.llm_call()
+                
+                with stage("decode"):
+                    data = loads(raw) if raw is not None else None
                 
-                async with session.post(
-                    self.api_url.strip(),
-                    json=payload,
-                    timeout=aiohttp.ClientTimeout(total=20)
-                ) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        reply = data.get("reply", "").strip()
-                        if reply:
+                if status == 200:
+                    reply = data.get("reply", "").strip()
+                    if reply:
+                        with stage("classify"):
                             msg_type = prompt_builder.detect_message_type(message, is_group)
+                        with stage("validate"):
                             validated_reply = prompt_builder.validate_response(reply, msg_type)
-                            
-                            response_lower = validated_reply.lower()
-                            if any(fragment in response_lower for fragment in ['tell me more', 'what happened', 'that sounds cool', 'explain properly']):
-                                intent = prompt_builder.get_response_intent(msg_type, None, message)
-                                print(f"Template-like response detected, using intent guidance: {intent['intent']}")
-                            
-                            if hasattr(self, '_last_response_type'):
-                                if self._last_response_type == msg_type:
-                                    intent = prompt_builder.get_response_intent(msg_type, None, message)
-                                    print(f"Same response type detected, using intent: {intent['intent']}")
-                            
-                            self._last_response_type = msg_type
-                            self.add_message(user_id, chat_id, "assistant", validated_reply)
-                            return validated_reply
-                    else:
-                        print(f"API error {response.status}")
+                        
+                        response_lower = validated_reply.lower()
+                        if any(fragment in response_lower for fragment in ['tell me more', 'what happened', 'that sounds cool', 'explain properly']):
+                            intent = prompt_builder.get_response_intent(msg_type, None, message)
+                            logger.debug("Template-like response detected, using intent guidance: %s", intent['intent'])
+                        
+                        if await state.swap_response_type(chat_id, msg_type) == msg_type:
+                            intent = prompt_builder.get_response_intent(msg_type, None, message)
+                            logger.debug("Same response type detected, using intent: %s", intent['intent'])
+                        
+                        await self.add_message(user_id, chat_id, "assistant", validated_reply)
+                        return validated_reply
+                else:
+                    logger.warning("API error %s", status)
             except Exception as e:
-                print(f"Attempt {attempt+1} failed: {str(e)[:50]}")
+                logger.warning("Attempt %d failed: %.50s", attempt + 1, e)
             if attempt < 2:
                 await asyncio.sleep(0.5)
         
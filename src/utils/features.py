@@ -0,0 +1,117 @@
+from typing import Optional, Tuple
+
+from pyrogram.enums import ChatType, MessageEntityType
+
+# Commands this bot answers itself; chat handlers must ignore them
+OWN_COMMANDS = frozenset({"start", "ping", "broadcast", "gcast", "stats", "mem", "profile"})
+
+# Commands meant for other bots commonly found in groups
+OTHER_BOT_COMMANDS = frozenset({
+    'play', 'pause', 'skip', 'volume', 'queue', 'stop', 'resume',  # Music bots
+    'start', 'help', 'stats', 'ban', 'mute', 'kick', 'warn',  # Admin bots
+    'weather', 'time', 'joke', 'quote', 'translate', 'convert',  # Utility bots
+    'anime', 'manga', 'character', 'search', 'download',  # Media bots
+    'crypto', 'price', 'chart', 'balance', 'transfer',  # Finance bots
+    'news', 'article', 'blog', 'post', 'tweet'  # Social bots
+})
+
+GROUP_TYPES = frozenset({ChatType.GROUP, ChatType.SUPERGROUP})
+
+
+class BotIdentity:
+    __slots__ = ("id", "username", "tag")
+
+    def __init__(self, id: int, username: Optional[str]):
+        self.id = id
+        self.username = (username or "").lower()
+        self.tag = f"@{self.username}" if self.username else None
+
+
+_identity: Optional[BotIdentity] = None
+
+
+def get_bot_identity(client) -> Optional[BotIdentity]:
+    global _identity
+    if _identity is None and getattr(client, "me", None):
+        _identity = BotIdentity(client.me.id, client.me.username)
+    return _identity
+
+
+class MessageFeatures:
+    """Everything the chat handlers need to know about an update, parsed once."""
+
+    __slots__ = (
+        "text", "user_id", "chat_id", "first_name", "full_name",
+        "is_group", "is_private", "is_reply", "reply_to_bot",
+        "mentions_bot", "commands", "is_other_bot_command",
+    )
+
+    def __init__(self, client, message):
+        identity = get_bot_identity(client)
+        user = message.from_user
+
+        self.text = message.text or message.caption or ""
+        self.user_id = user.id if user else 0
+        self.chat_id = message.chat.id
+        self.first_name = user.first_name if user else None
+        self.full_name = " ".join(part for part in [user.first_name, user.last_name] if part) if user else None
+
+        self.is_group = message.chat.type in GROUP_TYPES
+        self.is_private = message.chat.type == ChatType.PRIVATE
+
+        replied = message.reply_to_message
+        replied_user = replied.from_user if replied else None
+        self.is_reply = replied is not None
+        self.reply_to_bot = bool(identity and replied_user and replied_user.id == identity.id)
+
+        self.mentions_bot = False
+        self.commands: Tuple[Tuple[str, str, int], ...] = ()
+        self._parse_entities(message.entities or message.caption_entities, identity)
+
+        self.is_other_bot_command = any(
+            name in OTHER_BOT_COMMANDS and (
+                (target and (identity is None or target != identity.username)) or
+                (not target and offset == 0)
+            )
+            for name, target, offset in self.commands
+        )
+
+    def _parse_entities(self, entities, identity: Optional[BotIdentity]) -> None:
+        if not entities:
+            return
+
+        # Entity offsets count UTF-16 code units, not Python characters
+        encoded = self.text.encode("utf-16-le")
+        commands = []
+
+        for entity in entities:
+            if entity.type == MessageEntityType.TEXT_MENTION:
+                if identity and entity.user and entity.user.id == identity.id:
+                    self.mentions_bot = True
+                continue
+
+            if entity.type not in (MessageEntityType.MENTION, MessageEntityType.BOT_COMMAND):
+                continue
+
+            start = entity.offset * 2
+            value = encoded[start:start + entity.length * 2].decode("utf-16-le").lower()
+
+            if entity.type == MessageEntityType.MENTION:
+                if identity and value == identity.tag:
+                    self.mentions_bot = True
+            else:
+                name, _, target = value[1:].partition("@")
+                commands.append((name, target, entity.offset))
+                if identity and target == identity.username:
+                    self.mentions_bot = True
+
+        self.commands = tuple(commands)
+
+
+def get_features(client, message) -> MessageFeatures:
+    features = getattr(message, "_features", None)
+    if features is None:
+        features = MessageFeatures(client, message)
+        # Underscore-prefixed so pyrogram leaves it out of str(message)
+        message._features = features
+    return features
@@ -0,0 +1,123 @@
+import asyncio
+import logging
+from typing import Dict, List, Tuple
+
+from pymongo import ASCENDING, IndexModel
+
+import config
+
+logger = logging.getLogger(__name__)
+
+USER_INDEXES = [
+    IndexModel([("user_id", ASCENDING)], name="user_id_unique", unique=True),
+]
+
+CHAT_INDEXES = [
+    IndexModel([("chat_id", ASCENDING)], name="chat_id_unique", unique=True),
+]
+
+TEMP_USER_INDEXES = [
+    IndexModel([("user_id", ASCENDING)], name="user_id_unique", unique=True),
+    # cleanup_temp_users and the bulk stats filter on both
+    IndexModel([("is_temp", ASCENDING), ("last_updated", ASCENDING)], name="is_temp_last_updated"),
+    IndexModel([("last_updated", ASCENDING)], name="last_updated_ttl", expireAfterSeconds=config.CHAT_HISTORY_DAYS * 86400),
+]
+
+STATS_INDEXES = [
+    # Hourly and daily audience counters carry their own expiry
+    IndexModel([("expires_at", ASCENDING)], name="expires_at_ttl", expireAfterSeconds=0),
+]
+
+STATE_INDEXES = {
+    "state_buckets": [IndexModel([("expires_at", ASCENDING)], name="expires_at_ttl", expireAfterSeconds=0)],
+    "state_history": [IndexModel([("updated_at", ASCENDING)], name="updated_at_ttl", expireAfterSeconds=config.CHAT_HISTORY_DAYS * 86400)],
+}
+
+
+async def ensure_collection(collection, indexes: List[IndexModel]) -> Dict[str, List]:
+    """Create whichever of `indexes` are missing; safe to run on every start.
+
+    An index already present under another name counts as existing. A TTL
+    whose expiry changed in config is updated in place with collMod.
+    """
+    report = {"created": [], "existing": [], "updated": [], "failed": []}
+    existing = await collection.index_information()
+    by_key = {tuple(info["key"]): (name, info) for name, info in existing.items()}
+
+    missing = []
+    for index in indexes:
+        spec = index.document
+        key = tuple(spec["key"].items())
+        if spec["name"] not in existing and key not in by_key:
+            missing.append(index)
+            continue
+
+        name, info = (spec["name"], existing[spec["name"]]) if spec["name"] in existing else by_key[key]
+        expire = spec.get("expireAfterSeconds")
+        if spec.get("unique") and not info.get("unique"):
+            # Needs a manual drop (and dedupe) before the unique one can be built
+            report["failed"].append(f"{name}: exists but is not unique")
+        elif expire is not None and info.get("expireAfterSeconds") != expire:
+            try:
+                await collection.database.command(
+                    "collMod", collection.name, index={"name": name, "expireAfterSeconds": expire}
+                )
+                report["updated"].append(name)
+            except Exception as e:
+                report["failed"].append(f"{name}: {e}")
+        else:
+            report["existing"].append(name)
+
+    # One at a time so a duplicate key on one unique index doesn't block the rest
+    for index in missing:
+        name = index.document["name"]
+        try:
+            await collection.create_indexes([index])
+            report["created"].append(name)
+        except Exception as e:
+            report["failed"].append(f"{name}: {e}")
+
+    return report
+
+
+def _targets() -> List[Tuple[str, object, List[IndexModel]]]:
+    from src.database import chatsdb, usersdb
+    from .state import MongoState, state
+    from .audience import audience
+    from .storage import temp_users_manager
+
+    targets = [
+        ("main.users", usersdb, USER_INDEXES),
+        ("main.chats", chatsdb, CHAT_INDEXES),
+        ("main.stats", audience.collection, STATS_INDEXES),
+    ]
+    for shard, collection in temp_users_manager.temp_user_collections.items():
+        targets.append((f"{shard}.temp_users", collection, TEMP_USER_INDEXES))
+    if isinstance(state, MongoState):
+        targets.append(("main.state_buckets", state.buckets, STATE_INDEXES["state_buckets"]))
+        targets.append(("main.state_history", state.history, STATE_INDEXES["state_history"]))
+    return targets
+
+
+async def ensure_indexes() -> Dict[str, Dict]:
+    """Ensure indexes on the main database and every temp shard, concurrently."""
+    targets = _targets()
+    results = await asyncio.gather(
+        *(ensure_collection(collection, indexes) for _, collection, indexes in targets),
+        return_exceptions=True
+    )
+
+    reports = {}
+    for (label, _, _), result in zip(targets, results):
+        if isinstance(result, Exception):
+            reports[label] = {"error": str(result)}
+            logger.warning("Indexes on %s not checked: %s", label, result)
+            continue
+        reports[label] = result
+        logger.info(
+            "Indexes on %s: created=%s existing=%s updated=%s",
+            label, result["created"], result["existing"], result["updated"]
+        )
+        for failure in result["failed"]:
+            logger.error("Index on %s failed: %s", label, failure)
+    return reports
@@ -0,0 +1,148 @@
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import Coroutine, Dict, Optional, Set
+
+import config
+from .metrics import registry
+
+logger = logging.getLogger(__name__)
+
+_holding_slot: ContextVar[bool] = ContextVar("holding_lane_slot", default=False)
+
+LANE_WAIT_SECONDS = registry.histogram(
+    "era_lane_wait_seconds", "Time an update waited for earlier updates in its chat and a free worker"
+)
+LANE_DROPPED = registry.counter("era_lane_dropped_total", "Updates dropped because their chat's lane was full")
+
+
+class ChatLanes:
+    """Runs update jobs in order per chat and in parallel across chats.
+
+    Each submitted job becomes a task that first waits for the previous job
+    of the same chat, then for one of `workers` slots. A job that is about to
+    wait on slow I/O can hand its slot back with `released()`, so a handful
+    of minute-long LLM calls can't hold up every other chat. A chat with
+    `max_depth` updates already waiting gets its new ones dropped, so one
+    flooding chat can't pile up unbounded tasks.
+    """
+
+    def __init__(self, workers: int, max_depth: int = 50):
+        self.workers = workers
+        self.max_depth = max_depth
+        self.dropped = 0
+        self.busy = 0
+        self.pending = 0
+        self._slots = asyncio.Semaphore(workers)
+        self._tails: Dict[int, asyncio.Task] = {}
+        self._depths: Dict[int, int] = {}
+        # Every unfinished job, not just each chat's last one, so drain() can cancel them all
+        self._tasks: Set[asyncio.Task] = set()
+
+    def submit(self, chat_id: int, job: Coroutine) -> Optional[asyncio.Task]:
+        """Queue `job` behind the chat's earlier updates. None means the lane was full and it was dropped."""
+        if self._depths.get(chat_id, 0) >= self.max_depth:
+            job.close()
+            self.dropped += 1
+            LANE_DROPPED.inc()
+            logger.debug("Lane for chat %s is full, dropping an update", chat_id)
+            return None
+
+        previous = self._tails.get(chat_id)
+        self._depths[chat_id] = self._depths.get(chat_id, 0) + 1
+        self.pending += 1
+        # The task copies the caller's context, so per-message timers keep working
+        task = asyncio.create_task(self._run(chat_id, previous, job), name=f"lane:{chat_id}")
+        self._tails[chat_id] = task
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    async def _run(self, chat_id: int, previous, job: Coroutine) -> None:
+        loop = asyncio.get_running_loop()
+        queued = loop.time()
+        try:
+            if previous is not None:
+                # Only the order matters; the previous job's errors are its own
+                await asyncio.wait([previous])
+            await self._slots.acquire()
+            LANE_WAIT_SECONDS.observe(loop.time() - queued)
+            self.busy += 1
+            _holding_slot.set(True)
+            try:
+                await job
+            finally:
+                # Not held if the job was cancelled while released() took it back
+                if _holding_slot.get():
+                    _holding_slot.set(False)
+                    self.busy -= 1
+                    self._slots.release()
+        except Exception as e:
+            logger.exception("Update job in chat %s failed: %s", chat_id, e)
+        finally:
+            job.close()
+            self.pending -= 1
+            depth = self._depths[chat_id] - 1
+            if depth:
+                self._depths[chat_id] = depth
+            else:
+                del self._depths[chat_id]
+                del self._tails[chat_id]
+
+    @asynccontextmanager
+    async def released(self):
+        """Give the worker slot back for the duration of the block."""
+        if not _holding_slot.get():
+            yield
+            return
+
+        self.busy -= 1
+        self._slots.release()
+        _holding_slot.set(False)
+        try:
+            yield
+        finally:
+            await self._slots.acquire()
+            _holding_slot.set(True)
+            self.busy += 1
+
+    async def wait(self, chat_id: int) -> None:
+        """Wait until everything submitted for `chat_id` so far has run."""
+        tail = self._tails.get(chat_id)
+        if tail is not None:
+            await asyncio.wait([tail])
+
+    async def drain(self, timeout: float = 10) -> None:
+        tasks = list(self._tasks)
+        if not tasks:
+            return
+        _, pending = await asyncio.wait(tasks, timeout=timeout)
+        for task in pending:
+            task.cancel()
+        if pending:
+            await asyncio.wait(pending)
+
+    def stats(self) -> Dict:
+        return {
+            "workers": self.workers,
+            "busy": self.busy,
+            "pending": self.pending,
+            "chats": len(self._depths),
+            "max_depth": max(self._depths.values(), default=0),
+            "dropped": self.dropped,
+        }
+
+
+chat_lanes = ChatLanes(max(1, config.CHAT_LANE_WORKERS), max(1, config.CHAT_LANE_MAX_DEPTH))
+
+registry.gauge("era_lane_workers_busy", "Lane workers running a job (not waiting on the LLM)", lambda: chat_lanes.busy)
+registry.gauge(
+    "era_lane_worker_utilization", "Share of lane workers in use",
+    lambda: chat_lanes.busy / chat_lanes.workers
+)
+registry.gauge("era_lane_pending", "Updates submitted to a chat lane and not finished", lambda: chat_lanes.pending)
+registry.gauge(
+    "era_lane_depth", "Chats with pending updates and the deepest single lane",
+    lambda: [({"stat": stat}, chat_lanes.stats()[key]) for stat, key in (("chats", "chats"), ("max", "max_depth"))]
+)
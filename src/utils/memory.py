@@ -0,0 +1,177 @@
+import asyncio
+import gc
+import os
+import resource
+import sys
+import tracemalloc
+import types
+from collections import deque
+from typing import Callable, Dict, List, Optional, Tuple
+
+import pyrogram
+
+# Stop walking a structure after this many objects; sizes are then lower bounds
+MAX_OBJECTS = 200_000
+
+# Objects walked between yields to the event loop, roughly 10ms of work
+WALK_CHUNK = 5_000
+
+# Counted but not followed: code, and objects that reach the whole process
+# (a queued reply holds the client, a task holds its loop)
+OPAQUE_TYPES = (
+    type, types.ModuleType, types.FunctionType, types.MethodType, types.BuiltinFunctionType,
+    asyncio.AbstractEventLoop, asyncio.Future, pyrogram.Client,
+)
+ATOMIC_TYPES = (str, bytes, int, float, bool, type(None))
+
+
+def rss_bytes() -> int:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        # Peak rather than current RSS outside Linux
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+
+
+def _walk(obj, max_objects: int):
+    """Generator behind deep_size(): yields every WALK_CHUNK objects so a
+    caller on the event loop can let other tasks run, returns (bytes, complete)."""
+    seen = set()
+    stack = [obj]
+    total = 0
+    while stack:
+        if len(seen) >= max_objects:
+            return total, False
+        current = stack.pop()
+        if id(current) in seen:
+            continue
+        seen.add(id(current))
+        total += sys.getsizeof(current, 0)
+        if len(seen) % WALK_CHUNK == 0:
+            yield
+
+        if isinstance(current, ATOMIC_TYPES + OPAQUE_TYPES):
+            continue
+        if isinstance(current, dict):
+            stack.extend(current.keys())
+            stack.extend(current.values())
+        elif isinstance(current, (list, tuple, set, frozenset, deque)):
+            stack.extend(current)
+        else:
+            if hasattr(current, "__dict__"):
+                stack.append(vars(current))
+            for name in getattr(type(current), "__slots__", ()):
+                value = getattr(current, name, None)
+                if value is not None:
+                    stack.append(value)
+    return total, True
+
+
+def deep_size(obj, max_objects: int = MAX_OBJECTS) -> Tuple[int, bool]:
+    """Approximate bytes held by `obj` and everything it references.
+
+    Follows containers, instance dicts and slots. OPAQUE_TYPES only add their
+    own size. Returns (bytes, complete).
+    """
+    walk = _walk(obj, max_objects)
+    while True:
+        try:
+            next(walk)
+        except StopIteration as done:
+            return done.value
+
+
+async def deep_size_async(obj, max_objects: int = MAX_OBJECTS) -> Tuple[int, bool]:
+    """deep_size() that yields to the event loop every WALK_CHUNK objects."""
+    walk = _walk(obj, max_objects)
+    while True:
+        try:
+            next(walk)
+        except StopIteration as done:
+            return done.value
+        await asyncio.sleep(0)
+
+
+# name -> function returning (object to measure, entry count); None skips it
+Source = Callable[[], Optional[Tuple[object, int]]]
+
+
+class MemoryReport:
+    """Sizes of the bot's long-lived in-process structures, plus tracemalloc diffs."""
+
+    def __init__(self):
+        self.sources: Dict[str, Source] = {}
+        self._snapshot: Optional[tracemalloc.Snapshot] = None
+
+    def register(self, name: str, source: Source) -> None:
+        self.sources[name] = source
+
+    async def structures(self) -> List[Tuple[str, int, int, bool]]:
+        """(name, entries, bytes, complete) for every registered source, biggest first.
+
+        Walking a large structure takes a while, so this keeps yielding to
+        other tasks rather than stalling every chat for the whole report.
+        """
+        rows = []
+        for name, source in self.sources.items():
+            try:
+                found = source()
+            except Exception:
+                continue
+            if found is None:
+                continue
+            obj, entries = found
+            size, complete = await deep_size_async(obj)
+            rows.append((name, entries, size, complete))
+            await asyncio.sleep(0)
+        return sorted(rows, key=lambda row: row[2], reverse=True)
+
+    async def trace(self, top: int = 10) -> Tuple[str, List[str]]:
+        """Start tracing, or diff against the previous snapshot and return the top growth sites.
+
+        Returns (status, lines); the first call only starts tracemalloc.
+        """
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._snapshot = None
+
+        snapshot = await asyncio.to_thread(self._take_snapshot)
+        previous, self._snapshot = self._snapshot, snapshot
+        if previous is None:
+            return "started", []
+
+        stats = await asyncio.to_thread(snapshot.compare_to, previous, "lineno")
+        lines = []
+        for stat in stats[:top]:
+            frame = stat.traceback[0]
+            where = "/".join(frame.filename.split(os.sep)[-2:])
+            lines.append(f"{where}:{frame.lineno} {stat.size_diff / 1024:+.1f}KB ({stat.count_diff:+d} blocks)")
+        return "diff", lines
+
+    @staticmethod
+    def _take_snapshot() -> tracemalloc.Snapshot:
+        return tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+        ))
+
+    def stop_trace(self) -> bool:
+        was_tracing = tracemalloc.is_tracing()
+        tracemalloc.stop()
+        self._snapshot = None
+        return was_tracing
+
+    @staticmethod
+    def process() -> Dict:
+        return {
+            "rss": rss_bytes(),
+            "gc_counts": gc.get_count(),
+            "tracing": tracemalloc.is_tracing(),
+            "traced": tracemalloc.get_traced_memory()[0] if tracemalloc.is_tracing() else None,
+        }
+
+
+memory_report = MemoryReport()
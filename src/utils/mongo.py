@@ -0,0 +1,162 @@
+import json
+import logging
+from typing import Dict, Optional
+from urllib.parse import urlsplit
+
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo.monitoring import ConnectionPoolListener
+
+import config
+from .metrics import registry
+
+logger = logging.getLogger(__name__)
+
+
+class PoolStats(ConnectionPoolListener):
+    """Connection pool events for one client. Called from pymongo's threads."""
+
+    def __init__(self):
+        self.created = 0
+        self.closed = 0
+        self.checked_out = 0
+        self.checked_in = 0
+        self.checkout_failures = 0
+        self.clears = 0
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        self.clears += 1
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        self.created += 1
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        self.closed += 1
+
+    def connection_check_out_started(self, event):
+        pass
+
+    def connection_check_out_failed(self, event):
+        self.checkout_failures += 1
+
+    def connection_checked_out(self, event):
+        self.checked_out += 1
+
+    def connection_checked_in(self, event):
+        self.checked_in += 1
+
+    def stats(self) -> Dict:
+        return {
+            "open": self.created - self.closed,
+            "in_use": self.checked_out - self.checked_in,
+            "checkouts": self.checked_out,
+            "checkout_failures": self.checkout_failures,
+            "clears": self.clears,
+        }
+
+
+def host_of(uri: str) -> str:
+    """The host part of a URI, without credentials, for labels and logs."""
+    try:
+        return urlsplit(uri).hostname or "unknown"
+    except ValueError:
+        return "unknown"
+
+
+class MongoClients:
+    """One Motor client per distinct URI, shared by every caller.
+
+    Options come from MONGO_* config, then `defaults` passed by the first
+    caller, then MONGO_CLIENT_OPTIONS entries keyed by host (or full URI).
+    """
+
+    def __init__(self, base_options: Dict, overrides: Dict[str, Dict]):
+        self.base_options = base_options
+        self.overrides = overrides
+        self.clients: Dict[str, AsyncIOMotorClient] = {}
+        self.names: Dict[str, str] = {}
+        self.pools: Dict[str, PoolStats] = {}
+
+    def options_for(self, uri: str, defaults: Optional[Dict] = None) -> Dict:
+        options = {**self.base_options, **(defaults or {})}
+        options.update(self.overrides.get(host_of(uri), {}))
+        options.update(self.overrides.get(uri, {}))
+        return options
+
+    def get(self, uri: str, name: Optional[str] = None, **defaults) -> AsyncIOMotorClient:
+        uri = uri.strip()
+        client = self.clients.get(uri)
+        if client is not None:
+            return client
+
+        listener = PoolStats()
+        # connect=False: no DNS lookup or monitor threads until the first query
+        client = AsyncIOMotorClient(uri, connect=False, event_listeners=[listener], **self.options_for(uri, defaults))
+        self.clients[uri] = client
+        self.names[uri] = name or host_of(uri)
+        self.pools[uri] = listener
+        return client
+
+    def close(self, client: AsyncIOMotorClient) -> None:
+        for uri, known in list(self.clients.items()):
+            if known is client:
+                client.close()
+                del self.clients[uri]
+                logger.debug("Closed Mongo client %s", self.names.pop(uri))
+                self.pools.pop(uri)
+
+    def close_all(self) -> None:
+        for client in list(self.clients.values()):
+            self.close(client)
+
+    def stats(self) -> Dict[str, Dict]:
+        return {self.names[uri]: pool.stats() for uri, pool in self.pools.items()}
+
+
+def _base_options() -> Dict:
+    options = {
+        "maxPoolSize": config.MONGO_MAX_POOL_SIZE,
+        "minPoolSize": config.MONGO_MIN_POOL_SIZE,
+        "connectTimeoutMS": config.MONGO_CONNECT_TIMEOUT_MS,
+        "serverSelectionTimeoutMS": config.MONGO_SERVER_SELECTION_TIMEOUT_MS,
+    }
+    if config.MONGO_COMPRESSORS:
+        options["compressors"] = config.MONGO_COMPRESSORS
+    return options
+
+
+def _overrides() -> Dict[str, Dict]:
+    if not config.MONGO_CLIENT_OPTIONS:
+        return {}
+    try:
+        return json.loads(config.MONGO_CLIENT_OPTIONS)
+    except ValueError as e:
+        logger.warning("Ignoring MONGO_CLIENT_OPTIONS, not valid JSON: %s", e)
+        return {}
+
+
+mongo_clients = MongoClients(_base_options(), _overrides())
+
+registry.gauge(
+    "era_mongo_pool_connections", "Connections per Mongo client, open and checked out",
+    lambda: [
+        ({"client": name, "state": state}, stats[state])
+        for name, stats in mongo_clients.stats().items()
+        for state in ("open", "in_use")
+    ]
+)
+registry.gauge(
+    "era_mongo_clients", "Distinct Mongo clients (one per URI)",
+    lambda: len(mongo_clients.clients)
+)
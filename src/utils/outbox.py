@@ -0,0 +1,221 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Deque, Dict, Optional
+
+from pyrogram.errors import FloodWait
+
+import config
+from .buckets import TokenBucket
+from .metrics import STAGE_SECONDS, registry
+
+logger = logging.getLogger(__name__)
+
+SEND_QUEUE_SECONDS = registry.histogram(
+    "era_send_queue_seconds", "Time from queuing a reply until it was sent or dropped, by outcome"
+)
+SEND_FLOOD_WAITS = registry.counter("era_send_flood_waits_total", "FloodWait errors on outgoing replies, by chat type")
+
+
+class _Outgoing:
+    __slots__ = ("client", "text", "kwargs", "queued", "future")
+
+    def __init__(self, client, text: str, kwargs: Dict, queued: float, future: asyncio.Future):
+        self.client = client
+        self.text = text
+        self.kwargs = kwargs
+        self.queued = queued
+        self.future = future
+
+
+class _Lane:
+    """Replies waiting for one chat, sent in order by a single task."""
+
+    __slots__ = ("items", "bucket", "blocked_until", "task")
+
+    def __init__(self, bucket: Optional[TokenBucket]):
+        self.items: Deque[_Outgoing] = deque()
+        self.bucket = bucket
+        self.blocked_until = 0.0
+        self.task: Optional[asyncio.Task] = None
+
+
+class Outbox:
+    """Sends replies through per-chat queues that respect Telegram's limits.
+
+    Each chat has its own token bucket (groups allow ~20 messages a minute,
+    private chats ~1 a second) and all chats share a global one. A FloodWait
+    only pauses the chat it came from. Replies that waited longer than
+    `max_age` are dropped rather than posted into a conversation that has
+    moved on. A rate of 0 disables that limit.
+    """
+
+    def __init__(
+        self,
+        global_rate: float,
+        group_rate: float,
+        private_rate: float,
+        chat_burst: float,
+        max_age: float,
+        max_per_chat: int,
+        evict_interval: float = 300
+    ):
+        now = time.monotonic()
+        self.global_bucket = TokenBucket(global_rate, max(1.0, global_rate), now) if global_rate > 0 else None
+        self.group_rate = group_rate
+        self.private_rate = private_rate
+        self.chat_burst = chat_burst
+        self.max_age = max_age
+        self.max_per_chat = max_per_chat
+
+        self.lanes: Dict[int, _Lane] = {}
+        self.sent = 0
+        self.dropped = {"stale": 0, "overflow": 0, "failed": 0}
+        self.flood_waits = 0
+
+        self.evict_interval = evict_interval
+        self._next_eviction = now + evict_interval
+
+    def _lane(self, chat_id: int, now: float) -> _Lane:
+        if now >= self._next_eviction:
+            self.evict_idle(now)
+
+        lane = self.lanes.get(chat_id)
+        if lane is None:
+            rate = self.group_rate if chat_id < 0 else self.private_rate
+            lane = self.lanes[chat_id] = _Lane(TokenBucket(rate, self.chat_burst, now) if rate > 0 else None)
+        return lane
+
+    def send(self, client, chat_id: int, text: str, **kwargs) -> asyncio.Future:
+        """Queue `client.send_message(chat_id, text, **kwargs)` and return at once.
+
+        The future resolves to the sent message, or None if the reply was
+        dropped or failed; nobody has to await it.
+        """
+        now = time.monotonic()
+        lane = self._lane(chat_id, now)
+
+        if len(lane.items) >= self.max_per_chat:
+            # The oldest reply is the least relevant one
+            self._finish(lane.items.popleft(), "overflow", now)
+
+        future = asyncio.get_running_loop().create_future()
+        lane.items.append(_Outgoing(client, text, kwargs, now, future))
+        if lane.task is None:
+            lane.task = asyncio.create_task(self._drain(chat_id, lane), name=f"outbox:{chat_id}")
+        return future
+
+    def reply(self, client, message, text: str, **kwargs) -> asyncio.Future:
+        """Queue a reply to `message` the way Message.reply_text sends one: quoting
+        it and in its forum topic."""
+        kwargs.setdefault("reply_to_message_id", message.id)
+        kwargs.setdefault("message_thread_id", message.message_thread_id)
+        return self.send(client, message.chat.id, text, **kwargs)
+
+    def _finish(self, item: _Outgoing, outcome: str, now: float, result=None) -> None:
+        if outcome == "sent":
+            self.sent += 1
+        else:
+            self.dropped[outcome] += 1
+        SEND_QUEUE_SECONDS.observe(now - item.queued, outcome=outcome)
+        if not item.future.done():
+            item.future.set_result(result)
+
+    def _delay(self, lane: _Lane, now: float) -> float:
+        """Seconds until this chat may send, or 0 after taking the tokens."""
+        if lane.blocked_until > now:
+            return lane.blocked_until - now
+        for bucket in (lane.bucket, self.global_bucket):
+            if bucket is not None and bucket.refill(now) < 1:
+                return (1 - bucket.tokens) / bucket.rate
+        for bucket in (lane.bucket, self.global_bucket):
+            if bucket is not None:
+                bucket.tokens -= 1
+        return 0.0
+
+    async def _drain(self, chat_id: int, lane: _Lane) -> None:
+        try:
+            while lane.items:
+                now = time.monotonic()
+                if now - lane.items[0].queued > self.max_age:
+                    self._finish(lane.items.popleft(), "stale", now)
+                    continue
+
+                delay = self._delay(lane, now)
+                if delay:
+                    await asyncio.sleep(delay)
+                    continue
+
+                item = lane.items.popleft()
+                started = time.perf_counter()
+                try:
+                    result = await item.client.send_message(chat_id, item.text, **item.kwargs)
+                except FloodWait as e:
+                    # Only this chat waits; the reply goes back to the front
+                    self.flood_waits += 1
+                    SEND_FLOOD_WAITS.inc(chat_type="group" if chat_id < 0 else "private")
+                    lane.blocked_until = time.monotonic() + e.value
+                    lane.items.appendleft(item)
+                    logger.warning("FloodWait of %ss sending to %s", e.value, chat_id)
+                    continue
+                except Exception as e:
+                    logger.warning("Reply to %s failed: %s", chat_id, e)
+                    self._finish(item, "failed", time.monotonic())
+                    continue
+                finally:
+                    # The message's own timer has finished by now; only the histogram sees this
+                    STAGE_SECONDS.observe(time.perf_counter() - started, stage="send")
+                self._finish(item, "sent", time.monotonic(), result)
+        finally:
+            lane.task = None
+
+    def evict_idle(self, now: Optional[float] = None) -> int:
+        """Forget chats with nothing queued, no FloodWait pending and a full bucket."""
+        now = time.monotonic() if now is None else now
+        idle = [
+            chat_id for chat_id, lane in self.lanes.items()
+            if not lane.items and lane.task is None and lane.blocked_until <= now
+            and (lane.bucket is None or lane.bucket.is_idle(now))
+        ]
+        for chat_id in idle:
+            del self.lanes[chat_id]
+        self._next_eviction = now + self.evict_interval
+        return len(idle)
+
+    async def drain(self, timeout: float = 10) -> None:
+        """Wait for queued replies to go out, e.g. before shutting down."""
+        tasks = [lane.task for lane in self.lanes.values() if lane.task is not None]
+        if not tasks:
+            return
+        _, pending = await asyncio.wait(tasks, timeout=timeout)
+        for task in pending:
+            task.cancel()
+
+    def queued(self) -> int:
+        return sum(len(lane.items) for lane in self.lanes.values())
+
+    def stats(self) -> Dict:
+        return {
+            "queued": self.queued(),
+            "chats": len(self.lanes),
+            "sent": self.sent,
+            "dropped": dict(self.dropped),
+            "flood_waits": self.flood_waits,
+        }
+
+
+outbox = Outbox(
+    global_rate=config.SEND_GLOBAL_RATE,
+    group_rate=config.SEND_GROUP_RATE_PER_MINUTE / 60,
+    private_rate=config.SEND_PRIVATE_RATE,
+    chat_burst=config.SEND_CHAT_BURST,
+    max_age=config.SEND_MAX_AGE,
+    max_per_chat=config.SEND_MAX_QUEUED_PER_CHAT,
+)
+
+registry.gauge("era_send_queued", "Replies waiting in the outbox", outbox.queued)
+registry.gauge(
+    "era_send_dropped", "Replies dropped by the outbox, by reason",
+    lambda: [({"reason": reason}, count) for reason, count in outbox.dropped.items()]
+)
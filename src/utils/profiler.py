@@ -0,0 +1,148 @@
+import os
+import signal
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+# Which part of the bot a sample belongs to: first match from the leaf up
+COMPONENTS = (
+    ("prompt_builder", ("utils/prompt_builder.py",)),
+    ("storage", ("utils/storage.py", "utils/write_buffer.py", "utils/state.py", "database/", "motor/", "pymongo/")),
+    ("era", ("utils/era.py", "aiohttp/")),
+    ("handlers", ("modules/",)),
+)
+
+Stack = Tuple[str, ...]
+
+
+class SamplingProfiler:
+    """Samples the event loop thread's Python stack at a fixed interval.
+
+    On Unix a SIGPROF timer interrupts the main thread every `interval` of
+    CPU time and the handler records the interrupted stack, so there are no
+    tracing hooks and no cost between samples. Elsewhere, or off the main
+    thread, a helper thread reads sys._current_frames() instead; that one
+    can only look while the loop releases the GIL, which mostly happens in
+    select(), so it under-reports busy code.
+    """
+
+    def __init__(self, interval: float = 0.01, max_depth: int = 64):
+        self.interval = interval
+        self.max_depth = max_depth
+        self.samples: Counter = Counter()
+        self.mode = ""
+        self.active = False
+        self.started = 0.0
+        self.duration = 0.0
+        self._labels: Dict[object, str] = {}
+        self._target: Optional[int] = None
+        self._previous_handler = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        """Start sampling the calling thread, which should run the event loop."""
+        if self.active:
+            raise RuntimeError("profiler already running")
+        self.samples = Counter()
+        self.started = time.perf_counter()
+        self.active = True
+
+        if hasattr(signal, "setitimer") and threading.current_thread() is threading.main_thread():
+            self.mode = "signal"
+            self._previous_handler = signal.signal(signal.SIGPROF, self._on_signal)
+            signal.setitimer(signal.ITIMER_PROF, self.interval, self.interval)
+        else:
+            self.mode = "thread"
+            self._target = threading.get_ident()
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        if not self.active:
+            return
+        if self.mode == "signal":
+            signal.setitimer(signal.ITIMER_PROF, 0)
+            signal.signal(signal.SIGPROF, self._previous_handler or signal.SIG_DFL)
+        elif self.mode == "thread":
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+        self.active = False
+        self.duration = time.perf_counter() - self.started
+
+    def _label(self, code) -> str:
+        label = self._labels.get(code)
+        if label is None:
+            path = "/".join(code.co_filename.split(os.sep)[-2:])
+            label = self._labels[code] = f"{path}:{getattr(code, 'co_qualname', code.co_name)}"
+        return label
+
+    def _record(self, frame) -> None:
+        stack = []
+        while frame is not None and len(stack) < self.max_depth:
+            stack.append(self._label(frame.f_code))
+            frame = frame.f_back
+        # Root first, as flamegraph tools expect
+        self.samples[tuple(reversed(stack))] += 1
+
+    def _on_signal(self, signum, frame) -> None:
+        self._record(frame)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self._target)
+            if frame is not None:
+                self._record(frame)
+            del frame
+
+    @property
+    def total(self) -> int:
+        return sum(self.samples.values())
+
+    @staticmethod
+    def is_idle(stack: Stack) -> bool:
+        # The event loop waiting in select/epoll for the next event
+        return bool(stack) and "selectors.py:" in stack[-1] and stack[-1].endswith(".select")
+
+    @staticmethod
+    def _component(stack: Stack) -> str:
+        for frame in reversed(stack):
+            for name, markers in COMPONENTS:
+                if any(marker in frame for marker in markers):
+                    return name
+        return "other"
+
+    def components(self) -> Dict[str, int]:
+        counts: Counter = Counter()
+        for stack, count in self.samples.items():
+            if self.is_idle(stack):
+                counts["idle"] += count
+                continue
+            counts[self._component(stack)] += count
+        return dict(counts.most_common())
+
+    def top_functions(self, limit: int = 15) -> List[Tuple[str, int, int]]:
+        """(function, self samples, total samples), busiest by self time, idle time excluded.
+
+        Sorted by self time because the loop's own frames are under every sample.
+        """
+        own: Counter = Counter()
+        inclusive: Counter = Counter()
+        for stack, count in self.samples.items():
+            if not stack or self.is_idle(stack):
+                continue
+            own[stack[-1]] += count
+            for frame in set(stack):
+                inclusive[frame] += count
+        return [(frame, count, inclusive[frame]) for frame, count in own.most_common(limit)]
+
+    def collapsed(self) -> str:
+        """Brendan Gregg's collapsed format: `root;...;leaf count` per line."""
+        return "".join(f"{';'.join(stack)} {count}\n" for stack, count in self.samples.most_common())
+
+
+profiler = SamplingProfiler()
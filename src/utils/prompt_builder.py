@@ -1,21 +1,47 @@
-import json
+import asyncio
+import logging
 import os
 import random
+import unicodedata
 from typing import Dict, List, Any
 from .storage import temp_users_manager
+from .codec import loads
+
+logger = logging.getLogger(__name__)
+
+STOP_WORDS = frozenset({'the', 'and', 'but', 'hai', 'hu', 'mai', 'kya', 'kyun', 'kaise'})
+CUT_PUNCTUATION = frozenset({'.', '?', '!', ','})
+
+
+def is_emoji(word: str) -> bool:
+    """Words starting with a pictograph (Unicode category So) don't count toward the limit."""
+    return unicodedata.category(word[0]) == 'So'
+
 
 class PromptBuilder:
     def __init__(self):
         self.prompts_dir = os.path.join(os.path.dirname(__file__), "prompts")
-        self._load_all_prompts()
+        self._prompts = None
+    
+    @property
+    def prompts(self) -> Dict:
+        # Loaded on first use so importing this module doesn't touch the disk
+        if self._prompts is None:
+            self._load_all_prompts()
+        return self._prompts
     
     def _load_all_prompts(self):
-        self.prompts = {}
+        prompts = {}
         
-        self.prompts['persona'] = self._load_category('persona')
-        self.prompts['responses'] = self._load_category('responses')
-        self.prompts['context'] = self._load_category('context')
-        self.prompts['config'] = self._load_category('config')
+        prompts['persona'] = self._load_category('persona')
+        prompts['responses'] = self._load_category('responses')
+        prompts['context'] = self._load_category('context')
+        prompts['config'] = self._load_category('config')
+        self._prompts = prompts
+    
+    async def preload(self) -> None:
+        """Read the prompt files in a thread, e.g. while the client connects."""
+        await asyncio.to_thread(lambda: self.prompts)
     
     def _load_category(self, category: str) -> Dict:
         category_path = os.path.join(self.prompts_dir, category)
@@ -25,9 +51,9 @@ class PromptBuilder:
             for filename in os.listdir(category_path):
                 if filename.endswith('.json'):
                     file_path = os.path.join(category_path, filename)
-                    with open(file_path, 'r', encoding='utf-8') as f:
+                    with open(file_path, 'rb') as f:
                         key = filename.replace('.json', '')
-                        result[key] = json.load(f)
+                        result[key] = loads(f.read())
         
         return result
     
@@ -110,7 +136,7 @@ class PromptBuilder:
             ]
             
             if any(pattern in message_lower for pattern in name_confusion_patterns):
-                user_memory = temp_users_manager.user_memories.get(user_id)
+                user_memory = await temp_users_manager.get_user_memory(user_id)
                 if user_memory and user_memory.get('confirmed_name'):
                     confirmed_name = user_memory['confirmed_name']
                     return True, False, f"you're {confirmed_name}, right?"
@@ -131,7 +157,7 @@ class PromptBuilder:
             return False, False, None
             
         except Exception as e:
-            print(f"Error checking name confirmation: {e}")
+            logger.error("Error checking name confirmation: %s", e)
             return False, False, None
     
     async def detect_rude_message(self, message: str, user_id: int) -> tuple:
@@ -142,7 +168,7 @@ class PromptBuilder:
                 return True, response
             return False, None
         except Exception as e:
-            print(f"Error detecting rude message: {e}")
+            logger.error("Error detecting rude message: %s", e)
             return False, None
     
     async def process_user_message(self, user_id: int, message: str) -> tuple:
@@ -363,34 +389,37 @@ HARD CONSTRAINTS:
             max_words = word_limits['response_constraints']['max_words']
         
         words = response.split()
-        filtered_words = [word for word in words if not word.startswith(('🙂', '😊', '💕', '✨', '😍', '😉', '🎉'))]
+        if len(words) <= max_words:
+            # Can't be over the limit even if every word counts
+            return response.replace('\n', ' ').strip()
+        
+        # One scan: find the first counted word past the limit and count important words
+        counted = 0
+        important = 0
+        overflow = None
+        for index, word in enumerate(words):
+            if len(word) > 2 and word not in STOP_WORDS:
+                important += 1
+                if overflow is not None and important > max_words:
+                    break
+            if overflow is None and not is_emoji(word):
+                counted += 1
+                if counted > max_words:
+                    overflow = index
+                    if important > max_words:
+                        break
         
-        if len(filtered_words) > max_words:
+        if overflow is not None:
             response_lower = response.lower()
             forbidden_fragments = word_limits.get('meaning_validation', {}).get('forbidden_fragments', [])
             
             if any(fragment in response_lower for fragment in forbidden_fragments):
                 return response
             
-            important_words = [w for w in words if len(w) > 2 and w not in ['the', 'and', 'but', 'hai', 'hu', 'mai', 'kya', 'kyun', 'kaise']]
-            
-            if len(important_words) <= max_words:
-                final_words = []
-                word_count = 0
-                
-                for word in words:
-                    if not word.startswith(('🙂', '😊', '💕', '✨', '😍', '😉', '🎉')):
-                        word_count += 1
-                        
-                    if word_count <= max_words:
-                        final_words.append(word)
-                    elif word in ['.', '?', '!', ',']:
-                        final_words.append(word)
-                        break
-                    else:
-                        break
-                
-                response = ' '.join(final_words).strip()
+            if important <= max_words:
+                # A closing punctuation token right at the limit is kept
+                cut = overflow + 1 if words[overflow] in CUT_PUNCTUATION else overflow
+                response = ' '.join(words[:cut]).strip()
             
             if response.endswith('... 😊') and len(response.split()) > max_words + 2:
                 if '?' in response:
@@ -398,16 +427,7 @@ HARD CONSTRAINTS:
                 elif '.' in response:
                     response = response.split('.')[0] + '.'
                 else:
-                    words_to_keep = []
-                    word_count = 0
-                    for word in words:
-                        if not word.startswith(('🙂', '😊', '💕', '✨', '😍', '😉', '🎉')):
-                            word_count += 1
-                        if word_count <= max_words:
-                            words_to_keep.append(word)
-                        else:
-                            break
-                    response = ' '.join(words_to_keep).strip()
+                    response = ' '.join(words[:overflow]).strip()
         
         response = response.replace('\n', ' ').strip()
         
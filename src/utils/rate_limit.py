@@ -0,0 +1,75 @@
+from typing import Dict, Optional
+
+import config
+from .metrics import registry
+from .state import StateBackend, state
+
+
+class RateLimiter:
+    """Token buckets per user, per chat and globally, kept in the state backend."""
+
+    def __init__(
+        self,
+        backend: StateBackend,
+        user_rate: float,
+        user_burst: float,
+        chat_rate: float,
+        chat_burst: float,
+        global_rate: float,
+        global_burst: float
+    ):
+        self.backend = backend
+        self.user_limit = (user_rate, user_burst)
+        self.chat_limit = (chat_rate, chat_burst)
+        self.global_limit = (global_rate, global_burst)
+
+        self.allowed = 0
+        self.throttled = {"user": 0, "chat": 0, "global": 0}
+
+    async def allow(self, user_id: int, chat_id: int, now: Optional[float] = None) -> bool:
+        scopes, buckets = [], []
+        for scope, key, (rate, burst) in (
+            ("user", f"user:{user_id}", self.user_limit),
+            ("chat", f"chat:{chat_id}", self.chat_limit),
+            ("global", "global", self.global_limit),
+        ):
+            if rate > 0:
+                scopes.append(scope)
+                buckets.append((key, rate, burst))
+
+        if not buckets:
+            self.allowed += 1
+            return True
+
+        # The backend checks every bucket before spending, so a message
+        # rejected by one scope doesn't use up tokens in the others.
+        rejected = await self.backend.take_tokens(buckets, now)
+        if rejected is not None:
+            self.throttled[scopes[rejected]] += 1
+            return False
+
+        self.allowed += 1
+        return True
+
+    def stats(self) -> Dict:
+        return {
+            "allowed": self.allowed,
+            "throttled": dict(self.throttled),
+            "backend": self.backend.stats(),
+        }
+
+
+rate_limiter = RateLimiter(
+    state,
+    user_rate=config.RATE_LIMIT_USER_RATE,
+    user_burst=config.RATE_LIMIT_USER_BURST,
+    chat_rate=config.RATE_LIMIT_CHAT_RATE,
+    chat_burst=config.RATE_LIMIT_CHAT_BURST,
+    global_rate=config.RATE_LIMIT_GLOBAL_RATE,
+    global_burst=config.RATE_LIMIT_GLOBAL_BURST,
+)
+
+registry.gauge(
+    "era_rate_limited_messages", "Messages rejected by the rate limiter, by scope",
+    lambda: [({"scope": scope}, count) for scope, count in rate_limiter.throttled.items()]
+)
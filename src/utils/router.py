@@ -0,0 +1,60 @@
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Optional
+
+from .features import MessageFeatures, get_features
+from .metrics import MESSAGES_TOTAL, registry
+
+RouteHandler = Callable[..., Awaitable[None]]
+
+
+class Router:
+    """Single entry point that sends each text update to exactly one route."""
+
+    def __init__(self, max_tracked: int = 4096):
+        self.routes: Dict[str, RouteHandler] = {}
+        self.max_tracked = max_tracked
+        self.duplicates = 0
+        self._answered = OrderedDict()
+
+    def classify(self, features: MessageFeatures) -> Optional[str]:
+        if features.is_other_bot_command:
+            return None
+        if not features.is_group:
+            return "private"
+        if features.mentions_bot:
+            return "mention"
+        if features.reply_to_bot:
+            return "reply"
+        if features.is_reply:
+            # Replies to other people's messages are not for us
+            return None
+        return "group"
+
+    def claim(self, message) -> bool:
+        """Mark the update as answered. False means another path already answered it."""
+        key = (message.chat.id, message.id)
+        if getattr(message, "_answered", False) or key in self._answered:
+            self.duplicates += 1
+            return False
+
+        message._answered = True
+        self._answered[key] = True
+        if len(self._answered) > self.max_tracked:
+            self._answered.popitem(last=False)
+        return True
+
+    async def dispatch(self, client, message) -> Optional[str]:
+        features = get_features(client, message)
+        name = self.classify(features)
+        handler = self.routes.get(name)
+        if handler is None:
+            return None
+
+        MESSAGES_TOTAL.inc(route=name)
+        await handler(client, message, features)
+        return name
+
+
+router = Router()
+
+registry.gauge("era_duplicate_answers_blocked", "Updates that reached a second answer path", lambda: router.duplicates)
@@ -0,0 +1,183 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from contextlib import asynccontextmanager
+from typing import Dict, List, Optional
+
+import config
+from .metrics import registry
+
+logger = logging.getLogger(__name__)
+
+# Lower rank is more important and is shed last
+PRIORITIES = {"private": 0, "mention": 1, "ambient": 2}
+
+LLM_QUEUE_WAIT_SECONDS = registry.histogram(
+    "era_llm_queue_wait_seconds", "Time a message waited for an LLM slot, by priority and outcome"
+)
+LLM_SHED_TOTAL = registry.counter("era_llm_shed_total", "Messages dropped from the LLM queue, by priority")
+
+
+class _Entry:
+    __slots__ = ("finish", "seq", "priority", "chat_id", "future", "enqueued")
+
+    def __init__(self, finish: float, seq: int, priority: str, chat_id: int, future: asyncio.Future, enqueued: float):
+        self.finish = finish
+        self.seq = seq
+        self.priority = priority
+        self.chat_id = chat_id
+        self.future = future
+        self.enqueued = enqueued
+
+    def __lt__(self, other: "_Entry") -> bool:
+        return (self.finish, self.seq) < (other.finish, other.seq)
+
+
+class LLMScheduler:
+    """Hands out a fixed number of LLM slots by weighted fair queuing.
+
+    Every chat is its own flow. A queued message gets a virtual finish time of
+    max(now, the chat's last finish) + 1 / weight, and the smallest finish goes
+    next, so a busy group only delays its own messages while private chats and
+    mentions, which weigh more, move ahead. Once `max_queued` messages wait,
+    the least important and latest one is dropped to make room.
+    """
+
+    def __init__(self, max_concurrent: int, max_queued: int, weights: Dict[str, float]):
+        self.max_concurrent = max_concurrent
+        self.max_queued = max_queued
+        self.weights = weights
+
+        self.active = 0
+        self.queued: Dict[str, int] = dict.fromkeys(PRIORITIES, 0)
+        self.shed: Dict[str, int] = dict.fromkeys(PRIORITIES, 0)
+        self._heap: List[_Entry] = []
+        self._vtime = 0.0
+        self._finish: Dict[int, float] = {}
+        self._flows: Dict[int, int] = {}
+        self._seq = itertools.count()
+
+    def _enqueue(self, priority: str, chat_id: int) -> _Entry:
+        start = max(self._vtime, self._finish.get(chat_id, 0.0))
+        finish = self._finish[chat_id] = start + 1 / self.weights.get(priority, 1.0)
+        entry = _Entry(finish, next(self._seq), priority, chat_id,
+                       asyncio.get_running_loop().create_future(), time.perf_counter())
+        heapq.heappush(self._heap, entry)
+        self.queued[priority] += 1
+        self._flows[chat_id] = self._flows.get(chat_id, 0) + 1
+        return entry
+
+    def _dequeue(self, entry: _Entry) -> None:
+        self.queued[entry.priority] -= 1
+        remaining = self._flows[entry.chat_id] - 1
+        if remaining:
+            self._flows[entry.chat_id] = remaining
+        else:
+            # An idle chat starts from the current virtual time again
+            del self._flows[entry.chat_id]
+            del self._finish[entry.chat_id]
+
+    def _victim(self, priority: str) -> Optional[_Entry]:
+        """The queued entry to drop for a newcomer of `priority`, if any ranks no higher."""
+        victim = None
+        for entry in self._heap:
+            if entry.future.done():
+                continue
+            # Ties on finish time (different chats) go to the one queued last
+            if victim is None or (PRIORITIES[entry.priority], entry.finish, entry.seq) > (
+                PRIORITIES[victim.priority], victim.finish, victim.seq
+            ):
+                victim = entry
+        if victim is not None and PRIORITIES[victim.priority] >= PRIORITIES[priority]:
+            return victim
+        return None
+
+    def _drop(self, entry: _Entry, now: float) -> None:
+        self._dequeue(entry)
+        self.shed[entry.priority] += 1
+        LLM_SHED_TOTAL.inc(priority=entry.priority)
+        LLM_QUEUE_WAIT_SECONDS.observe(now - entry.enqueued, priority=entry.priority, outcome="shed")
+        entry.future.set_result(False)
+
+    def _grant(self) -> None:
+        while self.active < self.max_concurrent and self._heap:
+            entry = heapq.heappop(self._heap)
+            if entry.future.done():
+                # Dropped or cancelled while it waited
+                continue
+            self._vtime = entry.finish
+            self._dequeue(entry)
+            self.active += 1
+            LLM_QUEUE_WAIT_SECONDS.observe(time.perf_counter() - entry.enqueued, priority=entry.priority, outcome="granted")
+            entry.future.set_result(True)
+
+    async def acquire(self, priority: str, chat_id: int) -> bool:
+        """Wait for a slot. False means the message was shed and must not call the LLM."""
+        if self.active < self.max_concurrent and not any(self.queued.values()):
+            self.active += 1
+            LLM_QUEUE_WAIT_SECONDS.observe(0.0, priority=priority, outcome="granted")
+            return True
+
+        if sum(self.queued.values()) >= self.max_queued:
+            now = time.perf_counter()
+            victim = self._victim(priority)
+            if victim is None:
+                self.shed[priority] += 1
+                LLM_SHED_TOTAL.inc(priority=priority)
+                LLM_QUEUE_WAIT_SECONDS.observe(0.0, priority=priority, outcome="shed")
+                return False
+            logger.debug("LLM queue full, dropping %s message from chat %s", victim.priority, victim.chat_id)
+            self._drop(victim, now)
+
+        entry = self._enqueue(priority, chat_id)
+        try:
+            return await entry.future
+        except asyncio.CancelledError:
+            if entry.future.done() and not entry.future.cancelled():
+                # Granted in the same tick the waiter was cancelled
+                if entry.future.result():
+                    self.release()
+            else:
+                self._dequeue(entry)
+            raise
+
+    def release(self) -> None:
+        self.active -= 1
+        self._grant()
+
+    @asynccontextmanager
+    async def slot(self, priority: str, chat_id: int):
+        """`async with scheduler.slot(...) as granted:`; the slot is freed on exit."""
+        granted = await self.acquire(priority, chat_id)
+        try:
+            yield granted
+        finally:
+            if granted:
+                self.release()
+
+    def stats(self) -> Dict:
+        return {
+            "active": self.active,
+            "max_concurrent": self.max_concurrent,
+            "queued": dict(self.queued),
+            "shed": dict(self.shed),
+        }
+
+
+llm_scheduler = LLMScheduler(
+    config.LLM_MAX_CONCURRENCY,
+    config.LLM_MAX_QUEUED,
+    {
+        "private": config.LLM_WEIGHT_PRIVATE,
+        "mention": config.LLM_WEIGHT_MENTION,
+        "ambient": config.LLM_WEIGHT_AMBIENT,
+    },
+)
+
+registry.gauge("era_llm_active", "LLM requests holding a scheduler slot", lambda: llm_scheduler.active)
+registry.gauge(
+    "era_llm_queued", "Messages waiting for an LLM slot, by priority",
+    lambda: [({"priority": priority}, count) for priority, count in llm_scheduler.queued.items()]
+)
@@ -0,0 +1,58 @@
+import asyncio
+import logging
+import time
+from contextlib import contextmanager
+from typing import Awaitable, Dict, Optional
+
+from src import BOOT_STARTED
+from .metrics import registry
+
+logger = logging.getLogger(__name__)
+
+
+class StartupReport:
+    """How long each boot phase took, logged once the bot can answer."""
+
+    def __init__(self, started: float):
+        self.started = started
+        self.phases: Dict[str, float] = {}
+        self.ready: Optional[float] = None
+
+    def add(self, name: str, seconds: float) -> None:
+        self.phases[name] = seconds
+
+    @contextmanager
+    def phase(self, name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - started)
+
+    async def timed(self, name: str, awaitable: Awaitable):
+        with self.phase(name):
+            return await awaitable
+
+    async def warmup(self, name: str, awaitable: Awaitable, timeout: float = 10) -> None:
+        """Like timed(), but a failed or slow warmup is only logged."""
+        try:
+            await self.timed(name, asyncio.wait_for(awaitable, timeout))
+        except Exception as e:
+            logger.warning("Startup warmup %s failed: %r", name, e)
+
+    def mark_ready(self) -> float:
+        self.ready = time.perf_counter() - self.started
+        return self.ready
+
+    def summary(self) -> str:
+        phases = " ".join(f"{name}={seconds * 1000:.0f}ms" for name, seconds in self.phases.items())
+        return f"ready in {(self.ready or 0) * 1000:.0f}ms ({phases})"
+
+
+# Measured from the first line of src/__init__, before pyrogram is imported
+startup = StartupReport(BOOT_STARTED)
+
+registry.gauge(
+    "era_startup_seconds", "Duration of each startup phase in the last boot",
+    lambda: [({"phase": name}, seconds) for name, seconds in startup.phases.items()]
+)
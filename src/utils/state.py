@@ -0,0 +1,257 @@
+import logging
+import time
+from abc import ABC, abstractmethod
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from pymongo import ReturnDocument
+
+import config
+from .buckets import TokenBucket
+from .metrics import MONGO_OP_SECONDS
+from .mongo import mongo_clients
+
+logger = logging.getLogger(__name__)
+
+# (key, tokens per second, bucket size)
+BucketSpec = Tuple[str, float, float]
+
+
+class StateBackend(ABC):
+    """Per-user runtime state: chat history, memories, rate-limit buckets and
+    the last reply type per chat. Every method is async so the same calls work
+    whether the state lives in this process or is shared between replicas. A
+    backend missing one of them fails when it's constructed.
+    """
+
+    name = "base"
+
+    @abstractmethod
+    async def get_history(self, user_id: int, chat_id: int) -> List[Dict]:
+        ...
+
+    @abstractmethod
+    async def append_history(self, user_id: int, chat_id: int, messages: List[Dict], limit: int = 10) -> List[Dict]:
+        """Append `messages`, keep the newest `limit` and return the history."""
+
+    @abstractmethod
+    async def clear_history(self, user_id: int, chat_id: int) -> None:
+        ...
+
+    @abstractmethod
+    async def get_memory(self, user_id: int) -> Optional[Dict]:
+        ...
+
+    @abstractmethod
+    async def set_memory(self, user_id: int, memory: Dict) -> None:
+        ...
+
+    @abstractmethod
+    async def take_tokens(self, buckets: List[BucketSpec], now: Optional[float] = None) -> Optional[int]:
+        """Spend one token from every bucket, or none of them.
+
+        Returns the index of the first bucket that was empty, or None when the
+        tokens were spent.
+        """
+
+    @abstractmethod
+    async def swap_response_type(self, chat_id: int, msg_type: str) -> Optional[str]:
+        """Record the type of the latest reply in a chat and return the previous one."""
+
+    def stats(self) -> Dict:
+        return {"backend": self.name}
+
+
+class MemoryState(StateBackend):
+    """Keeps everything in process-global dicts; lost on restart, not shared."""
+
+    name = "memory"
+
+    def __init__(self, evict_interval: float = 300):
+        self.histories: Dict[str, List[Dict]] = {}
+        self.memories: Dict[int, Dict] = {}
+        self.buckets: Dict[str, TokenBucket] = {}
+        self.response_types: Dict[int, str] = {}
+
+        self.evict_interval = evict_interval
+        self.evicted = 0
+        self._next_eviction = time.monotonic() + evict_interval
+
+    async def get_history(self, user_id: int, chat_id: int) -> List[Dict]:
+        return self.histories.get(f"{user_id}:{chat_id}", [])
+
+    async def append_history(self, user_id: int, chat_id: int, messages: List[Dict], limit: int = 10) -> List[Dict]:
+        key = f"{user_id}:{chat_id}"
+        history = self.histories.get(key, []) + messages
+        history = self.histories[key] = history[-limit:]
+        return history
+
+    async def clear_history(self, user_id: int, chat_id: int) -> None:
+        self.histories.pop(f"{user_id}:{chat_id}", None)
+
+    async def get_memory(self, user_id: int) -> Optional[Dict]:
+        return self.memories.get(user_id)
+
+    async def set_memory(self, user_id: int, memory: Dict) -> None:
+        self.memories[user_id] = memory
+
+    async def take_tokens(self, buckets: List[BucketSpec], now: Optional[float] = None) -> Optional[int]:
+        now = time.monotonic() if now is None else now
+        if now >= self._next_eviction:
+            self.evict_idle(now)
+
+        resolved = []
+        for key, rate, burst in buckets:
+            bucket = self.buckets.get(key)
+            if bucket is None:
+                bucket = self.buckets[key] = TokenBucket(rate, burst, now)
+            resolved.append(bucket)
+
+        for index, bucket in enumerate(resolved):
+            if bucket.refill(now) < 1:
+                return index
+
+        for bucket in resolved:
+            bucket.tokens -= 1
+        return None
+
+    def evict_idle(self, now: Optional[float] = None) -> int:
+        now = time.monotonic() if now is None else now
+        idle_keys = [key for key, bucket in self.buckets.items() if bucket.is_idle(now)]
+        for key in idle_keys:
+            del self.buckets[key]
+
+        self.evicted += len(idle_keys)
+        self._next_eviction = now + self.evict_interval
+        return len(idle_keys)
+
+    async def swap_response_type(self, chat_id: int, msg_type: str) -> Optional[str]:
+        previous = self.response_types.get(chat_id)
+        self.response_types[chat_id] = msg_type
+        return previous
+
+    def stats(self) -> Dict:
+        return {
+            "backend": self.name,
+            "histories": len(self.histories),
+            "memories": len(self.memories),
+            "buckets": len(self.buckets),
+            "evicted_buckets": self.evicted,
+            "response_types": len(self.response_types),
+        }
+
+
+class MongoState(StateBackend):
+    """Keeps state in the main database so several bot processes can share it.
+
+    Buckets use wall-clock time (monotonic clocks differ between hosts) and are
+    refilled and spent by a single pipeline update, so concurrent replicas
+    can't both take the last token.
+    """
+
+    name = "mongo"
+
+    def __init__(self, db):
+        self.history = db["state_history"]
+        self.memories = db["state_memories"]
+        self.buckets = db["state_buckets"]
+        self.response_types = db["state_response_types"]
+        self.errors = 0
+
+    async def get_history(self, user_id: int, chat_id: int) -> List[Dict]:
+        with MONGO_OP_SECONDS.time(op="find_one", collection="state_history", shard="main"):
+            doc = await self.history.find_one({"_id": f"{user_id}:{chat_id}"}, {"messages": 1})
+        return doc["messages"] if doc else []
+
+    async def append_history(self, user_id: int, chat_id: int, messages: List[Dict], limit: int = 10) -> List[Dict]:
+        with MONGO_OP_SECONDS.time(op="find_one_and_update", collection="state_history", shard="main"):
+            doc = await self.history.find_one_and_update(
+                {"_id": f"{user_id}:{chat_id}"},
+                {
+                    "$push": {"messages": {"$each": messages, "$slice": -limit}},
+                    "$set": {"updated_at": datetime.utcnow()},
+                },
+                projection={"messages": 1},
+                upsert=True,
+                return_document=ReturnDocument.AFTER,
+            )
+        return doc["messages"]
+
+    async def clear_history(self, user_id: int, chat_id: int) -> None:
+        with MONGO_OP_SECONDS.time(op="delete_one", collection="state_history", shard="main"):
+            await self.history.delete_one({"_id": f"{user_id}:{chat_id}"})
+
+    async def get_memory(self, user_id: int) -> Optional[Dict]:
+        with MONGO_OP_SECONDS.time(op="find_one", collection="state_memories", shard="main"):
+            doc = await self.memories.find_one({"_id": user_id}, {"_id": 0})
+        return doc
+
+    async def set_memory(self, user_id: int, memory: Dict) -> None:
+        with MONGO_OP_SECONDS.time(op="replace_one", collection="state_memories", shard="main"):
+            await self.memories.replace_one({"_id": user_id}, memory, upsert=True)
+
+    async def _spend(self, key: str, rate: float, burst: float, now: float) -> bool:
+        elapsed = {"$max": [0, {"$subtract": [now, {"$ifNull": ["$updated", now]}]}]}
+        refilled = {"$min": [burst, {"$add": [{"$ifNull": ["$tokens", burst]}, {"$multiply": [elapsed, rate]}]}]}
+        pipeline = [
+            {"$set": {"tokens": refilled, "updated": now}},
+            {"$set": {"allowed": {"$gte": ["$tokens", 1]}}},
+            {"$set": {
+                "tokens": {"$cond": ["$allowed", {"$subtract": ["$tokens", 1]}, "$tokens"]},
+                # A bucket that has refilled completely carries no state
+                "expires_at": datetime.utcnow() + timedelta(seconds=burst / rate),
+            }},
+        ]
+        with MONGO_OP_SECONDS.time(op="find_one_and_update", collection="state_buckets", shard="main"):
+            doc = await self.buckets.find_one_and_update(
+                {"_id": key}, pipeline, projection={"allowed": 1},
+                upsert=True, return_document=ReturnDocument.AFTER,
+            )
+        return doc["allowed"]
+
+    async def _refund(self, key: str, burst: float) -> None:
+        with MONGO_OP_SECONDS.time(op="update_one", collection="state_buckets", shard="main"):
+            await self.buckets.update_one(
+                {"_id": key}, [{"$set": {"tokens": {"$min": [burst, {"$add": ["$tokens", 1]}]}}}]
+            )
+
+    async def take_tokens(self, buckets: List[BucketSpec], now: Optional[float] = None) -> Optional[int]:
+        now = time.time() if now is None else now
+        spent = []
+        try:
+            for index, (key, rate, burst) in enumerate(buckets):
+                if not await self._spend(key, rate, burst, now):
+                    # Hand back what was already taken, so one empty bucket
+                    # doesn't drain the others
+                    for spent_key, spent_burst in spent:
+                        await self._refund(spent_key, spent_burst)
+                    return index
+                spent.append((key, burst))
+        except Exception as e:
+            # Fail open: a database hiccup shouldn't silence the bot
+            self.errors += 1
+            logger.warning("Rate limit check failed: %s", e)
+        return None
+
+    async def swap_response_type(self, chat_id: int, msg_type: str) -> Optional[str]:
+        with MONGO_OP_SECONDS.time(op="find_one_and_update", collection="state_response_types", shard="main"):
+            doc = await self.response_types.find_one_and_update(
+                {"_id": chat_id}, {"$set": {"msg_type": msg_type}},
+                upsert=True, return_document=ReturnDocument.BEFORE,
+            )
+        return doc["msg_type"] if doc else None
+
+    def stats(self) -> Dict:
+        return {"backend": self.name, "errors": self.errors}
+
+
+def build_state(name: str) -> StateBackend:
+    if name == "mongo":
+        # Same client and database as src.database
+        return MongoState(mongo_clients.get(config.MONGO_URL, name="main")["Era"])
+    if name != "memory":
+        logger.warning("Unknown STATE_BACKEND %r, keeping state in memory", name)
+    return MemoryState(evict_interval=config.RATE_LIMIT_EVICT_INTERVAL)
+
+
+state = build_state(config.STATE_BACKEND)
@@ -1,7 +1,15 @@
 import asyncio
+import logging
 from datetime import datetime, timedelta
 from typing import List, Dict, Optional, Tuple
-from motor.motor_asyncio import AsyncIOMotorClient
+
+import config
+from .metrics import MONGO_OP_SECONDS, registry
+from .mongo import mongo_clients
+from .state import state
+from .write_buffer import ShardWriteBuffer
+
+logger = logging.getLogger(__name__)
 
 
 class TempUsersManager:
@@ -37,8 +45,7 @@ class TempUsersManager:
         
         self.bulk_connections = {}
         self.temp_user_collections = {}
-        
-        self.user_memories = {}
+        self.write_buffers = {}
         
         self.dangerous_keywords = [
             'meet', 'meeting', 'milna', 'aaunga', 'aa rahi hoon',
@@ -49,15 +56,15 @@ class TempUsersManager:
     
     async def initialize_all_public_urls(self):
         try:
-            print(f"Initializing {len(self.public_mongo_urls)} public MongoDB URLs...")
+            logger.info("Initializing %d public MongoDB URLs...", len(self.public_mongo_urls))
             await self.add_bulk_mongo_urls(self.public_mongo_urls)
-            print(f"All {len(self.public_mongo_urls)} public MongoDB URLs initialized successfully!")
+            logger.info("All %d public MongoDB URLs initialized successfully!", len(self.public_mongo_urls))
             
             stats = await self.get_bulk_stats()
-            print(f"Bulk Stats: {stats}")
+            logger.info("Bulk Stats: %s", stats)
             
         except Exception as e:
-            print(f"Error initializing public URLs: {e}")
+            logger.error("Error initializing public URLs: %s", e)
     
     async def add_bulk_mongo_urls(self, mongo_urls: List[str]):
         try:
@@ -68,51 +75,63 @@ class TempUsersManager:
                 try:
                     connection_name = f"temp_db_{i+1}"
                     
-                    temp_client = AsyncIOMotorClient(mongo_url)
+                    temp_client = mongo_clients.get(mongo_url, name=connection_name, maxPoolSize=config.TEMP_MONGO_MAX_POOL_SIZE)
                     temp_db = temp_client["temp_chat_data"]
                     temp_collection = temp_db["temp_users"]
                     
                     self.bulk_connections[connection_name] = temp_client
                     self.temp_user_collections[connection_name] = temp_collection
+                    self.write_buffers[connection_name] = ShardWriteBuffer(
+                        connection_name,
+                        temp_collection,
+                        batch_size=config.TEMP_WRITE_BATCH_SIZE,
+                        flush_interval=config.TEMP_WRITE_FLUSH_INTERVAL,
+                        max_pending=config.TEMP_WRITE_MAX_PENDING,
+                    )
                     
-                    print(f"Added temp Mongo connection: {connection_name}")
+                    logger.debug("Added temp Mongo connection: %s", connection_name)
                     successful_connections += 1
                     
                 except Exception as e:
                     failed_connections.append(f"{connection_name}: {str(e)}")
-                    print(f"Failed to connect to {connection_name}: {e}")
+                    logger.warning("Failed to connect to %s: %s", connection_name, e)
             
-            print(f"Total successful connections: {successful_connections}/{len(mongo_urls)}")
+            logger.info("Total successful connections: %d/%d", successful_connections, len(mongo_urls))
             
             if failed_connections:
-                print(f"Failed connections: {len(failed_connections)}")
+                logger.warning("Failed connections: %d", len(failed_connections))
                 for failed in failed_connections[:5]:
-                    print(f"   - {failed}")
+                    logger.warning("   - %s", failed)
             
         except Exception as e:
-            print(f"Error adding bulk Mongo URLs: {e}")
+            logger.error("Error adding bulk Mongo URLs: %s", e)
     
-    async def get_temp_collection(self, user_id: int):
+    def _get_shard_name(self, user_id: int) -> Optional[str]:
         if len(self.temp_user_collections) == 0:
-            print("No temp collections available! Initialize with initialize_all_public_urls()")
+            logger.warning("No temp collections available! Initialize with initialize_all_public_urls()")
             return None
             
         collection_index = user_id % len(self.temp_user_collections)
         collection_names = list(self.temp_user_collections.keys())
-        collection_name = collection_names[collection_index]
+        return collection_names[collection_index]
+    
+    async def get_temp_collection(self, user_id: int):
+        collection_name = self._get_shard_name(user_id)
+        if collection_name is None:
+            return None
         
         return self.temp_user_collections[collection_name]
     
     async def store_temp_user_chat(self, user_id: int, username: str, chat_data: Dict):
         try:
             if self._is_dangerous_message(chat_data.get('message', '')):
-                print(f"BLOCKED: Dangerous message from user {user_id}: {str(chat_data)[:50]}...")
+                logger.info("BLOCKED: Dangerous message from user %s: %.50s...", user_id, chat_data)
                 return False
             
-            temp_collection = await self.get_temp_collection(user_id)
+            collection_name = self._get_shard_name(user_id)
             
-            if not temp_collection:
-                print(f"No temp collection available for user {user_id}")
+            if collection_name is None:
+                logger.warning("No temp collection available for user %s", user_id)
                 return False
             
             temp_user_data = {
@@ -124,34 +143,39 @@ class TempUsersManager:
                 "is_temp": True
             }
             
-            await temp_collection.update_one(
-                {"user_id": user_id},
-                {"$set": temp_user_data},
-                upsert=True
-            )
+            # Upserts are buffered per shard and written with bulk_write;
+            # repeated updates for the same user collapse into one.
+            await self.write_buffers[collection_name].put(user_id, temp_user_data)
             
-            print(f"Stored temp chat data for user {user_id} ({username})")
+            logger.debug("Queued temp chat data for user %s (%s)", user_id, username)
             return True
             
         except Exception as e:
-            print(f"Error storing temp user chat: {e}")
+            logger.error("Error storing temp user chat: %s", e)
             return False
     
     async def get_temp_user_chat(self, user_id: int) -> Optional[Dict]:
         try:
             temp_collection = await self.get_temp_collection(user_id)
             
-            if not temp_collection:
+            if temp_collection is None:
                 return None
             
-            temp_user = await temp_collection.find_one({"user_id": user_id})
+            # Serve writes that are still sitting in the buffer
+            collection_name = self._get_shard_name(user_id)
+            pending = self.write_buffers[collection_name].pending.get(user_id)
+            if pending is not None:
+                return pending.get("chat_data")
+            
+            with MONGO_OP_SECONDS.time(op="find_one", collection="temp_users", shard=collection_name):
+                temp_user = await temp_collection.find_one({"user_id": user_id})
             if temp_user and temp_user.get("is_temp"):
                 return temp_user.get("chat_data")
             
             return None
             
         except Exception as e:
-            print(f"Error getting temp user chat: {e}")
+            logger.error("Error getting temp user chat: %s", e)
             return None
     
     async def cleanup_temp_users(self, days_old: int = 2):
@@ -159,19 +183,22 @@ class TempUsersManager:
             cutoff_date = datetime.utcnow() - timedelta(days=days_old)
             total_cleaned = 0
             
+            await self.flush_writes()
+            
             for collection_name, temp_collection in self.temp_user_collections.items():
-                result = await temp_collection.delete_many({
-                    "is_temp": True,
-                    "last_updated": {"$lt": cutoff_date}
-                })
+                with MONGO_OP_SECONDS.time(op="delete_many", collection="temp_users", shard=collection_name):
+                    result = await temp_collection.delete_many({
+                        "is_temp": True,
+                        "last_updated": {"$lt": cutoff_date}
+                    })
                 
-                print(f"Cleaned up {result.deleted_count} temp users from {collection_name}")
+                logger.info("Cleaned up %d temp users from %s", result.deleted_count, collection_name)
                 total_cleaned += result.deleted_count
             
-            print(f"Total cleaned temp users: {total_cleaned}")
+            logger.info("Total cleaned temp users: %d", total_cleaned)
         
         except Exception as e:
-            print(f"Error cleaning up temp users: {e}")
+            logger.error("Error cleaning up temp users: %s", e)
     
     def _is_dangerous_message(self, message: str) -> bool:
         if not message:
@@ -201,50 +228,63 @@ class TempUsersManager:
                 "total_public_urls": len(self.public_mongo_urls),
                 "bulk_connections": len(self.bulk_connections),
                 "temp_collections": len(self.temp_user_collections),
-                "connection_names": list(self.bulk_connections.keys())
+                "connection_names": list(self.bulk_connections.keys()),
+                "write_buffers": {name: buffer.stats() for name, buffer in self.write_buffers.items()}
             }
             
             for collection_name, collection in self.temp_user_collections.items():
-                count = await collection.count_documents({"is_temp": True})
+                with MONGO_OP_SECONDS.time(op="count_documents", collection="temp_users", shard=collection_name):
+                    count = await collection.count_documents({"is_temp": True})
                 stats[f"temp_users_{collection_name}"] = count
             
             return stats
             
         except Exception as e:
-            print(f"Error getting bulk stats: {e}")
+            logger.error("Error getting bulk stats: %s", e)
             return {}
     
+    async def flush_writes(self) -> int:
+        results = await asyncio.gather(
+            *(buffer.flush() for buffer in self.write_buffers.values()),
+            return_exceptions=True
+        )
+        return sum(result for result in results if isinstance(result, int))
+    
     async def close_all_connections(self):
         try:
-            for connection_name, client in self.bulk_connections.items():
-                client.close()
-                print(f"Closed connection: {connection_name}")
+            flushed = await self.flush_writes()
+            if flushed:
+                logger.info("Flushed %d buffered temp writes", flushed)
+            
+            for client in self.bulk_connections.values():
+                mongo_clients.close(client)
             
             self.bulk_connections.clear()
             self.temp_user_collections.clear()
+            self.write_buffers.clear()
             
         except Exception as e:
-            print(f"Error closing connections: {e}")
+            logger.error("Error closing connections: %s", e)
     
     async def confirm_user_name(self, user_id: int, confirmed_name: str) -> bool:
         try:
-            self.user_memories[user_id] = {
+            await state.set_memory(user_id, {
                 'confirmed_name': confirmed_name,
                 'name_confirmed_at': datetime.utcnow(),
                 'name_confirmations': 1
-            }
-            print(f"Confirmed name for user {user_id}: {confirmed_name}")
+            })
+            logger.debug("Confirmed name for user %s: %s", user_id, confirmed_name)
             return True
         except Exception as e:
-            print(f"Error confirming user name: {e}")
+            logger.error("Error confirming user name: %s", e)
             return False
     
     async def get_user_memory(self, user_id: int) -> Optional[Dict]:
-        return self.user_memories.get(user_id)
+        return await state.get_memory(user_id)
     
     async def check_name_confusion(self, user_id: int, mentioned_name: str) -> bool:
         try:
-            user_memory = self.user_memories.get(user_id)
+            user_memory = await self.get_user_memory(user_id)
             if not user_memory:
                 return False
             
@@ -253,17 +293,17 @@ class TempUsersManager:
             
             if confirmed_name and mentioned_name_lower != confirmed_name:
                 if abs(len(confirmed_name) - len(mentioned_name_lower)) > 2:
-                    print(f"Name confusion detected for user {user_id}: {mentioned_name} vs {confirmed_name}")
+                    logger.debug("Name confusion detected for user %s: %s vs %s", user_id, mentioned_name, confirmed_name)
                     return True
             
             return False
         except Exception as e:
-            print(f"Error checking name confusion: {e}")
+            logger.error("Error checking name confusion: %s", e)
             return False
     
     async def handle_name_correction(self, user_id: int, correction_message: str) -> str:
         try:
-            user_memory = self.user_memories.get(user_id)
+            user_memory = await self.get_user_memory(user_id)
             confirmed_name = user_memory.get('confirmed_name', '') if user_memory else ''
             
             responses = [
@@ -277,7 +317,7 @@ class TempUsersManager:
             return random.choice(responses)
             
         except Exception as e:
-            print(f"Error handling name correction: {e}")
+            logger.error("Error handling name correction: %s", e)
             return "sorry, got confused. tell me again"
     
     async def is_rude_message(self, message: str) -> bool:
@@ -295,7 +335,7 @@ class TempUsersManager:
     
     async def get_rude_response(self, user_id: int) -> str:
         try:
-            user_memory = self.user_memories.get(user_id)
+            user_memory = await self.get_user_memory(user_id)
             name = user_memory.get('confirmed_name', '') if user_memory else ''
             
             responses = [
@@ -315,8 +355,13 @@ class TempUsersManager:
             return random.choice(responses)
             
         except Exception as e:
-            print(f"Error getting rude response: {e}")
+            logger.error("Error getting rude response: %s", e)
             return "calm down, let's talk normally"
 
 
-temp_users_manager = TempUsersManager()
\ No newline at end of file
+temp_users_manager = TempUsersManager()
+
+registry.gauge(
+    "era_temp_writes_pending", "Temp-store upserts waiting in each shard's write buffer",
+    lambda: [({"shard": name}, len(buffer.pending)) for name, buffer in temp_users_manager.write_buffers.items()]
+)
@@ -0,0 +1,39 @@
+import asyncio
+import logging
+from typing import Coroutine, Optional, Set
+
+from .metrics import registry
+
+logger = logging.getLogger(__name__)
+
+
+class BackgroundTasks:
+    """Keeps references to fire-and-forget tasks so they finish and get logged."""
+
+    def __init__(self):
+        self.tasks: Set[asyncio.Task] = set()
+        self.failed = 0
+
+    def spawn(self, coro: Coroutine, name: Optional[str] = None) -> asyncio.Task:
+        task = asyncio.create_task(coro, name=name)
+        self.tasks.add(task)
+        task.add_done_callback(self._done)
+        return task
+
+    def _done(self, task: asyncio.Task) -> None:
+        self.tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            self.failed += 1
+            logger.error("Background task %s failed: %s", task.get_name(), task.exception())
+
+    async def drain(self, timeout: float = 10) -> None:
+        if not self.tasks:
+            return
+        _, pending = await asyncio.wait(set(self.tasks), timeout=timeout)
+        for task in pending:
+            task.cancel()
+
+
+background = BackgroundTasks()
+
+registry.gauge("era_background_tasks", "Fire-and-forget tasks still running", lambda: len(background.tasks))
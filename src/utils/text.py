@@ -0,0 +1,54 @@
+import re
+from typing import List
+
+# Telegram allows 4096 characters per message; the rest is room for the marker and closing tags
+MESSAGE_LIMIT = 4000
+
+_TAG = re.compile(r"<(/?)([a-zA-Z][\w-]*)[^>]*>")
+# A tag or entity cut off at the end of a string
+_PARTIAL = re.compile(r"(<[^>]*|&#?\w*)$")
+
+
+def _track_tags(text: str, stack: List[str]) -> None:
+    for closing, name in _TAG.findall(text):
+        name = name.lower()
+        if not closing:
+            stack.append(name)
+        elif name in stack:
+            del stack[len(stack) - 1 - stack[::-1].index(name)]
+
+
+def _closers(stack: List[str]) -> str:
+    return "".join(f"</{name}>" for name in reversed(stack))
+
+
+def fit_html(text: str, limit: int = MESSAGE_LIMIT, marker: str = "…") -> str:
+    """Shorten an HTML-formatted message to at most `limit` characters.
+
+    Cuts at a line boundary so no tag or entity is split, ends with `marker`
+    and closes whatever tags were still open there. A single line longer than
+    the limit is cut mid-line, before any partial tag or entity.
+    """
+    if len(text) <= limit:
+        return text
+
+    kept: List[str] = []
+    stack: List[str] = []
+    size = 0
+    for line in text.split("\n"):
+        after = list(stack)
+        _track_tags(line, after)
+        if size + len(line) + 1 + len(marker) + len(_closers(after)) > limit:
+            break
+        kept.append(line)
+        size += len(line) + 1
+        stack = after
+
+    if not kept:
+        # Closing tags can't be longer than the markup that opened them
+        head = text[:(limit - len(marker)) // 2]
+        head = _PARTIAL.sub("", head)
+        _track_tags(head, stack)
+        return head + marker + _closers(stack)
+
+    return "\n".join(kept) + "\n" + marker + _closers(stack)
@@ -0,0 +1,64 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Optional
+
+from .metrics import STAGE_SECONDS
+
+
+class StageTimer:
+    """Per-message stage durations, in seconds."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stages: Dict[str, float] = {}
+
+    def add(self, name: str, seconds: float) -> None:
+        self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+    def summary(self) -> str:
+        return " ".join(f"{name}={seconds * 1000:.0f}ms" for name, seconds in self.stages.items())
+
+
+_current_timer: ContextVar[Optional[StageTimer]] = ContextVar("stage_timer", default=None)
+
+
+def record(name: str, seconds: float) -> None:
+    timer = _current_timer.get()
+    if timer is not None:
+        timer.add(name, seconds)
+    STAGE_SECONDS.observe(seconds, stage=name)
+
+
+@contextmanager
+def stage(name: str):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(name, time.perf_counter() - started)
+
+
+@contextmanager
+def track():
+    """Collect every stage recorded in this context into one StageTimer."""
+    timer = _current_timer.get()
+    if timer is not None:
+        # Nested: stages join the outer timer, which records the total
+        yield timer
+        return
+
+    timer = StageTimer()
+    token = _current_timer.set(timer)
+    try:
+        yield timer
+    finally:
+        record("total", timer.elapsed())
+        _current_timer.reset(token)
+
+
+def current_timer() -> Optional[StageTimer]:
+    return _current_timer.get()
@@ -0,0 +1,156 @@
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from html import escape
+from typing import Deque, Dict, Optional, Tuple
+
+import config
+from .metrics import registry
+from .text import MESSAGE_LIMIT, fit_html
+
+logger = logging.getLogger(__name__)
+
+LOOP_LAG_SECONDS = registry.histogram(
+    "era_loop_lag_seconds", "How late the watchdog's timer fired, i.e. event loop lag",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+)
+LOOP_STALLS = registry.counter("era_loop_stalls_total", "Times the event loop lagged past the watchdog threshold")
+
+
+class Stall:
+    __slots__ = ("at", "lag", "stack")
+
+    def __init__(self, at: float, lag: float, stack: Optional[str]):
+        self.at = at
+        self.lag = lag
+        self.stack = stack
+
+
+class LoopWatchdog:
+    """Measures event loop lag and catches whatever is blocking it.
+
+    A task on the loop sleeps `interval` and records how late it woke up. A
+    heartbeat thread notices when that task is overdue by `threshold` and
+    grabs the loop thread's stack while it is still stuck, which is the code
+    doing the blocking. Like asyncio's debug mode for slow callbacks, but it
+    costs one timer and one idle thread.
+    """
+
+    def __init__(self, interval: float, threshold: float, alert_interval: float, stack_depth: int = 15):
+        self.interval = interval
+        self.threshold = threshold
+        self.alert_interval = alert_interval
+        self.stack_depth = stack_depth
+
+        self.lag = 0.0
+        self.max_lag = 0.0
+        self.stalls: Deque[Stall] = deque(maxlen=20)
+        self.suppressed = 0
+
+        self.client = None
+        self.chat_id: Optional[int] = None
+        self._beat = 0.0
+        self._captured: Tuple[float, Optional[str]] = (0.0, None)
+        self._last_alert = float("-inf")
+        self._loop_thread: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    def start(self, client=None, chat_id: Optional[int] = None) -> None:
+        """Start watching the running loop; alerts go to `chat_id` through the outbox."""
+        if self._task is not None:
+            return
+        self.client, self.chat_id = client, chat_id
+        self._loop_thread = threading.get_ident()
+        self._beat = time.monotonic()
+        self._task = asyncio.create_task(self._tick(), name="loop_watchdog")
+
+        if self.threshold > 0:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._monitor, name="loop-watchdog", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+
+    async def _tick(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            beat = self._beat = time.monotonic()
+            started = loop.time()
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, loop.time() - started - self.interval)
+
+            self.lag = lag
+            self.max_lag = max(self.max_lag, lag)
+            LOOP_LAG_SECONDS.observe(lag)
+            if self.threshold > 0 and lag >= self.threshold:
+                captured_beat, stack = self._captured
+                self._stalled(lag, stack if captured_beat == beat else None)
+
+    def _monitor(self) -> None:
+        # Runs in its own thread: the loop can't look at itself while it's blocked
+        while not self._stop.wait(self.threshold / 2):
+            beat = self._beat
+            if time.monotonic() - beat - self.interval < self.threshold or self._captured[0] == beat:
+                continue
+            frame = sys._current_frames().get(self._loop_thread)
+            if frame is None:
+                continue
+            stack = "".join(traceback.format_list(traceback.extract_stack(frame, limit=self.stack_depth)))
+            del frame
+            self._captured = (beat, stack)
+
+    def _stalled(self, lag: float, stack: Optional[str]) -> None:
+        LOOP_STALLS.inc()
+        self.stalls.append(Stall(time.time(), lag, stack))
+        logger.warning("Event loop blocked for %.2fs\n%s", lag, stack or "(stack not captured)")
+
+        now = time.monotonic()
+        if self.client is None or self.chat_id is None:
+            return
+        if now - self._last_alert < self.alert_interval:
+            self.suppressed += 1
+            return
+
+        from .outbox import outbox
+
+        text = f"<b>⚠️ Event loop blocked for {lag:.2f}s</b>"
+        if self.suppressed:
+            text += f"\n{self.suppressed} more stalls since the last alert"
+        frames = escape(stack or "Stack not captured (the loop was stuck in C code holding the GIL)").split("\n")
+        # The innermost frames are the blocking code, so drop from the outside in
+        while len(frames) > 1 and len(text) + len("\n".join(frames)) + 12 > MESSAGE_LIMIT:
+            frames.pop(0)
+        text += "\n<pre>" + "\n".join(frames) + "</pre>"
+        outbox.send(self.client, self.chat_id, fit_html(text))
+        self._last_alert = now
+        self.suppressed = 0
+
+    def stats(self) -> Dict:
+        return {
+            "lag": self.lag,
+            "max_lag": self.max_lag,
+            "stalls": LOOP_STALLS.values.get((), 0),
+            "suppressed_alerts": self.suppressed,
+        }
+
+
+loop_watchdog = LoopWatchdog(
+    interval=config.LOOP_LAG_INTERVAL,
+    threshold=config.LOOP_LAG_THRESHOLD,
+    alert_interval=config.LOOP_LAG_ALERT_INTERVAL,
+)
+
+registry.gauge("era_loop_lag_current_seconds", "Event loop lag measured by the latest watchdog tick", lambda: loop_watchdog.lag)
@@ -0,0 +1,124 @@
+import asyncio
+import logging
+from typing import Dict, Optional
+
+from pymongo import UpdateOne
+
+from .metrics import MONGO_OP_SECONDS, registry
+
+logger = logging.getLogger(__name__)
+
+TEMP_WRITES_DROPPED = registry.counter(
+    "era_temp_writes_dropped_total", "Buffered temp-user upserts lost because the shard stayed unwritable, by shard"
+)
+
+
+class ShardWriteBuffer:
+    """Groups temp-user upserts for one shard into a single bulk_write.
+
+    A batch that fails to write goes back into the buffer and is retried on
+    the next timer flush. Only when the buffer is full and the shard still
+    fails are the oldest upserts dropped, and counted.
+    """
+
+    def __init__(self, name: str, collection, batch_size: int = 100, flush_interval: float = 2.0, max_pending: int = 1000):
+        self.name = name
+        self.collection = collection
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self.max_pending = max(self.batch_size, max_pending)
+
+        self.pending: Dict[int, Dict] = {}
+        self.collapsed = 0
+        self.flushed = 0
+        self.failed = 0
+        self.dropped = 0
+        self.failing = False
+
+        self._lock = asyncio.Lock()
+        self._timer: Optional[asyncio.Task] = None
+
+    async def put(self, user_id: int, fields: Dict) -> None:
+        # Backpressure: a full buffer makes the caller wait for a flush
+        # instead of growing without bound.
+        while len(self.pending) >= self.max_pending and user_id not in self.pending:
+            if not self.failing and await self.flush():
+                continue
+            # The shard is down: lose the oldest write rather than block callers or grow
+            del self.pending[next(iter(self.pending))]
+            self._dropped(1)
+
+        if user_id in self.pending:
+            self.collapsed += 1
+        self.pending[user_id] = fields
+
+        # While the shard is failing only the retry timer tries it again
+        if len(self.pending) >= self.batch_size and not self.failing:
+            await self.flush()
+        elif self._timer is None:
+            self._timer = asyncio.create_task(self._flush_later())
+
+    async def _flush_later(self) -> None:
+        await asyncio.sleep(self.flush_interval)
+        await self.flush()
+
+    async def flush(self) -> int:
+        async with self._lock:
+            if self._timer is not None and self._timer is not asyncio.current_task():
+                self._timer.cancel()
+            self._timer = None
+
+            if not self.pending:
+                return 0
+
+            batch, self.pending = self.pending, {}
+            requests = [
+                UpdateOne({"user_id": user_id}, {"$set": fields}, upsert=True)
+                for user_id, fields in batch.items()
+            ]
+
+            try:
+                with MONGO_OP_SECONDS.time(op="bulk_write", collection="temp_users", shard=self.name):
+                    await self.collection.bulk_write(requests, ordered=False)
+            except Exception as e:
+                self.failed += len(requests)
+                logger.error("Error flushing %d temp writes to %s, will retry: %s", len(requests), self.name, e)
+                self.failing = True
+                self._restore(batch)
+                return 0
+
+            self.failing = False
+            self.flushed += len(requests)
+            return len(requests)
+
+    def _restore(self, batch: Dict[int, Dict]) -> None:
+        """Put a failed batch back under newer writes and schedule a retry."""
+        batch.update(self.pending)
+        excess = len(batch) - self.max_pending
+        if excess > 0:
+            for user_id in list(batch)[:excess]:
+                del batch[user_id]
+            self._dropped(excess)
+        self.pending = batch
+        if self._timer is None:
+            self._timer = asyncio.create_task(self._flush_later())
+
+    def _dropped(self, count: int) -> None:
+        self.dropped += count
+        TEMP_WRITES_DROPPED.inc(count, shard=self.name)
+
+    async def close(self) -> None:
+        await self.flush()
+        # Nothing will be there to retry a failed final flush
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+    def stats(self) -> Dict:
+        return {
+            "pending": len(self.pending),
+            "flushed": self.flushed,
+            "collapsed": self.collapsed,
+            "failed": self.failed,
+            "dropped": self.dropped,
+        }
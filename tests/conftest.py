@@ -0,0 +1,26 @@
+import asyncio
+
+# Sets harmless MONGO_URL / API_ID values before src builds its clients
+import bench  # noqa: F401
+import pytest
+
+
+@pytest.fixture(scope="session")
+def loop():
+    """One loop for the whole run: the bot's singletons bind to the first loop that uses them."""
+    loop = asyncio.new_event_loop()
+    yield loop
+    loop.close()
+
+
+@pytest.fixture
+def run(loop):
+    return loop.run_until_complete
+
+
+@pytest.fixture
+def stubbed_client(monkeypatch):
+    """A stub client, with the bot's Mongo, LLM and limit globals stubbed for this test only."""
+    from bench.stubs import install_stubs
+
+    return install_stubs(patch=monkeypatch.setattr)
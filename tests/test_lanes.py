@@ -0,0 +1,165 @@
+import asyncio
+
+from src.utils.lanes import ChatLanes
+
+
+def test_jobs_in_one_chat_run_in_submission_order(run):
+    async def scenario():
+        lanes = ChatLanes(workers=4)
+        done = []
+
+        async def job(name, delay):
+            await asyncio.sleep(delay)
+            done.append(name)
+
+        lanes.submit(-1, job("slow", 0.02))
+        lanes.submit(-1, job("fast", 0))
+        lanes.submit(-1, job("last", 0))
+        await lanes.wait(-1)
+        return lanes, done
+
+    lanes, done = run(scenario())
+    assert done == ["slow", "fast", "last"]
+    assert lanes.stats() == {"workers": 4, "busy": 0, "pending": 0, "chats": 0, "max_depth": 0, "dropped": 0}
+
+
+def test_chats_run_in_parallel_up_to_the_worker_limit(run):
+    async def scenario():
+        lanes = ChatLanes(workers=2)
+        running = peak = 0
+
+        async def job():
+            nonlocal running, peak
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(0.01)
+            running -= 1
+
+        for chat_id in range(6):
+            lanes.submit(chat_id, job())
+        await lanes.drain()
+        return peak
+
+    assert run(scenario()) == 2
+
+
+def test_released_slot_lets_other_chats_run(run):
+    async def scenario():
+        lanes = ChatLanes(workers=1)
+        llm_answered = asyncio.Event()
+        order = []
+
+        async def waits_on_llm():
+            async with lanes.released():
+                order.append("waiting")
+                await llm_answered.wait()
+            order.append("answered")
+
+        async def other_chat():
+            order.append("other")
+            llm_answered.set()
+
+        lanes.submit(-1, waits_on_llm())
+        lanes.submit(-2, other_chat())
+        await asyncio.wait_for(lanes.drain(), 1)
+        return lanes, order
+
+    lanes, order = run(scenario())
+    assert order == ["waiting", "other", "answered"]
+    assert lanes.busy == 0
+
+
+def test_released_outside_a_lane_is_a_no_op(run):
+    async def scenario():
+        lanes = ChatLanes(workers=1)
+        async with lanes.released():
+            pass
+        return lanes
+
+    assert run(scenario()).busy == 0
+
+
+def test_failed_job_does_not_block_the_chat(run):
+    async def scenario():
+        lanes = ChatLanes(workers=1)
+        done = []
+
+        async def broken():
+            raise ValueError("bad update")
+
+        async def fine():
+            done.append("fine")
+
+        lanes.submit(-1, broken())
+        lanes.submit(-1, fine())
+        await lanes.wait(-1)
+        return lanes, done
+
+    lanes, done = run(scenario())
+    assert done == ["fine"]
+    assert lanes.pending == 0 and lanes.stats()["chats"] == 0
+
+
+def test_drain_cancels_jobs_that_outlive_the_timeout(run):
+    async def scenario():
+        lanes = ChatLanes(workers=2)
+        lanes.submit(-1, asyncio.sleep(10))
+        lanes.submit(-1, asyncio.sleep(0))
+        await lanes.drain(timeout=0.01)
+        await asyncio.sleep(0)
+        return lanes
+
+    lanes = run(scenario())
+    assert lanes.pending == 0
+    assert lanes.busy == 0
+
+
+def test_full_lane_drops_new_updates(run):
+    async def scenario():
+        lanes = ChatLanes(workers=1, max_depth=2)
+        done = []
+
+        async def job(n):
+            await asyncio.sleep(0)
+            done.append(n)
+
+        tasks = [lanes.submit(-1, job(n)) for n in range(4)]
+        other = lanes.submit(-2, job("other chat"))
+        await lanes.drain()
+        return lanes, tasks, other, done
+
+    lanes, tasks, other, done = run(scenario())
+    assert tasks[2:] == [None, None]
+    assert other is not None
+    assert sorted(map(str, done)) == ["0", "1", "other chat"]
+    assert lanes.dropped == 2
+
+
+def test_cancel_while_taking_the_slot_back_does_not_over_release(run):
+    async def scenario():
+        lanes = ChatLanes(workers=1)
+        llm_answered = asyncio.Event()
+        other_done = asyncio.Event()
+
+        async def waits_on_llm():
+            async with lanes.released():
+                await llm_answered.wait()
+
+        async def holds_slot():
+            llm_answered.set()
+            await other_done.wait()
+
+        waiting = lanes.submit(-1, waits_on_llm())
+        lanes.submit(-2, holds_slot())
+        for _ in range(5):
+            await asyncio.sleep(0)
+        # -1 is now blocked re-acquiring the slot -2 holds
+        waiting.cancel()
+        await asyncio.sleep(0)
+        other_done.set()
+        await lanes.drain()
+        return lanes
+
+    lanes = run(scenario())
+    assert lanes._slots._value == 1
+    assert lanes.busy == 0 and lanes.pending == 0
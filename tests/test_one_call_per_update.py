@@ -0,0 +1,159 @@
+import asyncio
+import random
+
+import pytest
+
+from bench.fixtures import build_message
+from bench.stubs import install_stubs
+from src.database import chats
+from src.modules.chat_handler import handle_chat
+from src.utils.engagement import NeverPolicy, engagement
+from src.utils.era import chatbot_api
+from src.utils.lanes import chat_lanes
+from src.utils.outbox import outbox
+from src.utils.rate_limit import rate_limiter
+from src.utils.router import router
+from src.utils.scheduler import llm_scheduler
+
+# Whether each kind of update should get an answer at all
+EXPECTED_CALLS = {
+    "private": 1,
+    "group": 1,
+    "group_mention": 1,
+    "group_reply_bot": 1,
+    "group_reply_other": 0,
+    "command": 0,
+}
+
+
+@pytest.fixture
+def client(stubbed_client):
+    return stubbed_client
+
+
+@pytest.fixture
+def llm_calls(monkeypatch):
+    calls = []
+
+    async def ask_question(user_id, chat_id, message, **kwargs):
+        calls.append((chat_id, message))
+        return "theek hai 😊"
+
+    monkeypatch.setattr(chatbot_api, "ask_question", ask_question)
+    return calls
+
+
+_ids = iter(range(1_000, 1_000_000, 2))
+
+
+def message(kind, client, seed=7):
+    return build_message(next(_ids), kind, random.Random(seed), client)
+
+
+def update_kind(update):
+    if update.chat.id > 0:
+        return "private"
+    if update.entities and update.entities[0].type.name == "BOT_COMMAND":
+        return "command"
+    if update.entities:
+        return "group_mention"
+    if update.reply_to_message is not None:
+        return "group_reply_bot" if update.reply_to_message.from_user.is_bot else "group_reply_other"
+    return "group"
+
+
+async def through_handler(client, update):
+    await handle_chat(client, update)
+    await chat_lanes.wait(update.chat.id)
+
+
+@pytest.mark.parametrize("kind", EXPECTED_CALLS)
+def test_dispatch_calls_llm_at_most_once(run, client, llm_calls, kind):
+    run(router.dispatch(client, message(kind, client)))
+    assert len(llm_calls) == EXPECTED_CALLS[kind]
+
+
+@pytest.mark.parametrize("kind", EXPECTED_CALLS)
+def test_handle_chat_calls_llm_at_most_once(run, client, llm_calls, kind):
+    run(through_handler(client, message(kind, client)))
+    assert len(llm_calls) == EXPECTED_CALLS[kind]
+
+
+@pytest.mark.parametrize("kind", ["private", "group", "group_mention", "group_reply_bot"])
+def test_duplicate_update_is_answered_once(run, client, llm_calls, kind):
+    update = message(kind, client)
+    # The same update through both entry points, then redelivered as a new object
+    redelivered = message(kind, client)
+    redelivered.id = update.id
+
+    run(router.dispatch(client, update))
+    run(through_handler(client, update))
+    run(router.dispatch(client, redelivered))
+    run(through_handler(client, redelivered))
+
+    assert len(llm_calls) == 1
+    assert router.duplicates >= 3
+
+
+def test_engagement_policy_skips_unsolicited_group_messages(run, client, llm_calls, monkeypatch):
+    monkeypatch.setattr(engagement, "policy", NeverPolicy())
+
+    run(router.dispatch(client, message("group", client)))
+    run(router.dispatch(client, message("group_mention", client)))
+
+    assert len(llm_calls) == 1
+
+
+def test_mixed_stream_makes_one_call_per_answerable_update(run, client, llm_calls):
+    rng = random.Random(11)
+    updates = [build_message(next(_ids), rng.choice(list(EXPECTED_CALLS)), rng, client) for _ in range(200)]
+
+    async def deliver_all():
+        for update in updates:
+            await handle_chat(client, update)
+        for update in updates:
+            await chat_lanes.wait(update.chat.id)
+
+    run(deliver_all())
+
+    answered = sum(EXPECTED_CALLS[update_kind(update)] for update in updates)
+    assert len(llm_calls) == answered
+
+
+
+def test_typing_shows_only_once_the_scheduler_grants_a_slot(run, client, llm_calls, monkeypatch):
+    answer = chatbot_api.ask_question
+
+    async def slow_answer(*args, **kwargs):
+        # Long enough for the typing task to send its first action
+        await asyncio.sleep(0.01)
+        return await answer(*args, **kwargs)
+
+    monkeypatch.setattr(chatbot_api, "ask_question", slow_answer)
+    run(through_handler(client, message("private", client)))
+    assert client.chat_actions == 1
+
+    async def shed(priority, chat_id):
+        # Queued for a while, then shed by a more important message
+        await asyncio.sleep(0.01)
+        return False
+
+    monkeypatch.setattr(llm_scheduler, "acquire", shed)
+    run(through_handler(client, message("private", client)))
+    assert client.chat_actions == 1
+    assert len(llm_calls) == 1
+
+
+def test_stubs_are_undone_after_the_test():
+    targets = [
+        (chats, "usersdb"), (chats, "chatsdb"), (chatbot_api, "session"),
+        (rate_limiter, "user_limit"), (rate_limiter, "chat_limit"), (rate_limiter, "global_limit"),
+        (engagement, "policy"), (outbox, "global_bucket"), (outbox, "group_rate"), (outbox, "private_rate"),
+    ]
+    originals = [getattr(obj, name) for obj, name in targets]
+
+    with pytest.MonkeyPatch.context() as mp:
+        install_stubs(patch=mp.setattr)
+        assert chats.usersdb is not originals[0]
+
+    assert [getattr(obj, name) for obj, name in targets] == originals
@@ -0,0 +1,135 @@
+import asyncio
+import time
+from types import SimpleNamespace
+
+from pyrogram.errors import FloodWait
+
+from src.utils.outbox import Outbox
+
+
+class Client:
+    """Records (chat_id, text, kwargs, monotonic time) per send; `fail` maps chat_id to errors to raise first."""
+
+    def __init__(self, fail=None):
+        self.sent = []
+        self.fail = fail or {}
+
+    async def send_message(self, chat_id, text, **kwargs):
+        errors = self.fail.get(chat_id)
+        if errors:
+            raise errors.pop(0)
+        self.sent.append((chat_id, text, kwargs, time.monotonic()))
+        return SimpleNamespace(chat_id=chat_id, text=text)
+
+
+def outbox(global_rate=0, group_rate=0, private_rate=0, chat_burst=1, max_age=30, max_per_chat=20):
+    return Outbox(global_rate, group_rate, private_rate, chat_burst, max_age, max_per_chat)
+
+
+def texts(client, chat_id=None):
+    return [text for chat, text, _, _ in client.sent if chat_id is None or chat == chat_id]
+
+
+def test_replies_in_a_chat_are_paced_and_in_order(run):
+    async def scenario():
+        box, client = outbox(private_rate=20), Client()
+        started = time.monotonic()
+        futures = [box.send(client, 1, f"reply {n}") for n in range(3)]
+        results = await asyncio.gather(*futures)
+        return client, results, time.monotonic() - started
+
+    client, results, elapsed = run(scenario())
+    assert texts(client) == ["reply 0", "reply 1", "reply 2"]
+    assert [result.text for result in results] == texts(client)
+    # Burst of one, then 20/s: two waits of ~50ms
+    assert elapsed >= 0.09
+
+
+def test_global_rate_is_shared_by_all_chats(run):
+    async def scenario():
+        box, client = outbox(global_rate=20), Client()
+        started = time.monotonic()
+        # A second's worth goes out at once, the next two wait ~50ms each
+        await asyncio.gather(*(box.send(client, chat_id, "hi") for chat_id in range(1, 23)))
+        return time.monotonic() - started
+
+    assert run(scenario()) >= 0.09
+
+
+def test_flood_wait_pauses_only_its_chat_and_retries(run):
+    async def scenario():
+        box = outbox()
+        client = Client(fail={-1: [FloodWait(value=0.1)]})
+        started = time.monotonic()
+        flooded = box.send(client, -1, "group reply")
+        other = box.send(client, 2, "private reply")
+        await asyncio.gather(flooded, other)
+        return box, client, started
+
+    box, client, started = run(scenario())
+    sent_at = {chat: at - started for chat, _, _, at in client.sent}
+    assert sent_at[2] < 0.05
+    assert sent_at[-1] >= 0.1
+    assert box.flood_waits == 1 and box.sent == 2
+
+
+def test_stale_replies_are_dropped(run):
+    async def scenario():
+        box = outbox(max_age=0.05)
+        client = Client(fail={-1: [FloodWait(value=0.1)]})
+        first = box.send(client, -1, "too late")
+        second = box.send(client, -1, "also too late")
+        return box, client, await asyncio.gather(first, second)
+
+    box, client, results = run(scenario())
+    assert results == [None, None]
+    assert client.sent == []
+    assert box.dropped["stale"] == 2
+
+
+def test_overflow_drops_the_oldest_reply(run):
+    async def scenario():
+        box, client = outbox(private_rate=100, max_per_chat=2), Client()
+        futures = [box.send(client, 1, f"reply {n}") for n in range(4)]
+        return box, client, await asyncio.gather(*futures)
+
+    box, client, results = run(scenario())
+    assert texts(client) == ["reply 2", "reply 3"]
+    assert results[:2] == [None, None]
+    assert box.dropped["overflow"] == 2
+
+
+def test_failed_send_resolves_to_none_and_the_lane_carries_on(run):
+    async def scenario():
+        box = outbox()
+        client = Client(fail={1: [RuntimeError("chat not found")]})
+        results = await asyncio.gather(box.send(client, 1, "lost"), box.send(client, 1, "kept"))
+        return box, client, results
+
+    box, client, results = run(scenario())
+    assert results[0] is None and results[1].text == "kept"
+    assert box.dropped["failed"] == 1
+
+
+def test_reply_quotes_the_message_in_its_topic(run):
+    async def scenario():
+        box, client = outbox(), Client()
+        message = SimpleNamespace(id=42, message_thread_id=7, chat=SimpleNamespace(id=-100))
+        await box.reply(client, message, "hello")
+        await box.reply(client, message, "no quote", reply_to_message_id=None)
+        return client
+
+    client = run(scenario())
+    assert client.sent[0][:3] == (-100, "hello", {"reply_to_message_id": 42, "message_thread_id": 7})
+    assert client.sent[1][2] == {"reply_to_message_id": None, "message_thread_id": 7}
+
+
+def test_idle_lanes_are_evicted(run):
+    async def scenario():
+        box, client = outbox(private_rate=100), Client()
+        await box.send(client, 1, "hi")
+        await asyncio.sleep(0)
+        return box, box.evict_idle(time.monotonic() + 1)
+
+    box, evicted = run(scenario())
+    assert evicted == 1 and box.lanes == {}
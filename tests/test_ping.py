@@ -0,0 +1,28 @@
+from bench.stub_llm import StubLLMServer
+from src.modules.ping import format_llm_probe
+from src.utils.era import era
+
+
+def test_health_probe_of_a_post_only_endpoint(run):
+    async def scenario():
+        server = StubLLMServer(latency="fixed:0")
+        api = era()
+        api.api_url = await server.start(port=0)
+        try:
+            return await api.health(), server.requests
+        finally:
+            await api.session.close()
+            await server.stop()
+
+    status, chat_requests = run(scenario())
+    assert status == 405
+    # The probe must not cost an LLM call
+    assert chat_requests == 0
+
+
+def test_llm_probe_reachable_unless_missing_or_failing():
+    assert format_llm_probe("LLM API", 12.0, 405) == "LLM API: <code>12 ms</code> (HTTP 405)"
+    assert format_llm_probe("LLM API", 12.0, 200) == "LLM API: <code>12 ms</code> (HTTP 200)"
+    assert format_llm_probe("LLM API", 12.0, 404) == "LLM API: <code>⚠️ HTTP 404</code>"
+    assert format_llm_probe("LLM API", 12.0, 502) == "LLM API: <code>⚠️ HTTP 502</code>"
+    assert format_llm_probe("LLM API", "timeout", None) == "LLM API: <code>⚠️ timeout</code>"
@@ -0,0 +1,22 @@
+import random
+
+import pytest
+
+from bench.equivalence import MESSAGE_TYPES, check_validate_response, legacy_validate_response, random_reply
+from src.utils.prompt_builder import is_emoji, prompt_builder
+
+
+@pytest.mark.parametrize("seed", [7, 1234])
+def test_validate_response_matches_the_legacy_implementation(seed):
+    result = check_validate_response(cases=5000, seed=seed)
+    assert result["mismatches"] == 0, result["examples"]
+
+
+@pytest.mark.parametrize("msg_type", MESSAGE_TYPES)
+def test_validate_response_matches_legacy_per_message_type(msg_type):
+    rng = random.Random(42)
+    for _ in range(500):
+        reply = random_reply(rng)
+        assert prompt_builder.validate_response(reply, msg_type) == legacy_validate_response(
+            prompt_builder, reply, msg_type, is_emoji
+        ), reply
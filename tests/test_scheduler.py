@@ -0,0 +1,132 @@
+import asyncio
+
+import pytest
+
+from src.utils.scheduler import LLMScheduler
+
+WEIGHTS = {"private": 4, "mention": 2, "ambient": 1}
+
+
+def scheduler(max_concurrent=1, max_queued=100):
+    return LLMScheduler(max_concurrent, max_queued, WEIGHTS)
+
+
+async def waiter(s, priority, chat_id, granted):
+    """Queue for a slot, note the outcome, hold the slot until the next tick."""
+    async with s.slot(priority, chat_id) as ok:
+        granted.append((priority, chat_id, ok))
+        await asyncio.sleep(0)
+
+
+async def queue_behind_held_slot(s, requests):
+    """Take the only slot, queue `requests` in order, then let them through."""
+    granted = []
+    assert await s.acquire("ambient", 0)
+    tasks = []
+    for priority, chat_id in requests:
+        tasks.append(asyncio.create_task(waiter(s, priority, chat_id, granted)))
+        await asyncio.sleep(0)
+    s.release()
+    await asyncio.gather(*tasks)
+    return granted
+
+
+def test_free_slots_are_granted_without_queuing(run):
+    async def scenario():
+        s = scheduler(max_concurrent=2)
+        assert await s.acquire("ambient", -1)
+        assert await s.acquire("ambient", -2)
+        assert s.active == 2 and sum(s.queued.values()) == 0
+        s.release()
+        s.release()
+        return s.stats()
+
+    assert run(scenario())["active"] == 0
+
+
+def test_private_overtakes_a_busy_group(run):
+    granted = run(queue_behind_held_slot(scheduler(), [
+        ("ambient", -100), ("ambient", -100), ("ambient", -100), ("private", 7),
+    ]))
+    order = [(priority, chat_id) for priority, chat_id, _ in granted]
+    assert order[0] == ("private", 7)
+    assert order[1:] == [("ambient", -100)] * 3
+
+
+def test_a_quiet_chat_is_not_stuck_behind_a_busy_one(run):
+    granted = run(queue_behind_held_slot(scheduler(), [
+        ("ambient", -1), ("ambient", -1), ("ambient", -1), ("ambient", -2),
+    ]))
+    chats = [chat_id for _, chat_id, _ in granted]
+    # Each chat is its own flow: -2's first message goes before -1's second
+    assert chats.index(-2) <= 1
+
+
+def test_full_queue_sheds_the_least_important_latest_message(run):
+    async def scenario():
+        s = scheduler(max_queued=2)
+        granted = []
+        assert await s.acquire("ambient", 0)
+        tasks = [asyncio.create_task(waiter(s, p, c, granted)) for p, c in (("ambient", -1), ("ambient", -2))]
+        await asyncio.sleep(0)
+        tasks.append(asyncio.create_task(waiter(s, "mention", -3, granted)))
+        await asyncio.sleep(0)
+        s.release()
+        await asyncio.gather(*tasks)
+        return s, granted
+
+    s, granted = run(scenario())
+    assert ("ambient", -2, False) in granted
+    assert ("mention", -3, True) in granted
+    assert ("ambient", -1, True) in granted
+    assert s.shed == {"private": 0, "mention": 0, "ambient": 1}
+
+
+def test_newcomer_is_shed_when_everything_queued_outranks_it(run):
+    async def scenario():
+        s = scheduler(max_queued=1)
+        granted = []
+        assert await s.acquire("ambient", 0)
+        private = asyncio.create_task(waiter(s, "private", 5, granted))
+        await asyncio.sleep(0)
+        shed = await s.acquire("ambient", -1)
+        s.release()
+        await private
+        return s, shed, granted
+
+    s, shed, granted = run(scenario())
+    assert shed is False
+    assert granted == [("private", 5, True)]
+    assert s.shed["ambient"] == 1
+
+
+def test_cancelled_waiter_leaves_no_queue_entry_or_slot(run):
+    async def scenario():
+        s = scheduler()
+        granted = []
+        assert await s.acquire("ambient", 0)
+        cancelled = asyncio.create_task(s.acquire("private", 1))
+        later = asyncio.create_task(waiter(s, "ambient", -1, granted))
+        await asyncio.sleep(0)
+        cancelled.cancel()
+        await asyncio.sleep(0)
+        assert s.queued["private"] == 0
+        s.release()
+        await later
+        return s, granted
+
+    s, granted = run(scenario())
+    assert granted == [("ambient", -1, True)]
+    assert s.active == 0
+    assert sum(s.queued.values()) == 0
+
+
+def test_slot_is_released_when_the_block_raises(run):
+    async def scenario():
+        s = scheduler()
+        with pytest.raises(RuntimeError):
+            async with s.slot("private", 1):
+                raise RuntimeError("llm down")
+        return s
+
+    assert run(scenario()).active == 0
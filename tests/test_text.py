@@ -0,0 +1,45 @@
+import re
+
+from src.utils.text import fit_html
+
+
+def balanced(text):
+    stack = []
+    for closing, name in re.findall(r"<(/?)(\w+)[^>]*>", text):
+        if closing:
+            assert stack and stack.pop() == name
+        else:
+            stack.append(name)
+    return not stack
+
+
+def test_short_messages_are_untouched():
+    assert fit_html("<b>hi</b>\n<code>1</code>") == "<b>hi</b>\n<code>1</code>"
+
+
+def test_cut_at_a_line_boundary_without_splitting_tags_or_entities():
+    lines = [f"<code>shard_{n} &amp; friends</code> n={n}" for n in range(400)]
+    text = fit_html("<b>❖ Stats</b>\n" + "\n".join(lines), limit=1000)
+
+    assert len(text) <= 1000
+    assert text.endswith("\n…")
+    *kept, _ = text.split("\n")
+    assert kept[0] == "<b>❖ Stats</b>"
+    assert all(line in lines for line in kept[1:])
+    assert balanced(text)
+
+
+def test_tags_spanning_lines_are_closed():
+    text = fit_html("<b>⚠️ Blocked</b>\n<pre>" + "\n".join(f"frame {n}" for n in range(500)) + "</pre>", limit=300)
+
+    assert len(text) <= 300
+    assert text.endswith("…</pre>")
+    assert balanced(text)
+
+
+def test_single_overlong_line_is_cut_before_a_partial_tag_or_entity():
+    text = fit_html("<code>" + "a &amp; " * 200 + "</code>", limit=101)
+
+    assert len(text) <= 101
+    assert balanced(text)
+    assert not re.search(r"&\w*…", text)
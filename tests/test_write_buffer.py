@@ -0,0 +1,54 @@
+import asyncio
+
+from src.utils.write_buffer import ShardWriteBuffer
+
+
+class Collection:
+    """Records bulk_write batches; the first `failures` calls raise."""
+
+    def __init__(self, failures=0):
+        self.failures = failures
+        self.calls = 0
+        self.written = {}
+
+    async def bulk_write(self, requests, ordered=True):
+        self.calls += 1
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError("no primary")
+        for request in requests:
+            self.written[request._filter["user_id"]] = request._doc["$set"]
+
+
+def test_failed_batch_is_kept_and_retried_on_the_next_timer_flush(run):
+    async def scenario():
+        collection = Collection(failures=1)
+        buffer = ShardWriteBuffer("temp_1", collection, batch_size=2, flush_interval=0.01)
+        await buffer.put(1, {"name": "old"})
+        await buffer.put(2, {"name": "b"})
+        # Written while the shard was failing; newer than the batch it joins
+        await buffer.put(1, {"name": "new"})
+        await asyncio.sleep(0.05)
+        return buffer, collection
+
+    buffer, collection = run(scenario())
+    assert collection.written == {1: {"name": "new"}, 2: {"name": "b"}}
+    assert buffer.pending == {}
+    assert buffer.dropped == 0 and not buffer.failing
+
+
+def test_failing_shard_is_not_retried_on_every_put(run):
+    async def scenario():
+        collection = Collection(failures=100)
+        buffer = ShardWriteBuffer("temp_1", collection, batch_size=2, flush_interval=10, max_pending=5)
+        for user_id in range(20):
+            await buffer.put(user_id, {})
+        await buffer.close()
+        return buffer, collection
+
+    buffer, collection = run(scenario())
+    # One failed size-triggered flush, then the close() attempt
+    assert collection.calls == 2
+    # Bounded by max_pending, the oldest lost and counted
+    assert list(buffer.pending) == [15, 16, 17, 18, 19]
+    assert buffer.dropped == 15